@@ -1,133 +1,435 @@
 import os
-import io
-import re
-import torch
-import pandas as pd
 from dotenv import load_dotenv
-from pyannote.audio import Pipeline
-from transformers import WhisperProcessor, WhisperForConditionalGeneration
-from pydub import AudioSegment
-import torchaudio
-import time
+from concurrent.futures import ThreadPoolExecutor
+from audio_utils import WavReader
+from batch_utils import final_path, run_batch
+from cache_utils import DiskCache, hash_file, make_key
+from diarization_utils import speaker_embeddings, split_output
+from parallel_asr import ShardedTranscriber
+from profiling import StageTimer, capture_profiles
+from speaker_index import SpeakerIndex, save_speaker_embeddings
+from text_utils import TRANSCRIPTION_ERROR, TextCleaner
+from transcript_store import STORE_EXTENSION, write_store
+
+# torch, transformers, pyannote and pandas are imported by the stages that
+# need them (timed as "imports"), so loading this script, e.g. from
+# vocalytics.py, stays fast and a bad input fails before any of them load.
 
 # === Input Audio File ===
+# A single recording, or a directory of recordings to transcribe in batch mode
 audio_file = "data/2 personal_loan.wav"
+# Transcripts are written as .vts (columnar and memory-mapped, see transcript_store.py) or .csv
+output_file = "transcript/transcript.vts"  # Single-file mode
+output_dir = "transcript"  # Batch mode: one <name>.vts per recording + manifest.csv
+output_format = ".vts"  # Batch mode
+batch_poll_seconds = None  # Batch mode: keep watching the directory for new recordings
+batch_retry_failed = False  # Batch mode: try recordings the manifest lists as failed again
 
-start_time = time.time()
-if not os.path.exists(audio_file):
-    raise FileNotFoundError(f"The audio file was not found at: {audio_file}")
+# === ASR Batching ===
+asr_batch_size = 8  # Segments per model.generate call
+asr_max_batch_tokens = None  # Optional cap on estimated decoder tokens per batch
+asr_pipelined = True  # Overlap feature extraction and decoding with model.generate
 
-# === Clean Thai Text ===
-def clean_thai_text(text):
-    if text == "[Transcription Error]":
-        return text
-    cleaned_text = re.sub(r'(?<=[\u0E00-\u0E7F])\s+(?=[\u0E00-\u0E7F])', '', text)
-    cleaned_text = re.sub(r'\s+', ' ', cleaned_text).strip()
-    return cleaned_text
+# === Segment Merging ===
+# Adjacent same-speaker turns are merged up to one Whisper window before ASR
+merge_turns = True
+merge_max_duration = 30.0  # Seconds, Whisper's input window
+merge_max_gap = 1.0  # Only merge turns separated by at most this much silence
+merge_min_duration = 0.5  # Shorter turns join a same-speaker neighbour, or are dropped if isolated
 
-# === Load Environment and HF Token ===
-load_dotenv()
-hf_token = os.getenv("HF_TOKEN")
-if hf_token is None:
-    raise ValueError("Hugging Face token not found. Please set the HF_TOKEN environment variable.")
+# === Decode Guards ===
+# Cut decoder steps wasted on silence, noise and hallucination loops
+speech_gate_db = -45.0  # Segments without speech-like energy at this level (dBFS) skip ASR; None disables
+adaptive_max_new_tokens = True  # max_new_tokens scaled to each batch's longest segment
+stop_on_repetition = True  # Stop a segment once it's one phrase repeated over and over
 
-# === Device Configuration ===
-if torch.backends.mps.is_available():
-    device_pyannote = "mps"
-    device_asr = torch.device("mps")
-elif torch.cuda.is_available():
-    device_pyannote = "cuda"
-    device_asr = torch.device("cuda")
-else:
-    device_pyannote = "cpu"
-    device_asr = torch.device("cpu")
-
-# === Diarization Pipeline ===
-print("Starting speaker diarization...")
-diarization_pipeline = Pipeline.from_pretrained(
-    "pyannote/speaker-diarization-3.1",
-    use_auth_token=hf_token
-)
-diarization_pipeline.to(torch.device(device_pyannote))
-diarization = diarization_pipeline(audio_file)
-
-# === Diarization DataFrame ===
-data = [{
-    'start': segment.start,
-    'end': segment.end,
-    'speaker': speaker
-} for segment, _, speaker in diarization.itertracks(yield_label=True)]
-diarization_df = pd.DataFrame(data)
-
-# === Load ASR Model ===
-print("Loading biodatlab Whisper model...")
-from transformers import logging
-logging.set_verbosity_error()  # Reduce warnings
+# === CPU Sharding ===
+# Each worker loads a private copy of the model: about 6 GB for large-v3 in
+# fp32 (roughly half with bf16, a quarter with int8), so keep asr_num_workers
+# times that well under the machine's free RAM.
+asr_num_workers = 1  # >1 on CPU: shard segments across worker processes, each with its own model
+asr_threads_per_worker = None  # Torch threads per worker (default: cores / workers)
+
+# === Long Recordings ===
+# Recordings longer than one window are diarized in overlapping windows read
+# from disk (see diarization_utils.py), so memory stays bounded. With the
+# result cache on, every finished window is checkpointed and a rerun after a
+# crash only diarizes the missing ones.
+diarization_window_seconds = 600.0  # None: always diarize the whole file in one call
+diarization_overlap_seconds = 30.0
+diarization_max_distance = None  # Embedding cosine distance for "same speaker" across windows (None: pyannote's clustering threshold)
+
+# === Speaker Identification ===
+# pyannote's per-speaker embeddings are kept in the result cache and, with
+# keep_speaker_embeddings, as <transcript>.speakers.npz next to each
+# transcript. With an index of enrolled speakers (see speaker_index.py), a
+# SPEAKER_xx label that matches one is replaced by the enrolled name, e.g.
+# the sales agent's.
+keep_speaker_embeddings = True
+speaker_index_dir = None  # e.g. "speakers"
+speaker_match_threshold = 0.5  # Min cosine similarity to an enrolled embedding
+speaker_index_approximate = False  # faiss HNSW search (if installed), for very large indices
+
+# === Text Cleanup ===
+# Runs over each whole transcript at once (see text_utils.py). The cache keeps
+# raw ASR text, so changing these never reruns ASR.
+collapse_repetitions = True  # A phrase repeated 4+ times in a row (hallucination loop) is kept once
+thai_digits = False  # Thai digits (๐-๙) to 0-9
+asr_confusions_file = None  # CSV with wrong,right columns: common misrecognitions and their fix
+
+# === Result Cache ===
+# Diarization and raw segment transcriptions, keyed by audio content + model + parameters
+use_cache = True
+cache_dir = ".cache/transcribe"
+cache_max_bytes = 2 * 1024 ** 3
 
 # model_name = "biodatlab/distill-whisper-th-large-v3"
 # model_name = "biodatlab/whisper-th-large-v3-combined"
 model_name = "biodatlab/whisper-th-large-v3"
-processor = WhisperProcessor.from_pretrained(model_name)
-model = WhisperForConditionalGeneration.from_pretrained(model_name)
-model.to(device_asr)
+diarization_model_name = "pyannote/speaker-diarization-3.1"
+generate_kwargs = {}  # Extra model.generate parameters (part of the cache key)
+# Inference backend: fp32, sdpa, bf16, int8, compile, or a combination like "sdpa+int8".
+# The ASR_BACKEND environment variable (or .env) overrides this.
+asr_backend = "fp32"
+
+# === LLM Cleanup (optional) ===
+# Adds a cleaned_text column deep-cleaned by a local Ollama model (see llm_clean.py)
+llm_clean = False
+llm_model = "gemma3:4b"
+ollama_host = "http://localhost:11434"
+llm_concurrency = 4  # Requests in flight; match OLLAMA_NUM_PARALLEL
+
+# === Profiling ===
+# Stage times and counters (segments, audio seconds, tokens generated) are
+# always printed at the end. With a profile_dir they are also written there
+# as metrics.prom (Prometheus text) and trace.json (chrome://tracing, Perfetto).
+profile_dir = None  # e.g. "profile"
+profile_cprofile = False  # Also write profile_dir/cprofile.pstats (main thread only: set asr_pipelined = False to see generate)
+profile_torch = False  # Also write profile_dir/torch_trace.json from torch.profiler
+
+timer = StageTimer(trace=profile_dir is not None)
+
+# === Device Configuration ===
+def get_device():
+    import torch
+    if torch.backends.mps.is_available():
+        return torch.device("mps")
+    elif torch.cuda.is_available():
+        return torch.device("cuda")
+    return torch.device("cpu")
+
+# === Load Models ===
+def load_asr_model():
+    # The Whisper model code is imported here so that its cost shows up as
+    # imports rather than model loading
+    with timer.stage("imports"):
+        from asr_utils import import_whisper, load_whisper
+        from transformers import logging
+        import_whisper()
+        device_asr = get_device()
+    logging.set_verbosity_error()  # Reduce warnings
+
+    with timer.stage("model loading"):
+        processor, model = load_whisper(model_name, device_asr, get_asr_backend())
+    return processor, model
 
-# === Load Audio for Segmentation ===
-full_audio = AudioSegment.from_wav(audio_file)
+def get_asr_backend():
+    return os.getenv("ASR_BACKEND") or asr_backend
 
-transcribed_segments = []
-for i, row in diarization_df.iterrows():
-    start_time_ms = int(row['start'] * 1000)
-    end_time_ms = int(row['end'] * 1000)
-    segment_audio = full_audio[start_time_ms:end_time_ms]
+def load_diarization_pipeline(hf_token):
+    with timer.stage("imports"):
+        from pyannote.audio import Pipeline
+        device_pyannote = get_device()
+    with timer.stage("diarization loading"):
+        diarization_pipeline = Pipeline.from_pretrained(
+            diarization_model_name,
+            use_auth_token=hf_token
+        )
+        diarization_pipeline.to(device_pyannote)
+    return diarization_pipeline
 
-    # Save to in-memory buffer
-    buffer = io.BytesIO()
-    segment_audio.export(buffer, format="wav")
-    buffer.seek(0)
+def decode_options():
+    return {
+        "speech_gate_db": speech_gate_db,
+        "adaptive_max_new_tokens": adaptive_max_new_tokens,
+        "stop_on_repetition": stop_on_repetition,
+    }
 
+def make_local_asr(processor, model):
+    from asr_utils import transcribe_segments
+    device_asr = get_device()
+
+    def transcribe(audio_file, starts, ends):
+        durations = [end - start for start, end in zip(starts, ends)]
+        # Transcribe in batches, audio streamed from disk
+        with WavReader(audio_file) as reader:
+            return transcribe_segments(
+                model, processor, durations,
+                lambda i: reader.read_segment(starts[i], ends[i]),
+                device_asr,
+                batch_size=asr_batch_size,
+                max_batch_tokens=asr_max_batch_tokens,
+                pipelined=asr_pipelined,
+                timer=timer,
+                **decode_options(),
+                **generate_kwargs
+            )
+    return transcribe
+
+def load_asr():
+    # Returns asr(audio_file, starts, ends) -> raw texts (None for failed segments)
+    if asr_num_workers > 1 and get_device().type == "cpu":
+        print(f"Starting {asr_num_workers} Whisper worker processes...")
+        with timer.stage("model loading"):
+            asr = ShardedTranscriber(
+                model_name, asr_num_workers,
+                threads_per_worker=asr_threads_per_worker,
+                batch_size=asr_batch_size,
+                backend=get_asr_backend(),
+                timer=timer,
+                **decode_options(),
+                **generate_kwargs
+            )
+            asr.warm_up()
+        return asr
+
+    print(f"Loading biodatlab Whisper model ({get_asr_backend()})...")
+    return make_local_asr(*load_asr_model())
+
+# === Models (loaded on first use, then kept warm) ===
+# A run whose results are all cached never loads a model at all.
+models = {}
+model_loader = ThreadPoolExecutor(max_workers=1)
+
+def preload_asr():
+    # Start loading Whisper in the background, e.g. while pyannote loads and runs
+    if "asr" not in models and "asr_future" not in models:
+        models["asr_future"] = model_loader.submit(load_asr)
+
+def get_asr():
+    if "asr" not in models:
+        preload_asr()
+        models["asr"] = models.pop("asr_future").result()
+    return models["asr"]
+
+def get_diarization_pipeline(hf_token):
+    if "diarization" not in models:
+        models["diarization"] = load_diarization_pipeline(hf_token)
+    return models["diarization"]
+
+def close_models():
+    if isinstance(models.get("asr"), ShardedTranscriber):
+        models["asr"].close()
+    model_loader.shutdown()
+
+# === Diarization ===
+def diarization_windowing(audio_file):
+    # Window parameters when the recording is diarized in windows, else ()
+    if diarization_window_seconds is None:
+        return ()
     try:
-        # Load and preprocess audio
-        waveform, sample_rate = torchaudio.load(buffer)
-
-        if sample_rate != 16000:
-            resampler = torchaudio.transforms.Resample(orig_freq=sample_rate, new_freq=16000)
-            waveform = resampler(waveform)
-
-        if waveform.shape[0] > 1:
-            waveform = waveform.mean(dim=0, keepdim=True)
-
-        input_features = processor(
-            waveform.squeeze().numpy(),
-            sampling_rate=16000,
-            return_tensors="pt"
-        ).input_features.to(device_asr)
-
-        # Generate transcription
-        with torch.no_grad():
-            predicted_ids = model.generate(input_features)
-        transcribed_text = processor.batch_decode(predicted_ids, skip_special_tokens=True)[0]
-        cleaned_text = clean_thai_text(transcribed_text)
-
-    except Exception as e:
-        print(f"Error in segment {i}: {e}")
-        cleaned_text = "[Transcription Error]"
-
-    transcribed_segments.append({
-        'start': row['start'],
-        'end': row['end'],
-        'speaker': row['speaker'],
-        'text': cleaned_text
-    })
-
-# === Save and Print Results ===
-final_transcript_df = pd.DataFrame(transcribed_segments)
-final_transcript_df.to_csv("transcript/transcript.csv", index=False, encoding='utf-8')
-
-print("\n=== Final Transcript ===")
-for i, row in final_transcript_df.iterrows():
-    print(f"[{row['start']:.2f}s - {row['end']:.2f}s] {row['speaker']}: {row['text']}")
-
-# === End Timer and Print Total Time ===
-end_time = time.time()
-total_time = end_time - start_time
-print(f"\nTotal execution time: {total_time:.2f} seconds")
\ No newline at end of file
+        with WavReader(audio_file) as reader:
+            duration = reader.num_samples / reader.sample_rate
+    except ValueError:
+        return ()  # Not a PCM WAV: pyannote decodes the whole file itself
+    if duration <= diarization_window_seconds:
+        return ()
+    return diarization_window_seconds, diarization_overlap_seconds, diarization_max_distance
+
+def diarize(diarization_pipeline, audio_file, windowing=(), cache=None, audio_hash=None):
+    import pandas as pd
+
+    if windowing:
+        from diarization_utils import diarize_windowed
+        window_seconds, overlap_seconds, max_distance = windowing
+        print(f"Starting speaker diarization in {window_seconds:.0f}s windows...")
+        with timer.stage("diarization"):
+            data, embeddings = diarize_windowed(
+                diarization_pipeline, audio_file, window_seconds, overlap_seconds,
+                checkpoints=cache,
+                checkpoint_key=(audio_hash, diarization_model_name),
+                max_distance=max_distance,
+                timer=timer
+            )
+        return pd.DataFrame(data, columns=['start', 'end', 'speaker']), embeddings
+
+    print("Starting speaker diarization...")
+    with timer.stage("diarization"):
+        # The embeddings come from clustering, so returning them costs nothing
+        diarization, embeddings = split_output(diarization_pipeline(audio_file, return_embeddings=True))
+
+    data = [{
+        'start': segment.start,
+        'end': segment.end,
+        'speaker': speaker
+    } for segment, _, speaker in diarization.itertracks(yield_label=True)]
+    return pd.DataFrame(data, columns=['start', 'end', 'speaker']), speaker_embeddings(diarization, embeddings)
+
+# === Speaker Identification ===
+def get_speaker_index():
+    # Memory-mapped once, then shared by every recording of the run
+    if "speaker_index" not in models:
+        models["speaker_index"] = SpeakerIndex(speaker_index_dir, approximate=speaker_index_approximate)
+    return models["speaker_index"]
+
+def identify_speakers(embeddings):
+    # {label: enrolled name} for the speakers that match the index
+    if speaker_index_dir is None:
+        return {}
+    if not embeddings:
+        print("No speaker embeddings for this recording (diarized before they were kept): speakers not identified")
+        return {}
+    with timer.stage("speaker identification"):
+        matches = get_speaker_index().identify(embeddings, speaker_match_threshold)
+    names = {label: name for label, (name, _) in matches.items() if name is not None}
+    for label, (name, score) in matches.items():
+        print(f"{label}: {name or 'unidentified'} (similarity {score:.2f})")
+    timer.count("identified_speakers", len(names))
+    return names
+
+# === Transcribe One Recording ===
+def transcribe_file(audio_file, hf_token, cache=None):
+    with timer.stage("imports"):
+        import pandas as pd
+        from segment_utils import merge_segments
+
+    audio_hash = hash_file(audio_file) if cache is not None else None
+
+    windowing = diarization_windowing(audio_file)
+    diarization_key = make_key("diarization", audio_hash, diarization_model_name, *windowing)
+    embeddings_key = make_key("speaker-embeddings", audio_hash, diarization_model_name, *windowing)
+    diarization_df = cache.get(diarization_key) if cache is not None else None
+    embeddings = cache.get(embeddings_key, {}) if cache is not None else {}
+    if diarization_df is None:
+        preload_asr()
+        diarization_df, embeddings = diarize(get_diarization_pipeline(hf_token), audio_file, windowing, cache,
+                                             audio_hash)
+        if cache is not None:
+            cache.set(diarization_key, diarization_df)
+            cache.set(embeddings_key, embeddings)
+
+    if merge_turns:
+        segments_df, dropped = merge_segments(
+            diarization_df,
+            max_duration=merge_max_duration,
+            max_gap=merge_max_gap,
+            min_duration=merge_min_duration
+        )
+        print(f"Merged {len(diarization_df)} diarization turns into {len(segments_df)} ASR segments "
+              f"({dropped} isolated micro-turns dropped)")
+    else:
+        segments_df = diarization_df
+
+    starts = segments_df['start'].tolist()
+    ends = segments_df['end'].tolist()
+
+    # Raw (uncleaned) text is cached, so changing the cleaning rules never
+    # forces ASR to run again. Only segments without a cached text are sent
+    # to the model, e.g. the ones whose boundaries changed.
+    texts = [None] * len(starts)
+    segment_keys = []
+    if cache is not None:
+        segment_keys = [
+            make_key("segment", audio_hash, model_name, get_asr_backend(), generate_kwargs, decode_options(),
+                     round(start, 3), round(end, 3))
+            for start, end in zip(starts, ends)
+        ]
+        texts = [cache.get(key) for key in segment_keys]
+
+    missing = [i for i, text in enumerate(texts) if text is None]
+    if cache is not None:
+        print(f"Cache: {len(texts) - len(missing)}/{len(texts)} segments reused")
+    if missing:
+        new_texts = get_asr()(audio_file, [starts[i] for i in missing], [ends[i] for i in missing])
+        for i, text in zip(missing, new_texts):
+            texts[i] = text
+            if text is not None and cache is not None:
+                cache.set(segment_keys[i], text)
+
+    # The whole transcript is cleaned in one pass; failed segments are marked
+    with timer.stage("text cleanup"):
+        cleaner = TextCleaner(collapse_repetitions=collapse_repetitions, thai_digits=thai_digits,
+                              confusions=asr_confusions_file)
+        cleaned_texts = cleaner.clean_many(TRANSCRIPTION_ERROR if text is None else text for text in texts)
+    transcript_df = pd.DataFrame({
+        'start': segments_df['start'].tolist(),
+        'end': segments_df['end'].tolist(),
+        'speaker': segments_df['speaker'].tolist(),
+        'text': cleaned_texts
+    }, columns=['start', 'end', 'speaker', 'text'])
+    # No speech (speech gate) or nothing but a repetition loop
+    transcript_df = transcript_df[transcript_df['text'] != ''].reset_index(drop=True)
+
+    names = identify_speakers(embeddings)
+    if names:
+        transcript_df['speaker'] = [names.get(speaker, speaker) for speaker in transcript_df['speaker']]
+    # Kept for save_transcript, keyed by the anonymous labels
+    transcript_df.attrs['speaker_embeddings'] = embeddings
+    transcript_df.attrs['speaker_names'] = names
+
+    if llm_clean:
+        from llm_clean import LLMCleaner
+        with timer.stage("llm clean"):
+            cleaner = LLMCleaner(model=llm_model, host=ollama_host, concurrency=llm_concurrency)
+            transcript_df['cleaned_text'] = cleaner.clean(transcript_df['text'])
+        print(f"LLM cleanup: {cleaner.stats['cache_hits']} cached, {cleaner.stats['requests']} requests, "
+              f"{cleaner.stats['fallbacks']} fallbacks")
+    return transcript_df
+
+def save_transcript(final_transcript_df, output_file):
+    with timer.stage("save"):
+        if output_file.lower().endswith(STORE_EXTENSION):
+            # With LLM cleanup, the cleaned text is the transcript's text
+            texts = final_transcript_df.get('cleaned_text', final_transcript_df['text'])
+            write_store(output_file, final_transcript_df['start'], final_transcript_df['end'],
+                        final_transcript_df['speaker'], texts)
+        else:
+            final_transcript_df.to_csv(output_file, index=False, encoding='utf-8')
+
+        # Only once the transcript is written, named after its final path (in
+        # batch mode output_file is run_batch's temporary name)
+        embeddings = final_transcript_df.attrs.get('speaker_embeddings')
+        if keep_speaker_embeddings and embeddings:
+            save_speaker_embeddings(os.path.splitext(final_path(output_file))[0] + '.speakers.npz', embeddings,
+                                    final_transcript_df.attrs.get('speaker_names'))
+
+# === Run ===
+def main():
+    if not os.path.exists(audio_file):
+        raise FileNotFoundError(f"The audio file was not found at: {audio_file}")
+
+    # === Load Environment and HF Token ===
+    load_dotenv()
+    hf_token = os.getenv("HF_TOKEN")
+    if hf_token is None:
+        raise ValueError("Hugging Face token not found. Please set the HF_TOKEN environment variable.")
+
+    cache = DiskCache(cache_dir, cache_max_bytes) if use_cache else None
+
+    with capture_profiles(profile_dir or "profile", cprofile=profile_cprofile, torch_profile=profile_torch):
+        # Models are loaded once and stay warm for every recording
+        if os.path.isdir(audio_file):
+            def process_file(input_file, output_path):
+                save_transcript(transcribe_file(input_file, hf_token, cache), output_path)
+
+            manifest = run_batch(audio_file, output_dir, output_format, process_file, poll_seconds=batch_poll_seconds,
+                                 retry_failed=batch_retry_failed)
+            print(f"\nManifest written: {manifest.path}")
+        else:
+            final_transcript_df = transcribe_file(audio_file, hf_token, cache)
+            save_transcript(final_transcript_df, output_file)
+
+            print("\n=== Final Transcript ===")
+            for i, row in final_transcript_df.iterrows():
+                print(f"[{row['start']:.2f}s - {row['end']:.2f}s] {row['speaker']}: {row['text']}")
+
+    close_models()
+
+    # === Stage Timing ===
+    timer.report()
+    if profile_dir is not None:
+        timer.export(profile_dir)
+        print(f"Metrics written to {profile_dir}/")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,200 @@
+import os
+import sys
+import json
+import time
+import bisect
+import importlib.util
+import numpy as np
+from keyword_matcher import IncrementalMatcher
+from stream_utils import GrowingWavSource, PcmSource, simulate_growing_wav
+from text_utils import clean_thai_text
+from transcript_utils import Transcript
+
+# === Input Audio Stream ===
+# A PCM WAV that is still being written, or "-" for raw 16 kHz mono s16le PCM
+# on stdin, e.g.: ffmpeg -i <input> -f s16le -ac 1 -ar 16000 - | python "1 transcribe_stream.py"
+audio_source = "stream/live.wav"
+simulate_from = None  # e.g. "data/2 personal_loan.wav": replay a recording into audio_source in real time
+simulate_speed = 1.0
+idle_timeout_seconds = 5.0  # A growing file that stops growing for this long has ended
+
+# === Rolling Windows ===
+step_seconds = 2.0  # Re-transcribe the open window whenever this much new audio arrived
+max_window_seconds = 20.0  # Force-finalize the window at this length (Whisper takes at most 30 s)
+holdback_seconds = 1.5  # Text ending this close to the window end may still be cut off, so wait
+
+# === Keyword Alerts ===
+keywords_file = "keywords/personal_loan.csv"
+events_file = None  # JSON lines with segment and match events; stdout when None
+transcript_file = "transcript/transcript_stream.vts"  # Finalized segments (.vts or .csv), written when the stream ends
+
+model_name = "biodatlab/whisper-th-large-v3"
+# Inference backend: fp32, sdpa, bf16, int8, compile, or a combination like "sdpa+int8".
+# The ASR_BACKEND environment variable overrides this.
+asr_backend = "fp32"
+generate_kwargs = {"max_new_tokens": 200, "repetition_penalty": 1.15, "do_sample": False}
+
+# === Device Configuration ===
+def get_device():
+    import torch
+    if torch.backends.mps.is_available():
+        return torch.device("mps")
+    elif torch.cuda.is_available():
+        return torch.device("cuda")
+    return torch.device("cpu")
+
+# === Keyword Index (shared with 2 keyword_highlight.py) ===
+def load_highlighter():
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "2 keyword_highlight.py")
+    spec = importlib.util.spec_from_file_location("keyword_highlight", path)
+    highlighter = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(highlighter)
+    return highlighter
+
+# === Events ===
+class EventWriter:
+    def __init__(self, path=None):
+        self.f = open(path, 'a', encoding='utf-8') if path else sys.stdout
+
+    def emit(self, event):
+        self.f.write(json.dumps(event, ensure_ascii=False) + "\n")
+        self.f.flush()
+
+    def close(self):
+        if self.f is not sys.stdout:
+            self.f.close()
+
+# === Rolling-window ASR ===
+class StreamTranscriber:
+    # Keeps one open window of audio that hasn't been finalized yet. Every
+    # step_seconds of new audio the window is transcribed with timestamps;
+    # the chunks that end clear of the window's (still growing) edge are
+    # final and handed to on_segment, and the window then starts where they
+    # ended. Latency is bounded by step_seconds + holdback_seconds plus one
+    # decode, or max_window_seconds when there's no break in the speech.
+    def __init__(self, processor, model, on_segment, sample_rate=16000):
+        self.processor = processor
+        self.model = model
+        self.device = get_device()
+        self.on_segment = on_segment
+        self.sample_rate = sample_rate
+        self.window = np.zeros(0, dtype=np.float32)
+        self.window_start = 0  # Samples since the stream began
+        self.unprocessed = 0
+        self.arrivals = []  # (samples received, wall time), for latency
+
+    def feed(self, block):
+        self.window = np.concatenate([self.window, block])
+        self.unprocessed += len(block)
+        self.arrivals.append((self.window_start + len(self.window), time.time()))
+        if self.unprocessed >= step_seconds * self.sample_rate:
+            self.unprocessed = 0
+            self._transcribe(final=False)
+
+    def finish(self):
+        if len(self.window):
+            self._transcribe(final=True)
+
+    def arrival_time(self, sample):
+        # Wall time when the audio up to `sample` had been received
+        i = bisect.bisect_left(self.arrivals, (sample,))
+        return self.arrivals[min(i, len(self.arrivals) - 1)][1]
+
+    def _transcribe(self, final):
+        from asr_utils import transcribe_segments
+
+        window_seconds = len(self.window) / self.sample_rate
+        forced = window_seconds >= max_window_seconds
+        result = transcribe_segments(
+            self.model, self.processor, [window_seconds], lambda i: self.window, self.device,
+            batch_size=1, pipelined=False, return_offsets=True, **generate_kwargs
+        )[0]
+
+        offset = self.window_start / self.sample_rate
+        finalized_until = None
+        if result is None:
+            if final or forced:
+                self.on_segment(offset, offset + window_seconds, "[Transcription Error]")
+                finalized_until = window_seconds
+        else:
+            for chunk in result['offsets']:
+                chunk_start, chunk_end = chunk['timestamp']
+                complete = chunk_end is not None and chunk_end <= window_seconds - holdback_seconds
+                if not (complete or final or forced):
+                    break
+                chunk_end = min(chunk_end if chunk_end is not None else window_seconds, window_seconds)
+                chunk_start = min(chunk_start, chunk_end)
+                text = clean_thai_text(chunk['text'])
+                if text:
+                    self.on_segment(offset + chunk_start, offset + chunk_end, text)
+                finalized_until = chunk_end
+            if (final or forced) and finalized_until is None:
+                finalized_until = window_seconds  # Nothing but silence
+
+        if finalized_until is not None:
+            cut = min(int(finalized_until * self.sample_rate), len(self.window))
+            self.window = self.window[cut:]
+            self.window_start += cut
+            self.arrivals = [a for a in self.arrivals if a[0] > self.window_start] or self.arrivals[-1:]
+
+# === Run ===
+def main():
+    start_time = time.time()
+    if not os.path.exists(keywords_file):
+        raise FileNotFoundError(f"The keywords file was not found at: {keywords_file}")
+
+    backend = os.getenv("ASR_BACKEND") or asr_backend
+    print(f"Loading biodatlab Whisper model ({backend})...", file=sys.stderr)
+    import_start = time.time()
+    from asr_utils import import_whisper, load_whisper
+    from transformers import logging
+    import_whisper()
+    device_asr = get_device()
+    import_time = time.time() - import_start
+    logging.set_verbosity_error()
+    load_start = time.time()
+    processor, model = load_whisper(model_name, device_asr, backend)
+    print(f"Imports: {import_time:.2f}s, model loading: {time.time() - load_start:.2f}s", file=sys.stderr)
+
+    highlighter = load_highlighter()
+    keyword_groups, matcher = highlighter.load_keyword_index(keywords_file)
+    incremental = IncrementalMatcher(matcher)
+    transcript = Transcript()
+    events = EventWriter(events_file)
+
+    def on_segment(start, end, text):
+        transcript.append(text, start, end)
+        now = time.time()
+        events.emit({"event": "segment", "start": round(start, 2), "end": round(end, 2), "text": text,
+                     "latency_seconds": round(now - asr.arrival_time(int(end * asr.sample_rate)), 2)})
+
+        # Only the text around the new segment is rescanned
+        new_spans = incremental.update(transcript)
+        full_text = transcript.full_text
+        for match in highlighter.matches_from_spans(full_text, keyword_groups, new_spans, transcript):
+            events.emit({"event": "match", "group": match['group'], "keywords": match['keyword_string'],
+                         "time": round(match['time'], 2), "text": match['text'],
+                         "latency_seconds": round(now - asr.arrival_time(int(end * asr.sample_rate)), 2)})
+
+    asr = StreamTranscriber(processor, model, on_segment)
+
+    if audio_source == "-":
+        source = PcmSource(sys.stdin.buffer)
+    else:
+        if simulate_from is not None:
+            simulate_growing_wav(simulate_from, audio_source, simulate_speed)
+        source = GrowingWavSource(audio_source, idle_timeout=idle_timeout_seconds)
+
+    try:
+        for block in source:
+            asr.feed(block)
+        asr.finish()
+    finally:
+        events.close()
+
+    transcript.save(transcript_file)
+    print(f"Transcript saved: {transcript_file}", file=sys.stderr)
+    print(f"Total execution time: {time.time() - start_time:.2f} seconds", file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
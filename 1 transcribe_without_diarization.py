@@ -1,110 +1,136 @@
 import os
-import io
-import re
-import torch
 from dotenv import load_dotenv
-from transformers import WhisperProcessor, WhisperForConditionalGeneration
-from pydub import AudioSegment
-import torchaudio
 import time
+from audio_utils import WavReader
+from batch_utils import run_batch
+from segment_utils import sliding_windows, stitch_windows
+from text_utils import clean_thai_text
 
 # === Input Audio File ===
+# A single recording, or a directory of recordings to transcribe in batch mode
 audio_file = "data/2 personal_loan.wav"
+output_file = "transcript/transcript.txt"  # Single-file mode
+output_dir = "transcript"  # Batch mode: one <name>.txt per recording + manifest.csv
+batch_poll_seconds = None  # Batch mode: keep watching the directory for new recordings
+batch_retry_failed = False  # Batch mode: try recordings the manifest lists as failed again
+
+# === Long-form Chunking ===
+chunk_length_s = 30.0  # Whisper's input window
+chunk_stride_s = 25.0  # Window start every 25 s -> 5 s overlap, deduplicated by timestamps
+asr_batch_size = 8  # Windows per model.generate call
+
+# === Decode Guards ===
+# Cut decoder steps wasted on silence, noise and hallucination loops
+speech_gate_db = -45.0  # Windows without speech-like energy at this level (dBFS) skip ASR; None disables
+adaptive_max_new_tokens = True  # max_new_tokens scaled to the window length, capped at 400
+stop_on_repetition = True  # Stop a window once it's one phrase repeated over and over
 
-# === Start Timer ===
-start_time = time.time()
-if not os.path.exists(audio_file):
-    raise FileNotFoundError(f"The audio file was not found at: {audio_file}")
-
-# === Clean Thai Text ===
-def clean_thai_text(text):
-    if text == "[Transcription Error]":
-        return text
-    cleaned_text = re.sub(r'(?<=[\u0E00-\u0E7F])\s+(?=[\u0E00-\u0E7F])', '', text)
-    cleaned_text = re.sub(r'\s+', ' ', cleaned_text).strip()
-    return cleaned_text
-
-# === Load Environment and HF Token ===
-load_dotenv()
-hf_token = os.getenv("HF_TOKEN")
-if hf_token is None:
-    raise ValueError("Hugging Face token not found. Please set the HF_TOKEN environment variable.")
+# model_name = "biodatlab/distill-whisper-th-large-v3"
+# model_name = "biodatlab/whisper-th-large-v3-combined"
+model_name = "biodatlab/whisper-th-large-v3"
+# Inference backend: fp32, sdpa, bf16, int8, compile, or a combination like "sdpa+int8".
+# The ASR_BACKEND environment variable (or .env) overrides this.
+asr_backend = "fp32"
 
 # === Device Configuration ===
-if torch.backends.mps.is_available():
-    device_asr = torch.device("mps")
-elif torch.cuda.is_available():
-    device_asr = torch.device("cuda")
-else:
-    device_asr = torch.device("cpu")
+def get_device():
+    import torch
+    if torch.backends.mps.is_available():
+        return torch.device("mps")
+    elif torch.cuda.is_available():
+        return torch.device("cuda")
+    return torch.device("cpu")
 
 # === Load ASR Model ===
-print("Loading biodatlab Whisper model...")
-from transformers import logging
-logging.set_verbosity_error()
-
-# model_name = "biodatlab/distill-whisper-th-large-v3"
-# model_name = "biodatlab/whisper-th-large-v3-combined"
-model_name = "biodatlab/whisper-th-large-v3"
-processor = WhisperProcessor.from_pretrained(model_name)
-model = WhisperForConditionalGeneration.from_pretrained(model_name)
-model.to(device_asr)
-
-# === Load Entire Audio File ===
-audio = AudioSegment.from_wav(audio_file)
-chunk_length_ms = 30 * 1000  # 30 seconds per chunk
-chunks = [audio[i:i + chunk_length_ms] for i in range(0, len(audio), chunk_length_ms)]
-
-# === Transcribe in Chunks ===
-transcription = ""
-for idx, chunk in enumerate(chunks):
-    buffer = io.BytesIO()
-    chunk.export(buffer, format="wav")
-    buffer.seek(0)
-
-    try:
-        waveform, sample_rate = torchaudio.load(buffer)
-
-        if sample_rate != 16000:
-            resampler = torchaudio.transforms.Resample(orig_freq=sample_rate, new_freq=16000)
-            waveform = resampler(waveform)
-
-        if waveform.shape[0] > 1:
-            waveform = waveform.mean(dim=0, keepdim=True)
-
-        input_features = processor(
-            waveform.squeeze().numpy(),
-            sampling_rate=16000,
-            return_tensors="pt"
-        ).input_features.to(device_asr)
-
-        with torch.no_grad():
-            predicted_ids = model.generate(
-                input_features,
-                max_new_tokens=400,
-                repetition_penalty=1.15,
-                do_sample=False,
-                early_stopping=True
-            )
-        text = processor.batch_decode(predicted_ids, skip_special_tokens=True)[0]
-        cleaned = clean_thai_text(text)
-        transcription += f"{cleaned} "
-
-        print(f"Chunk {idx + 1}/{len(chunks)} done.")
-
-    except Exception as e:
-        print(f"Error in chunk {idx + 1}: {e}")
-        transcription += "[Transcription Error] "
-
-# === Save and Print Result ===
-os.makedirs("transcript", exist_ok=True)
-with open("transcript/transcript.txt", "w", encoding="utf-8") as f:
-    f.write(transcription.strip())
-
-print("\n=== Final Transcript ===")
-print(transcription.strip())
-
-# === End Timer and Print Total Time ===
-end_time = time.time()
-total_time = end_time - start_time
-print(f"\nTotal execution time: {total_time:.2f} seconds")
+# torch and transformers are only imported here, so a missing input fails
+# fast and the import cost is reported apart from loading the weights
+def load_asr_model():
+    backend = os.getenv("ASR_BACKEND") or asr_backend
+    print(f"Loading biodatlab Whisper model ({backend})...")
+    import_start = time.time()
+    from asr_utils import import_whisper, load_whisper
+    from transformers import logging
+    import_whisper()
+    device_asr = get_device()
+    import_time = time.time() - import_start
+    logging.set_verbosity_error()
+
+    load_start = time.time()
+    processor, model = load_whisper(model_name, device_asr, backend)
+    print(f"Imports: {import_time:.2f}s, model loading: {time.time() - load_start:.2f}s")
+    return processor, model
+
+# === Transcribe One Recording ===
+def transcribe_file(audio_file, processor, model):
+    from asr_utils import transcribe_segments
+
+    # Stream the audio file in overlapping windows, batch by batch
+    with WavReader(audio_file) as reader:
+        windows = sliding_windows(reader.num_samples, chunk_length_s, chunk_stride_s)
+        print(f"Transcribing {len(windows)} windows ({chunk_length_s:.0f}s, stride {chunk_stride_s:.0f}s)...")
+
+        results = transcribe_segments(
+            model, processor,
+            [(end - start) / 16000 for start, end in windows],
+            lambda i: reader.read(*windows[i]),
+            get_device(),
+            batch_size=asr_batch_size,
+            return_offsets=True,
+            speech_gate_db=speech_gate_db,
+            adaptive_max_new_tokens=adaptive_max_new_tokens,
+            stop_on_repetition=stop_on_repetition,
+            max_new_tokens=400,
+            repetition_penalty=1.15,
+            do_sample=False,
+            early_stopping=True
+        )
+
+    for idx, result in enumerate(results):
+        if result is None:
+            print(f"Error in chunk {idx + 1}")
+
+    # Timestamps decide which window keeps the words spoken in each overlap
+    return stitch_windows(results, windows, postprocess=clean_thai_text)
+
+def save_transcript(transcription, output_file):
+    os.makedirs(os.path.dirname(output_file) or ".", exist_ok=True)
+    with open(output_file, "w", encoding="utf-8") as f:
+        f.write(transcription)
+
+# === Run ===
+def main():
+    # === Start Timer ===
+    start_time = time.time()
+    if not os.path.exists(audio_file):
+        raise FileNotFoundError(f"The audio file was not found at: {audio_file}")
+
+    # === Load Environment and HF Token ===
+    load_dotenv()
+    hf_token = os.getenv("HF_TOKEN")
+    if hf_token is None:
+        raise ValueError("Hugging Face token not found. Please set the HF_TOKEN environment variable.")
+
+    # The model is loaded once and stays warm for every recording
+    processor, model = load_asr_model()
+
+    if os.path.isdir(audio_file):
+        def process_file(input_file, output_path):
+            save_transcript(transcribe_file(input_file, processor, model), output_path)
+
+        manifest = run_batch(audio_file, output_dir, '.txt', process_file, poll_seconds=batch_poll_seconds,
+                             retry_failed=batch_retry_failed)
+        print(f"\nManifest written: {manifest.path}")
+    else:
+        transcription = transcribe_file(audio_file, processor, model)
+        save_transcript(transcription, output_file)
+
+        print("\n=== Final Transcript ===")
+        print(transcription)
+
+    # === End Timer and Print Total Time ===
+    end_time = time.time()
+    total_time = end_time - start_time
+    print(f"\nTotal execution time: {total_time:.2f} seconds")
+
+if __name__ == '__main__':
+    main()
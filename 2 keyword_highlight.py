@@ -1,12 +1,16 @@
 import csv
-import re
 import os
-from docx import Document
-from docx.shared import RGBColor
-from docx.enum.text import WD_COLOR_INDEX
+import json
+from concurrent.futures import ProcessPoolExecutor
+from keyword_matcher import KeywordMatcher, MATCHER_VERSION
+from span_store import SpanStore
+from transcript_utils import Transcript, format_timestamp
+from batch_utils import run_batch, list_files, output_path_for
+from cache_utils import DiskCache, hash_file, make_key
+from profiling import StageTimer, capture_profiles
 
 # === Config ===
-TRANSCRIPT_FILE = 'transcript/transcript_personal_loan.csv' # CSV or TXT file
+TRANSCRIPT_FILE = 'transcript/transcript_personal_loan.csv' # VTS, CSV or TXT file, or a directory of them for batch mode
 KEYWORDS_FILE = 'keywords/personal_loan.csv' # CSV file
 GROUP_NAME_COL = 1 # Column index for group name in keywords CSV
 COLOR_COL = 12 # Column index for color in keywords CSV
@@ -15,24 +19,21 @@ KEYWORD_END_COL = 11 # Ending column index for keywords in keywords CSV
 MAX_CONTEXT_WINDOW = 100 # Max characters around keywords for context
 
 DOC_TITLE = 'Transcript with Highlights'
-OUTPUT_FILE = 'transcript_with_highlights.docx'
+OUTPUT_FILE = 'transcript_with_highlights.docx' # Single-file mode
+OUTPUT_DIR = 'highlights' # Batch mode: one <name>.docx per transcript (e.g. call1.csv.docx) + keyword_summary.csv/.json
+NUM_WORKERS = os.cpu_count() or 1 # Batch mode: transcripts highlighted in parallel
+KEYWORD_CACHE_DIR = '.cache/keywords' # Parsed keyword sheets, reused until the CSV changes
+TRANSCRIPT_EXTENSIONS = ('.vts', '.csv', '.txt')
+PROFILE_DIR = None # e.g. 'profile': write metrics.prom and trace.json there (single-file mode and the batch parent)
+PROFILE_CPROFILE = False # Also write PROFILE_DIR/cprofile.pstats
+SUMMARY_ONLY = False # Only print the match summary (batch mode: only the <name>.json summaries), no DOCX
 # ==============
 
+timer = StageTimer(trace=PROFILE_DIR is not None)
+
 # === Step 1: Load and flatten transcript ===
 def load_transcript(file_path):
-    _, file_extension = os.path.splitext(file_path)
-    full_text = ''
-    if file_extension.lower() == '.csv':
-        with open(file_path, newline='', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            chunks = [row['text'] for row in reader]
-            full_text = ' '.join(chunks)
-    elif file_extension.lower() == '.txt':
-        with open(file_path, 'r', encoding='utf-8') as f:
-            full_text = f.read()
-    else:
-        raise ValueError(f"Unsupported file type: {file_extension}. Only .csv and .txt are supported.")
-    return full_text
+    return Transcript.load(file_path).full_text
 
 # === Step 2: Load keyword sequences ===
 def load_keyword_patterns(file_path):
@@ -57,18 +58,74 @@ def load_keyword_patterns(file_path):
                 }
             
             keyword_string = " ".join(keywords)
-            pattern = r'.{0,%d}?' % MAX_CONTEXT_WINDOW
-            pattern = pattern.join(map(re.escape, keywords))
             try:
                 rgb = hex_to_rgb_tuple(color_hex)
             except ValueError as e:
                 print(f"⚠️ Skipping invalid color for group '{group_name}': {color_hex} ({e})")
                 continue
             
-            keyword_groups[group_name]["patterns"].append((keyword_string, re.compile(pattern, re.IGNORECASE | re.DOTALL), rgb))
+            keyword_groups[group_name]["patterns"].append((keyword_string, keywords, rgb))
             
     return keyword_groups
 
+# === Keyword index: parsed groups + matcher, cached by keyword sheet content ===
+def load_keyword_index(file_path):
+    cache = DiskCache(KEYWORD_CACHE_DIR)
+    key = make_key("keyword-index", MATCHER_VERSION, hash_file(file_path), GROUP_NAME_COL, COLOR_COL,
+                   KEYWORD_START_COL, KEYWORD_END_COL, MAX_CONTEXT_WINDOW)
+    with timer.stage("keyword index"):
+        index = cache.get(key)
+        if index is None:
+            keyword_groups = load_keyword_patterns(file_path)
+            index = (keyword_groups, build_matcher(keyword_groups))
+            cache.set(key, index)
+    return index
+
+def fresh_groups(keyword_groups):
+    # found_words is filled in per transcript, the patterns are shared
+    return {group: {"patterns": data["patterns"], "found_words": []} for group, data in keyword_groups.items()}
+
+# Every keyword of every group goes into one automaton, so the transcript is
+# scanned once instead of once per pattern
+def build_matcher(keyword_groups):
+    sequences = [keywords for data in keyword_groups.values() for _, keywords, _ in data["patterns"]]
+    return KeywordMatcher(sequences, max_gap=MAX_CONTEXT_WINDOW)
+
+def find_matches(full_text, keyword_groups, matcher=None, transcript=None):
+    # Keyword sequences found in order, each keyword at most MAX_CONTEXT_WINDOW
+    # characters after the previous one. Returned group by group, pattern by
+    # pattern, like looping over the patterns with re.finditer. With the
+    # Transcript the text came from, each match also carries the segment,
+    # start time and speaker it begins in.
+    if matcher is None:
+        matcher = build_matcher(keyword_groups)
+    with timer.stage("match"):
+        matches = matches_from_spans(full_text, keyword_groups, matcher.find_all(full_text), transcript)
+    timer.count("characters", len(full_text))
+    timer.count("matches", len(matches))
+    return matches
+
+def matches_from_spans(full_text, keyword_groups, spans_per_pattern, transcript=None):
+    spans = iter(spans_per_pattern)
+    matches = []
+    for group_name, data in keyword_groups.items():
+        for keyword_string, _, rgb_color in data["patterns"]:
+            for start, end in next(spans):
+                match = {'start': start, 'end': end, 'color': rgb_color, 'group': group_name,
+                         'keyword_string': keyword_string, 'text': full_text[start:end]}
+                if transcript is not None:
+                    match['segment'], match['time'], match['speaker'] = transcript.locate(start)
+                matches.append(match)
+    return matches
+
+def describe_match(match):
+    where = []
+    if match.get('time') is not None:
+        where.append(format_timestamp(match['time']))
+    if match.get('speaker'):
+        where.append(match['speaker'])
+    return f" at {' '.join(where)}" if where else ""
+
 def hex_to_rgb_tuple(hex_color):
     hex_color = hex_color.lstrip('#')
     if len(hex_color) != 6:
@@ -79,6 +136,8 @@ def hex_to_rgb_tuple(hex_color):
     return (r, g, b)
 
 def get_closest_wd_color_index(rgb_tuple):
+    from docx.enum.text import WD_COLOR_INDEX
+
     color_map = {
         (0, 0, 0): WD_COLOR_INDEX.BLACK,
         (0, 0, 255): WD_COLOR_INDEX.BLUE,
@@ -108,86 +167,64 @@ def get_closest_wd_color_index(rgb_tuple):
             closest_wd_color = wd_index
     return closest_wd_color
 
+# === Found words per group (what the summaries show) ===
+def record_matches(matches, keyword_groups, verbose=True):
+    found = set()
+    for match in matches:
+        start, end = match['start'], match['end']
+        if start == end:
+            continue
+        # Matches at the very start of the transcript are highlighted but not printed
+        if start > 0 and verbose:
+            print(f"✅ Match for group '{match['group']}'{describe_match(match)}: '{match['text']}'")
+
+        found_word = (match['keyword_string'], match['color'])
+        if (match['group'], found_word) not in found:
+            found.add((match['group'], found_word))
+            keyword_groups[match['group']]["found_words"].append(found_word)
+    return keyword_groups
+
 # === Step 3: Create DOCX with highlights ===
-def create_docx_and_highlight(full_text, keyword_groups):
+def create_docx_and_highlight(full_text, keyword_groups, output_file=None, matcher=None, verbose=True, transcript=None,
+                              matches=None):
+    # python-docx is only imported once a document is actually built
+    with timer.stage("imports"):
+        from docx import Document
+        from docx_writer import write_highlighted_text
+
+    output_file = output_file or OUTPUT_FILE
     document = Document()
     document.add_heading(DOC_TITLE, 0)
-    
-    # Add the full text to a paragraph
-    p = document.add_paragraph()
-    p.add_run(full_text)
 
     # Highlight the text
-    for group_name, data in keyword_groups.items():
-        for keyword_string, pattern, rgb_color in data["patterns"]:
-            for match in pattern.finditer(full_text):
-                start, end = match.start(), match.end()
-                if start == 0 or start == end:
-                    continue
-                
-                print(f"✅ Match for group '{group_name}': '{match.group()}'")
-                if (keyword_string, rgb_color) not in data["found_words"]:
-                    data["found_words"].append((keyword_string, rgb_color))
-
-    # Re-creating the paragraph with highlighted runs
-    document.paragraphs[-1].clear() # Clear the plain text paragraph
-    
-    # Collect all matches with their colors
-    all_matches = []
-    for group_name, data in keyword_groups.items():
-        for keyword_string, pattern, rgb_color in data["patterns"]:
-            for match in pattern.finditer(full_text):
-                all_matches.append({'start': match.start(), 'end': match.end(), 'color': rgb_color, 'group': group_name, 'text': match.group()})
-                if (keyword_string, rgb_color) not in data["found_words"]:
-                    data["found_words"].append((keyword_string, rgb_color))
-
-    # Sort matches by start position
-    all_matches.sort(key=lambda x: x['start'])
-
-    # Merge overlapping matches
-    merged_highlights = []
-    if all_matches:
-        current_highlight = all_matches[0]
-        for i in range(1, len(all_matches)):
-            next_highlight = all_matches[i]
-            if next_highlight['start'] < current_highlight['end']: # Overlap
-                # Merge by extending the current highlight's end if the next one goes further
-                current_highlight['end'] = max(current_highlight['end'], next_highlight['end'])
-                # For overlapping highlights, we keep the color of the first highlight encountered.
-                # If a more sophisticated color merging is needed, this logic would change.
-            else:
-                merged_highlights.append(current_highlight)
-                current_highlight = next_highlight
-        merged_highlights.append(current_highlight) # Add the last highlight
+    if matches is None:
+        matches = find_matches(full_text, keyword_groups, matcher, transcript)
+    record_matches(matches, keyword_groups, verbose)
+    spans = SpanStore()
+    for match in matches:
+        spans.add(match['start'], match['end'], match['color'])
 
-    # Re-creating the paragraph with highlighted runs
-    document.paragraphs[-1].clear() # Clear the plain text paragraph
-    
-    p = document.paragraphs[-1]
-    last_end = 0
-    for highlight in merged_highlights:
-        start, end, color = highlight['start'], highlight['end'], highlight['color']
-        
-        if start > last_end:
-            p.add_run(full_text[last_end:start])
-        
-        run = p.add_run(full_text[start:end])
-        font = run.font
-        font.color.rgb = RGBColor(0, 0, 0) # Text color black
-        font.highlight_color = get_closest_wd_color_index(color)
-        
-        last_end = end
-    
-    if last_end < len(full_text):
-        p.add_run(full_text[last_end:])
+    # One paragraph per speaker turn (or a single one without turns). Each
+    # color's highlight index is looked up once and the runs are written as
+    # XML in bulk; where highlights overlap, the group listed first in the
+    # keyword sheet keeps its color.
+    with timer.stage("write docx"):
+        turns = transcript.turns() if transcript is not None else None
+        highlight_index = {color: get_closest_wd_color_index(color) for color in spans.colors}
+        write_highlighted_text(document, full_text, spans.segments(len(full_text)), highlight_index, turns)
 
-    insert_summary_table(document, keyword_groups)
+        insert_summary_table(document, keyword_groups)
 
-    document.save(OUTPUT_FILE)
-    print(f'Document created: {os.path.abspath(OUTPUT_FILE)}')
+    with timer.stage("save docx"):
+        document.save(output_file)
+    timer.count("documents")
+    if verbose:
+        print(f'Document created: {os.path.abspath(output_file)}')
     return keyword_groups
 
 def insert_summary_table(document, summary_data):
+    from docx.shared import RGBColor
+
     document.add_page_break()
     document.add_heading('Match Summary', level=1)
     
@@ -235,9 +272,105 @@ def print_summary_table(summary_data):
         print(f"{group:<30} | {found_words_str:<40} | {status}")
     print("-" * 80)
 
+# === Batch mode ===
+_index = {}
+
+def _init_worker(keyword_groups, matcher):
+    _index.update(keyword_groups=keyword_groups, matcher=matcher)
+
+def highlight_file(transcript_file, output_file):
+    # One DOCX per transcript, plus a <name>.json of its found words and match
+    # timeline that the combined summary is built from (also for transcripts
+    # done in earlier runs). With SUMMARY_ONLY the .json is the only output.
+    keyword_groups = fresh_groups(_index["keyword_groups"])
+    transcript = Transcript.load(transcript_file)
+    full_text = transcript.full_text
+    matches = find_matches(full_text, keyword_groups, _index["matcher"], transcript)
+    if SUMMARY_ONLY:
+        record_matches(matches, keyword_groups, verbose=False)
+    else:
+        create_docx_and_highlight(full_text, keyword_groups, output_file, verbose=False, transcript=transcript,
+                                  matches=matches)
+
+    summary = {
+        "found_words": {
+            group: [{"word": word, "color": "#%02X%02X%02X" % rgb_color} for word, rgb_color in data["found_words"]]
+            for group, data in keyword_groups.items()
+        },
+        "matches": [
+            {"group": match['group'], "keywords": match['keyword_string'], "time": match['time'],
+             "speaker": match['speaker'], "text": match['text']}
+            for match in matches
+        ],
+    }
+    if SUMMARY_ONLY:
+        # The summary is the batch output: output_file is run_batch's temporary name
+        with open(output_file, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+        return
+    summary_file = output_path_for(transcript_file, OUTPUT_DIR, '.json', keep_input_extension=True)
+    with open(summary_file + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+    os.replace(summary_file + '.tmp', summary_file)
+
+def write_batch_summary(transcript_dir, output_dir):
+    combined = {}
+    for transcript_file in list_files(transcript_dir, TRANSCRIPT_EXTENSIONS):
+        summary_file = output_path_for(transcript_file, output_dir, '.json', keep_input_extension=True)
+        if os.path.exists(summary_file):
+            with open(summary_file, encoding='utf-8') as f:
+                combined[transcript_file] = json.load(f)
+
+    json_file = os.path.join(output_dir, 'keyword_summary.json')
+    with open(json_file, 'w', encoding='utf-8') as f:
+        json.dump(combined, f, ensure_ascii=False, indent=2)
+
+    csv_file = os.path.join(output_dir, 'keyword_summary.csv')
+    with open(csv_file, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['transcript_file', 'group', 'status', 'found_words'])
+        for transcript_file, summary in combined.items():
+            for group, found in summary["found_words"].items():
+                status = "Found" if found else "Not Found"
+                writer.writerow([transcript_file, group, status, ", ".join(item["word"] for item in found)])
+    print(f"Summary written: {csv_file}, {json_file}")
+
 # === Run ===
+def main():
+    with capture_profiles(PROFILE_DIR or 'profile', cprofile=PROFILE_CPROFILE):
+        keyword_groups, matcher = load_keyword_index(KEYWORDS_FILE)
+
+        if os.path.isdir(TRANSCRIPT_FILE):
+            # Batch mode: the keyword index is built once and shipped to every worker.
+            # Outputs keep the transcript's extension, so call1.csv and call1.vts
+            # (e.g. after a conversion) don't share one output.
+            output_extension = '.json' if SUMMARY_ONLY else '.docx'
+            if NUM_WORKERS > 1:
+                with ProcessPoolExecutor(NUM_WORKERS, initializer=_init_worker, initargs=(keyword_groups, matcher)) as executor:
+                    manifest = run_batch(TRANSCRIPT_FILE, OUTPUT_DIR, output_extension, highlight_file,
+                                         extensions=TRANSCRIPT_EXTENSIONS, executor=executor,
+                                         keep_input_extension=True)
+            else:
+                _init_worker(keyword_groups, matcher)
+                manifest = run_batch(TRANSCRIPT_FILE, OUTPUT_DIR, output_extension, highlight_file,
+                                     extensions=TRANSCRIPT_EXTENSIONS, keep_input_extension=True)
+            print(f"\nManifest written: {manifest.path}")
+            write_batch_summary(TRANSCRIPT_FILE, OUTPUT_DIR)
+        else:
+            with timer.stage("load transcript"):
+                transcript = Transcript.load(TRANSCRIPT_FILE)
+            if SUMMARY_ONLY:
+                matches = find_matches(transcript.full_text, keyword_groups, matcher, transcript)
+                summary_result = record_matches(matches, keyword_groups, verbose=False)
+            else:
+                summary_result = create_docx_and_highlight(transcript.full_text, keyword_groups, matcher=matcher,
+                                                           transcript=transcript)
+            print_summary_table(summary_result)
+
+    if PROFILE_DIR is not None:
+        timer.report()
+        timer.export(PROFILE_DIR)
+        print(f"Metrics written to {PROFILE_DIR}/")
+
 if __name__ == '__main__':
-    full_text = load_transcript(TRANSCRIPT_FILE)
-    keyword_groups = load_keyword_patterns(KEYWORDS_FILE)
-    summary_result = create_docx_and_highlight(full_text, keyword_groups)
-    print_summary_table(summary_result)
+    main()
@@ -0,0 +1,295 @@
+import sys
+import importlib
+import torch
+
+SAMPLE_RATE = 16000
+WHISPER_WINDOW_SECONDS = 30
+TOKENS_PER_SECOND = 8  # Rough upper bound of Whisper tokens per second of Thai speech
+MAX_NEW_TOKENS = 440  # Whisper's 448 decoder positions minus the task prompt
+
+# Inference backends, combinable with '+', e.g. "sdpa+int8"
+#   fp32    - full precision, the reference
+#   sdpa    - PyTorch scaled_dot_product_attention kernels
+#   bf16    - bfloat16 weights and activations (CPUs with AVX512-BF16/AMX, CUDA)
+#   int8    - dynamic int8 quantization of all nn.Linear layers (CPU only)
+#   compile - torch.compile the encoder, which always sees fixed 30 s inputs
+ASR_BACKENDS = ("fp32", "sdpa", "bf16", "int8", "compile")
+
+
+# === Model Loading ===
+def import_whisper():
+    # transformers imports model code lazily, on first use. Importing the
+    # Whisper modules up front lets the scripts time that cost as imports
+    # instead of model loading.
+    for module in ("transformers.models.whisper.modeling_whisper", "transformers.models.whisper.processing_whisper"):
+        importlib.import_module(module)
+
+
+def load_whisper(model_name, device, backend="fp32"):
+    from transformers import WhisperProcessor, WhisperForConditionalGeneration
+
+    options = set(backend.split("+"))
+    unknown = options - set(ASR_BACKENDS)
+    if unknown:
+        raise ValueError(f"Unknown ASR backend option(s): {', '.join(sorted(unknown))}. Choose from {ASR_BACKENDS}")
+    if "int8" in options and device.type != "cpu":
+        raise ValueError("The int8 backend uses dynamic quantization, which only runs on CPU")
+    if "int8" in options and "bf16" in options:
+        raise ValueError("The int8 backend quantizes fp32 Linear weights, it can't be combined with bf16")
+
+    model_kwargs = {}
+    if "sdpa" in options:
+        model_kwargs["attn_implementation"] = "sdpa"
+    if "bf16" in options:
+        model_kwargs["torch_dtype"] = torch.bfloat16
+
+    processor = WhisperProcessor.from_pretrained(model_name)
+    model = WhisperForConditionalGeneration.from_pretrained(model_name, **model_kwargs)
+    model.to(device)
+    model.eval()
+
+    if "int8" in options:
+        model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    if "compile" in options:
+        model.model.encoder = torch.compile(model.model.encoder)
+    return processor, model
+
+
+# === Feature Extraction ===
+def extract_features(processor, waveform):
+    return processor(
+        waveform,
+        sampling_rate=SAMPLE_RATE,
+        return_tensors="pt"
+    ).input_features
+
+
+# === Batching ===
+def make_batches(durations, batch_size=8, max_batch_tokens=None):
+    # Longest segments first so that rows of similar length share a batch and
+    # the decoder doesn't keep stepping padded rows that finished long ago.
+    order = sorted(range(len(durations)), key=lambda i: durations[i], reverse=True)
+
+    batches = []
+    current = []
+    current_tokens = 0
+    for i in order:
+        tokens = min(durations[i], WHISPER_WINDOW_SECONDS) * TOKENS_PER_SECOND
+        budget_exceeded = max_batch_tokens is not None and current_tokens + tokens > max_batch_tokens
+        if current and (len(current) >= batch_size or budget_exceeded):
+            batches.append(current)
+            current = []
+            current_tokens = 0
+        current.append(i)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+# === Generation ===
+def generate_batch(model, features, device, **generate_kwargs):
+    input_features = torch.cat(features, dim=0).to(device, dtype=model.dtype)
+    with torch.no_grad():
+        return model.generate(input_features, **generate_kwargs)
+
+
+def token_budget(seconds, cap=MAX_NEW_TOKENS):
+    # max_new_tokens for a batch whose longest segment is `seconds` long:
+    # twice the rough tokens-per-second bound (timestamps and slack) plus a
+    # few for very short turns. A silent or looping row can't run on to the
+    # full 440 tokens.
+    return min(cap, 16 + int(seconds * TOKENS_PER_SECOND * 2))
+
+
+def repetition_length(ids, period, repeats):
+    # Tokens the last `period` tokens are repeated over at the end of ids
+    # (a 1-D list), counting the first copy
+    block = ids[-period:]
+    count = 1
+    while len(ids) >= (count + 1) * period and ids[-(count + 1) * period:-count * period] == block:
+        count += 1
+    return count * period if count >= repeats else 0
+
+
+class RepetitionStop:
+    # A transformers StoppingCriteria that ends a row once its last tokens are
+    # one block of up to max_period tokens repeated: at least min_repeats
+    # times, and over at least min_tokens tokens, so short legitimate
+    # repeats (Thai laughter "5555", "ๆ") aren't cut. Rows are checked
+    # together with one tensor comparison per period.
+    def __init__(self, max_period=32, min_repeats=4, min_tokens=24):
+        self.max_period = max_period
+        self.min_repeats = min_repeats
+        self.min_tokens = min_tokens
+
+    def repeats_for(self, period):
+        return max(self.min_repeats, -(-self.min_tokens // period))
+
+    def __call__(self, input_ids, scores, **kwargs):
+        done = torch.zeros(input_ids.shape[0], dtype=torch.bool, device=input_ids.device)
+        for period in range(1, self.max_period + 1):
+            span = period * self.repeats_for(period)
+            if span > input_ids.shape[1]:
+                break
+            tail = input_ids[:, -span:]
+            done |= (tail[:, period:] == tail[:, :-period]).all(dim=1)
+        return done
+
+    def trim(self, ids, pad_token_id=None):
+        # Token ids (1-D tensor) with a repeated tail cut back to one copy.
+        # Trailing padding (rows that stopped before the rest of the batch)
+        # is dropped first.
+        values = ids.tolist()
+        while pad_token_id is not None and values and values[-1] == pad_token_id:
+            values.pop()
+        for period in range(1, self.max_period + 1):
+            length = repetition_length(values, period, self.repeats_for(period))
+            if length:
+                return ids[:len(values) - length + period]
+        return ids
+
+
+def decode_batch(processor, predicted_ids):
+    return processor.batch_decode(predicted_ids, skip_special_tokens=True)
+
+
+# === Pipeline Stages ===
+# transcribe_segments is split into three stages so that, when pipelined, the
+# next batch's audio and log-mel features are prepared and the previous batch
+# is decoded while the model is busy generating.
+def prepare_batch(processor, batch, read_segment, speech_gate_db=None):
+    # (indices, features, skipped): segments that fail the speech gate are
+    # skipped before feature extraction and come out as empty texts
+    from audio_utils import has_speech
+
+    indices = []
+    features = []
+    skipped = []
+    for i in batch:
+        try:
+            waveform = read_segment(i)
+            if speech_gate_db is not None and not has_speech(waveform, speech_gate_db):
+                skipped.append(i)
+                continue
+            features.append(extract_features(processor, waveform))
+            indices.append(i)
+        except Exception as e:
+            print(f"Error in segment {i}: {e}", file=sys.stderr)
+    return indices, features, skipped
+
+
+def generate_rows(model, device, indices, features, **generate_kwargs):
+    # Returns (index, token ids or None) per segment
+    if not indices:
+        return []
+    try:
+        predicted_ids = generate_batch(model, features, device, **generate_kwargs)
+        return list(zip(indices, predicted_ids))
+    except Exception:
+        # Fall back to one segment at a time to find the bad one
+        rows = []
+        for i, segment_features in zip(indices, features):
+            try:
+                rows.append((i, generate_batch(model, [segment_features], device, **generate_kwargs)[0]))
+            except Exception as e:
+                print(f"Error in segment {i}: {e}", file=sys.stderr)
+                rows.append((i, None))
+        return rows
+
+
+def decode_rows(processor, rows, postprocess=None, with_offsets=False):
+    decoded = [(i, ids) for i, ids in rows if ids is not None]
+    if with_offsets:
+        # {"text": ..., "offsets": [{"text": ..., "timestamp": (start, end)}, ...]}
+        # per row, timestamps relative to the start of the segment
+        texts = [
+            processor.tokenizer.decode(ids.tolist(), skip_special_tokens=True, output_offsets=True)
+            for _, ids in decoded
+        ]
+    else:
+        texts = decode_batch(processor, [ids.tolist() for _, ids in decoded]) if decoded else []
+        if postprocess is not None:
+            texts = [postprocess(text) for text in texts]
+    results = dict(zip([i for i, _ in decoded], texts))
+    return [(i, results.get(i)) for i, _ in rows]
+
+
+def transcribe_segments(model, processor, durations, read_segment, device, batch_size=8, max_batch_tokens=None,
+                        postprocess=None, pipelined=True, timer=None, return_offsets=False, speech_gate_db=None,
+                        adaptive_max_new_tokens=False, stop_on_repetition=False, **generate_kwargs):
+    # Returns one text per segment, in input order. Audio is pulled through
+    # read_segment(i) one batch at a time, so only a few batches are held in
+    # memory. None marks a segment that failed; a failure never takes the rest
+    # of its batch down with it. With return_offsets, each result is a
+    # decode_rows offsets dict instead of a plain text.
+    #
+    # Guards against wasted decoder steps, all off by default:
+    #   speech_gate_db          - segments failing audio_utils.has_speech at
+    #                             this level skip the model, text ""
+    #   adaptive_max_new_tokens - max_new_tokens from token_budget of the
+    #                             batch's longest segment (an explicit
+    #                             max_new_tokens stays the cap)
+    #   stop_on_repetition      - RepetitionStop ends looping rows early and
+    #                             their repeated tail is cut to one copy
+    from pipeline_utils import run_stages
+
+    if return_offsets:
+        generate_kwargs["return_timestamps"] = True
+
+    if timer is not None:
+        timer.count("segments", len(durations))
+        timer.count("audio_seconds", sum(durations))
+
+    pad_token_id = model.generation_config.pad_token_id
+    repetition_stop = RepetitionStop() if stop_on_repetition else None
+
+    def generate(prepared):
+        indices, features, skipped = prepared
+        kwargs = generate_kwargs
+        if adaptive_max_new_tokens and indices:
+            cap = generate_kwargs.get("max_new_tokens", MAX_NEW_TOKENS)
+            kwargs = dict(kwargs, max_new_tokens=token_budget(max(durations[i] for i in indices), cap))
+        if repetition_stop is not None:
+            from transformers import StoppingCriteriaList
+            kwargs = dict(kwargs, stopping_criteria=StoppingCriteriaList([repetition_stop]))
+
+        rows = generate_rows(model, device, indices, features, **kwargs)
+        if repetition_stop is not None:
+            rows = [(i, ids if ids is None else repetition_stop.trim(ids, pad_token_id)) for i, ids in rows]
+        if timer is not None:
+            timer.count("tokens_generated", sum(
+                len(ids) if pad_token_id is None else int((ids != pad_token_id).sum())
+                for _, ids in rows if ids is not None
+            ))
+            timer.count("failed_segments", sum(ids is None for _, ids in rows))
+            timer.count("skipped_segments", len(skipped))
+        return rows + [(i, torch.zeros(0, dtype=torch.long)) for i in skipped]
+
+    stages = [
+        ("audio + features", lambda batch: prepare_batch(processor, batch, read_segment, speech_gate_db)),
+        ("generate", generate),
+        ("decode", lambda rows: decode_rows(processor, rows, postprocess, return_offsets)),
+    ]
+    batches = make_batches(durations, batch_size, max_batch_tokens)
+
+    if pipelined:
+        results = run_stages(batches, stages, timer=timer)
+    else:
+        results = (_run_in_sequence(batch, stages, timer) for batch in batches)
+
+    texts = [None] * len(durations)
+    for batch_results in results:
+        for i, text in batch_results:
+            texts[i] = text
+    return texts
+
+
+def _run_in_sequence(item, stages, timer):
+    for name, fn in stages:
+        if timer is not None:
+            with timer.stage(name):
+                item = fn(item)
+        else:
+            item = fn(item)
+    return item
@@ -0,0 +1,213 @@
+import math
+import wave
+import numpy as np
+
+SAMPLE_RATE = 16000
+
+
+# === PCM Decoding ===
+def pcm_to_float32(frames, sample_width, channels):
+    # Same scaling torchaudio.load applies to integer PCM, returns (samples, channels)
+    if sample_width == 1:
+        samples = (np.frombuffer(frames, dtype=np.uint8).astype(np.float32) - 128) / 128
+    elif sample_width == 2:
+        samples = np.frombuffer(frames, dtype='<i2').astype(np.float32) / 32768
+    elif sample_width == 3:
+        raw = np.frombuffer(frames, dtype=np.uint8).reshape(-1, 3)
+        samples = (raw[:, 0].astype(np.int32) | (raw[:, 1].astype(np.int32) << 8) | (raw[:, 2].astype(np.int8).astype(np.int32) << 16))
+        samples = samples.astype(np.float32) / 8388608
+    elif sample_width == 4:
+        samples = np.frombuffer(frames, dtype='<i4').astype(np.float32) / 2147483648
+    else:
+        raise ValueError(f"Unsupported sample width: {sample_width} bytes")
+    return samples.reshape(-1, channels)
+
+
+def to_mono(samples):
+    if samples.shape[1] > 1:
+        return samples.mean(axis=1)
+    return samples[:, 0]
+
+
+def resample(samples, orig_sr, new_sr=SAMPLE_RATE):
+    if orig_sr == new_sr:
+        return samples
+    import torch
+    import torchaudio
+    return torchaudio.functional.resample(torch.from_numpy(samples), orig_sr, new_sr).numpy()
+
+
+class StreamResampler:
+    # Resamples a stream block by block with the same result as resample() on
+    # the whole stream: each block is resampled together with the input just
+    # before it, and the output samples whose filter reaches past the input
+    # received so far are held back until the next block (or final=True).
+    # Resampling every block on its own instead puts filter edge artifacts
+    # at each block boundary.
+    def __init__(self, orig_sr, new_sr=SAMPLE_RATE):
+        self.orig_sr, self.new_sr = orig_sr, new_sr
+        divisor = math.gcd(orig_sr, new_sr)
+        self.orig, self.new = orig_sr // divisor, new_sr // divisor
+        # Filter reach in input samples, from torchaudio's defaults
+        # (lowpass_filter_width=6, rolloff=0.99), plus one input period
+        self.context = math.ceil(6 * self.orig / (0.99 * min(self.orig, self.new))) + self.orig
+        self.buffer = np.zeros(0, dtype=np.float32)
+        self.buffer_start = 0  # Input index of buffer[0], a multiple of self.orig
+        self.emitted = 0  # Output samples returned so far
+        self.resampler = None
+
+    def __call__(self, samples, final=False):
+        if self.orig_sr == self.new_sr:
+            return samples
+        import torch
+        import torchaudio
+        if self.resampler is None:
+            self.resampler = torchaudio.transforms.Resample(orig_freq=self.orig_sr, new_freq=self.new_sr)
+
+        self.buffer = np.concatenate([self.buffer, np.asarray(samples, dtype=np.float32)])
+        received = self.buffer_start + len(self.buffer)
+        if final:
+            ready = -(-received * self.new // self.orig)
+        else:
+            ready = max((received - self.context) * self.new // self.orig, self.emitted)
+        if ready <= self.emitted:
+            return np.zeros(0, dtype=np.float32)
+
+        output = self.resampler(torch.from_numpy(self.buffer)).numpy()
+        first = self.buffer_start * self.new // self.orig  # Output index of output[0]
+        result = output[self.emitted - first:ready - first]
+        self.emitted = ready
+
+        # Keep the input the next output samples' filters reach back into
+        keep_from = (ready * self.orig // self.new - self.context) // self.orig * self.orig
+        if keep_from > self.buffer_start:
+            self.buffer = self.buffer[keep_from - self.buffer_start:]
+            self.buffer_start = keep_from
+        return np.ascontiguousarray(result, dtype=np.float32)
+
+
+# === Load Audio ===
+def load_audio(audio_file, sample_rate=SAMPLE_RATE):
+    # Decode the whole file once into a mono float32 array at `sample_rate`.
+    # Segments are then just views into this array (see slice_segment).
+    try:
+        with wave.open(audio_file, 'rb') as wav:
+            orig_sr = wav.getframerate()
+            samples = pcm_to_float32(wav.readframes(wav.getnframes()), wav.getsampwidth(), wav.getnchannels())
+    except wave.Error:
+        # Not plain PCM (e.g. float WAV, mp3, aac): let pydub/ffmpeg decode it
+        from pydub import AudioSegment
+        audio = AudioSegment.from_file(audio_file)
+        orig_sr = audio.frame_rate
+        samples = pcm_to_float32(audio.raw_data, audio.sample_width, audio.channels)
+
+    samples = resample(to_mono(samples), orig_sr, sample_rate)
+    return np.ascontiguousarray(samples, dtype=np.float32)
+
+
+# === Segment Boundaries ===
+# Boundaries follow pydub's millisecond slicing (full_audio[start_ms:end_ms]) so
+# segments cover exactly the same audio the scripts used to export.
+def ms_to_sample(ms, sample_rate=SAMPLE_RATE):
+    return ms * sample_rate // 1000
+
+
+def duration_ms(num_samples, sample_rate=SAMPLE_RATE):
+    return round(num_samples * 1000 / sample_rate)
+
+
+def segment_bounds(start, end, num_samples, sample_rate=SAMPLE_RATE):
+    start_sample = ms_to_sample(int(start * 1000), sample_rate)
+    end_sample = ms_to_sample(int(end * 1000), sample_rate)
+    return min(start_sample, num_samples), min(end_sample, num_samples)
+
+
+def slice_segment(audio, start, end, sample_rate=SAMPLE_RATE):
+    start_sample, end_sample = segment_bounds(start, end, len(audio), sample_rate)
+    return audio[start_sample:end_sample]
+
+
+def fixed_windows(num_samples, window_ms, sample_rate=SAMPLE_RATE):
+    # Same chunking as [audio[i:i + window_ms] for i in range(0, len(audio), window_ms)]
+    for start_ms in range(0, duration_ms(num_samples, sample_rate), window_ms):
+        start_sample = min(ms_to_sample(start_ms, sample_rate), num_samples)
+        end_sample = min(ms_to_sample(start_ms + window_ms, sample_rate), num_samples)
+        yield start_sample, end_sample
+
+
+# === Streaming Reader ===
+class WavReader:
+    # Reads windows of a PCM WAV straight from disk, so peak memory is bounded by
+    # the window size rather than the recording length. Sample offsets are in
+    # the output rate (16 kHz), matching load_audio + slice_segment.
+    def __init__(self, audio_file, sample_rate=SAMPLE_RATE):
+        try:
+            self.wav = wave.open(audio_file, 'rb')
+        except wave.Error as e:
+            raise ValueError(
+                f"Streaming needs a PCM WAV file, convert it first (see convert_audio.txt): {audio_file} ({e})"
+            )
+        self.sample_rate = sample_rate
+        self.orig_sr = self.wav.getframerate()
+        self.sample_width = self.wav.getsampwidth()
+        self.channels = self.wav.getnchannels()
+        self.num_frames = self.wav.getnframes()
+        self.num_samples = self.num_frames * sample_rate // self.orig_sr
+        self.resampler = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.wav.close()
+
+    def read(self, start_sample, end_sample):
+        start_frame = start_sample * self.orig_sr // self.sample_rate
+        end_frame = min(end_sample * self.orig_sr // self.sample_rate, self.num_frames)
+        if end_frame <= start_frame:
+            return np.zeros(0, dtype=np.float32)
+
+        self.wav.setpos(start_frame)
+        frames = self.wav.readframes(end_frame - start_frame)
+        samples = to_mono(pcm_to_float32(frames, self.sample_width, self.channels))
+
+        if self.orig_sr != self.sample_rate:
+            # Build the resampling kernel once per file, not once per window
+            import torch
+            import torchaudio
+            if self.resampler is None:
+                self.resampler = torchaudio.transforms.Resample(orig_freq=self.orig_sr, new_freq=self.sample_rate)
+            samples = self.resampler(torch.from_numpy(samples)).numpy()[:end_sample - start_sample]
+
+        return np.ascontiguousarray(samples, dtype=np.float32)
+
+    def read_segment(self, start, end):
+        return self.read(*segment_bounds(start, end, self.num_samples, self.sample_rate))
+
+
+# === Speech Gate ===
+def frame_levels_db(samples, frame_seconds=0.03, sample_rate=SAMPLE_RATE):
+    # RMS level of each non-overlapping frame, in dBFS
+    frame = max(int(frame_seconds * sample_rate), 1)
+    count = len(samples) // frame
+    if count == 0:
+        return np.zeros(0, dtype=np.float32)
+    frames = np.asarray(samples[:count * frame], dtype=np.float32).reshape(count, frame)
+    rms = np.sqrt(np.mean(np.square(frames), axis=1))
+    return 20 * np.log10(np.maximum(rms, 1e-10))
+
+
+def has_speech(samples, threshold_db=-45.0, min_speech_seconds=0.2, min_dynamics_db=3.0, frame_seconds=0.03,
+               sample_rate=SAMPLE_RATE):
+    # Cheap gate run before ASR: at least min_speech_seconds of frames must
+    # be louder than threshold_db, and the frame levels must move by at
+    # least min_dynamics_db (standard deviation), as syllables and pauses
+    # do. Digital silence, dead air, hum and steady line noise fail; music
+    # and loud noise usually pass and are left to the model.
+    levels = frame_levels_db(samples, frame_seconds, sample_rate)
+    if np.count_nonzero(levels > threshold_db) * frame_seconds < min_speech_seconds:
+        return False
+    return min_dynamics_db is None or float(np.std(levels)) >= min_dynamics_db
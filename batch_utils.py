@@ -0,0 +1,150 @@
+import os
+import csv
+import time
+from concurrent.futures import as_completed
+
+AUDIO_EXTENSIONS = ('.wav',)
+MANIFEST_FIELDS = ['audio_file', 'output_file', 'status', 'elapsed_seconds', 'error']
+PARTIAL = '.partial'
+MANIFEST_FILE = 'manifest.csv'  # Written into every batch output directory
+
+
+# === Inputs and Outputs ===
+def list_files(input_dir, extensions=AUDIO_EXTENSIONS):
+    return sorted(
+        os.path.join(input_dir, name)
+        for name in os.listdir(input_dir)
+        if name.lower().endswith(extensions)
+    )
+
+
+def output_path_for(input_file, output_dir, extension, keep_input_extension=False):
+    # <stem><extension>, or <name><extension> (e.g. call1.csv.docx) where
+    # inputs of different types can share a stem
+    name = os.path.basename(input_file)
+    if not keep_input_extension:
+        name = os.path.splitext(name)[0]
+    return os.path.join(output_dir, name + extension)
+
+
+def partial_path(output_file):
+    # Temporary name an output is written to, keeping the real extension
+    # (call1.partial.vts) so writers that go by extension write the right format
+    stem, extension = os.path.splitext(output_file)
+    return stem + PARTIAL + extension
+
+
+def final_path(path):
+    # The output name a temporary name from partial_path stands for
+    stem, extension = os.path.splitext(path)
+    if stem.endswith(PARTIAL):
+        return stem[:-len(PARTIAL)] + extension
+    return path
+
+
+# === Manifest ===
+class Manifest:
+    # One row per input recording, rewritten after every file so an interrupted
+    # run leaves an accurate record behind.
+    def __init__(self, path):
+        self.path = path
+        self.rows = {}
+        if os.path.exists(path):
+            with open(path, newline='', encoding='utf-8') as f:
+                for row in csv.DictReader(f):
+                    self.rows[row['audio_file']] = row
+
+    def record(self, audio_file, output_file, status, elapsed_seconds=0.0, error=''):
+        self.rows[audio_file] = {
+            'audio_file': audio_file,
+            'output_file': output_file,
+            'status': status,
+            'elapsed_seconds': f"{elapsed_seconds:.2f}",
+            'error': error,
+        }
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=MANIFEST_FIELDS)
+            writer.writeheader()
+            writer.writerows(self.rows.values())
+        os.replace(tmp_path, self.path)
+
+
+# === Batch Runner ===
+def run_batch(input_dir, output_dir, extension, process_file, poll_seconds=None, extensions=AUDIO_EXTENSIONS,
+              executor=None, retry_failed=False, keep_input_extension=False):
+    # Calls process_file(input_file, output_file) for every input in
+    # input_dir whose output doesn't exist yet. Outputs are written to a
+    # temporary name first, so a crash never leaves a half-written output
+    # that a resumed run would skip. Inputs the manifest lists as failed are
+    # skipped, or tried once more with retry_failed. With poll_seconds set,
+    # keeps watching input_dir for new inputs instead of returning; an input
+    # is only picked up once its size and mtime are unchanged from the
+    # previous poll, so a recording still being copied in is left alone.
+    # With an executor (a process pool), inputs are processed concurrently;
+    # process_file must then be picklable. keep_input_extension: see
+    # output_path_for.
+    os.makedirs(output_dir, exist_ok=True)
+    manifest = Manifest(os.path.join(output_dir, MANIFEST_FILE))
+    retry = set()  # Failed inputs still to be tried once more
+    if retry_failed:
+        retry = {audio_file for audio_file, row in manifest.rows.items() if row['status'] == 'failed'}
+    last_seen = {}  # Input file -> (size, mtime) at the previous poll
+
+    def finish(n, total, audio_file, output_file, start, run):
+        tmp_file = partial_path(output_file)
+        try:
+            run()
+            os.replace(tmp_file, output_file)
+            manifest.record(audio_file, output_file, 'done', time.perf_counter() - start)
+            if executor is not None:
+                print(f"[{n}/{total}] {audio_file} done.")
+        except Exception as e:
+            print(f"Error in {audio_file}: {e}")
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
+            manifest.record(audio_file, output_file, 'failed', time.perf_counter() - start, str(e))
+
+    while True:
+        pending = []
+        for audio_file in list_files(input_dir, extensions):
+            if os.path.basename(audio_file) == MANIFEST_FILE:
+                continue  # The input directory is another batch's output directory
+            output_file = output_path_for(audio_file, output_dir, extension, keep_input_extension)
+            if os.path.exists(output_file):
+                if audio_file not in manifest.rows:
+                    manifest.record(audio_file, output_file, 'skipped')
+                continue
+            if manifest.rows.get(audio_file, {}).get('status') == 'failed' and audio_file not in retry:
+                continue
+            if poll_seconds is not None:
+                stat = os.stat(audio_file)
+                seen, last_seen[audio_file] = last_seen.get(audio_file), (stat.st_size, stat.st_mtime)
+                if seen != last_seen[audio_file]:
+                    continue  # New or still growing: look again at the next poll
+            retry.discard(audio_file)
+            pending.append((audio_file, output_file))
+
+        if executor is None:
+            for n, (audio_file, output_file) in enumerate(pending, 1):
+                print(f"\n[{n}/{len(pending)}] {audio_file}")
+                start = time.perf_counter()
+                finish(n, len(pending), audio_file, output_file, start,
+                       lambda: process_file(audio_file, partial_path(output_file)))
+        else:
+            start = time.perf_counter()
+            futures = {
+                executor.submit(process_file, audio_file, partial_path(output_file)): (audio_file, output_file)
+                for audio_file, output_file in pending
+            }
+            # Manifest rows are written here, in the parent, as files complete;
+            # elapsed_seconds then counts from when the batch was submitted
+            for n, future in enumerate(as_completed(futures), 1):
+                audio_file, output_file = futures[future]
+                finish(n, len(pending), audio_file, output_file, start, future.result)
+
+        if poll_seconds is None:
+            break
+        time.sleep(poll_seconds)
+
+    return manifest
@@ -0,0 +1,132 @@
+import os
+import sys
+import time
+import json
+import torch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from asr_utils import load_whisper, transcribe_segments
+from audio_utils import WavReader, fixed_windows
+
+# === Config ===
+# Usage: python benchmarks/bench_asr_backends.py <reference.wav> [reference.txt] [model_name_or_path]
+# Without a reference transcript, the fp32 output is used as the reference, so
+# the error rates show how far each backend drifts from full precision.
+REFERENCE_AUDIO = sys.argv[1] if len(sys.argv) > 1 else None
+REFERENCE_TEXT = sys.argv[2] if len(sys.argv) > 2 else None
+MODEL_NAME = sys.argv[3] if len(sys.argv) > 3 else "biodatlab/whisper-th-large-v3"
+BACKENDS = ["fp32", "sdpa", "bf16", "int8", "sdpa+int8", "sdpa+compile"]
+CHUNK_LENGTH_MS = 30 * 1000
+BATCH_SIZE = 4
+REPORT_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results", "asr_backends.md")
+# ==============
+
+
+# === Error Rates ===
+def edit_distance(ref, hyp):
+    previous = list(range(len(hyp) + 1))
+    for i, r in enumerate(ref, 1):
+        current = [i]
+        for j, h in enumerate(hyp, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (r != h)))
+        previous = current
+    return previous[-1]
+
+
+def error_rate(ref, hyp):
+    return edit_distance(ref, hyp) / max(len(ref), 1)
+
+
+def cer(ref, hyp):
+    # Thai is written without spaces between words, so CER is the primary metric
+    return error_rate(ref.replace(" ", ""), hyp.replace(" ", ""))
+
+
+def wer(ref, hyp):
+    return error_rate(ref.split(), hyp.split())
+
+
+# === Run One Backend ===
+def run_backend(backend, device, windows):
+    load_start = time.perf_counter()
+    processor, model = load_whisper(MODEL_NAME, device, backend)
+    load_time = time.perf_counter() - load_start
+
+    durations = [len(window) / 16000 for window in windows]
+
+    def transcribe():
+        return transcribe_segments(model, processor, durations, lambda i: windows[i], device,
+                                   batch_size=BATCH_SIZE, pipelined=False)
+
+    # Warm-up on the first window (compile traces here, allocators settle)
+    warmup_start = time.perf_counter()
+    transcribe_segments(model, processor, durations[:1], lambda i: windows[i], device, pipelined=False)
+    warmup_time = time.perf_counter() - warmup_start
+
+    start = time.perf_counter()
+    texts = transcribe()
+    elapsed = time.perf_counter() - start
+    return " ".join(text or "" for text in texts).strip(), load_time, warmup_time, elapsed
+
+
+if __name__ == '__main__':
+    if REFERENCE_AUDIO is None:
+        sys.exit("Usage: python benchmarks/bench_asr_backends.py <reference.wav> [reference.txt] [model_name_or_path]")
+
+    from transformers import logging
+    logging.set_verbosity_error()
+
+    with WavReader(REFERENCE_AUDIO) as reader:
+        windows = [reader.read(start, end) for start, end in fixed_windows(reader.num_samples, CHUNK_LENGTH_MS)]
+    audio_seconds = sum(len(window) for window in windows) / 16000
+
+    reference = None
+    if REFERENCE_TEXT:
+        with open(REFERENCE_TEXT, encoding="utf-8") as f:
+            reference = f.read().strip()
+
+    device = torch.device("cpu")
+    print(f"Model: {MODEL_NAME}, clip: {REFERENCE_AUDIO} ({audio_seconds:.0f}s), {torch.get_num_threads()} threads\n")
+
+    results = []
+    for backend in BACKENDS:
+        try:
+            text, load_time, warmup_time, elapsed = run_backend(backend, device, windows)
+        except Exception as e:
+            print(f"{backend:<14} unavailable: {e}")
+            continue
+        if reference is None:
+            reference = text  # fp32 runs first
+        results.append({
+            "backend": backend,
+            "load_seconds": round(load_time, 2),
+            "warmup_seconds": round(warmup_time, 2),
+            "transcribe_seconds": round(elapsed, 2),
+            "rtf": round(elapsed / audio_seconds, 4),
+            "cer": round(cer(reference, text), 4),
+            "wer": round(wer(reference, text), 4),
+        })
+        print(json.dumps(results[-1]))
+
+    fp32_time = next((r["transcribe_seconds"] for r in results if r["backend"] == "fp32"), None)
+    lines = [
+        f"# ASR backend report: {MODEL_NAME}",
+        "",
+        f"Clip: `{REFERENCE_AUDIO}` ({audio_seconds:.0f}s), reference: "
+        f"{'`' + REFERENCE_TEXT + '`' if REFERENCE_TEXT else 'fp32 output'}, {torch.get_num_threads()} CPU threads",
+        "",
+        "| backend | load (s) | warm-up (s) | transcribe (s) | RTF | speedup vs fp32 | CER | WER |",
+        "|---|---|---|---|---|---|---|---|",
+    ]
+    for r in results:
+        speedup = f"{fp32_time / r['transcribe_seconds']:.2f}x" if fp32_time else "-"
+        lines.append(
+            f"| {r['backend']} | {r['load_seconds']} | {r['warmup_seconds']} | {r['transcribe_seconds']} | "
+            f"{r['rtf']} | {speedup} | {r['cer']:.2%} | {r['wer']:.2%} |"
+        )
+
+    os.makedirs(os.path.dirname(REPORT_FILE), exist_ok=True)
+    with open(REPORT_FILE, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+    print("\n" + "\n".join(lines))
+    print(f"\nReport written: {REPORT_FILE}")
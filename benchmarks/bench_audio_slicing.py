@@ -0,0 +1,108 @@
+import io
+import os
+import sys
+import time
+import wave
+import tempfile
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from audio_utils import load_audio, slice_segment
+
+# === Config ===
+# Usage: python benchmarks/bench_audio_slicing.py [audio.wav]
+# Without an argument a synthetic call recording is generated.
+SYNTHETIC_SECONDS = 600
+SYNTHETIC_SAMPLE_RATE = 44100  # Forces the resampling path like an unconverted recording
+SYNTHETIC_CHANNELS = 2
+NUM_SEGMENTS = 300
+# ==============
+
+
+def write_synthetic_wav(path, seconds, sample_rate, channels):
+    rng = np.random.default_rng(0)
+    samples = (rng.standard_normal((seconds * sample_rate, channels)) * 3000).astype('<i2')
+    with wave.open(path, 'wb') as wav:
+        wav.setnchannels(channels)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(samples.tobytes())
+
+
+def random_segments(total_seconds, count):
+    # Diarization-like turns: sorted, 0.3 s to 12 s long
+    rng = np.random.default_rng(1)
+    starts = np.sort(rng.uniform(0, total_seconds - 12, count))
+    lengths = rng.uniform(0.3, 12, count)
+    return [(float(s), float(s + l)) for s, l in zip(starts, lengths)]
+
+
+# === Current path: pydub slice -> WAV export -> torchaudio.load -> Resample ===
+def pydub_path(audio_file, segments):
+    from pydub import AudioSegment
+    import torchaudio
+
+    full_audio = AudioSegment.from_wav(audio_file)
+    waveforms = []
+    for start, end in segments:
+        segment_audio = full_audio[int(start * 1000):int(end * 1000)]
+        buffer = io.BytesIO()
+        segment_audio.export(buffer, format="wav")
+        buffer.seek(0)
+        waveform, sample_rate = torchaudio.load(buffer)
+        if sample_rate != 16000:
+            resampler = torchaudio.transforms.Resample(orig_freq=sample_rate, new_freq=16000)
+            waveform = resampler(waveform)
+        if waveform.shape[0] > 1:
+            waveform = waveform.mean(dim=0, keepdim=True)
+        waveforms.append(waveform.squeeze().numpy())
+    return waveforms
+
+
+# === New path: decode once, slice views ===
+def array_path(audio_file, segments):
+    full_audio = load_audio(audio_file)
+    return [slice_segment(full_audio, start, end) for start, end in segments]
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    with tempfile.TemporaryDirectory() as tmp:
+        if len(sys.argv) > 1:
+            audio_file = sys.argv[1]
+        else:
+            audio_file = os.path.join(tmp, 'synthetic.wav')
+            write_synthetic_wav(audio_file, SYNTHETIC_SECONDS, SYNTHETIC_SAMPLE_RATE, SYNTHETIC_CHANNELS)
+
+        with wave.open(audio_file, 'rb') as wav:
+            total_seconds = wav.getnframes() / wav.getframerate()
+        segments = random_segments(total_seconds, NUM_SEGMENTS)
+
+        new_waveforms, new_time = timed(array_path, audio_file, segments)
+        print(f"Audio: {audio_file} ({total_seconds:.0f}s), {len(segments)} segments")
+        print(f"decode once + views : {new_time:.3f}s")
+
+        try:
+            old_waveforms, old_time = timed(pydub_path, audio_file, segments)
+        except Exception as e:
+            print(f"pydub + torchaudio  : unavailable ({type(e).__name__})")
+            sys.exit(0)
+
+        print(f"pydub + torchaudio  : {old_time:.3f}s")
+        print(f"speedup             : {old_time / new_time:.1f}x")
+
+        # Per-segment resampling rounds lengths and has edge effects, so allow
+        # one sample of length difference and compare interior samples only
+        same_bounds = all(abs(len(a) - len(b)) <= 1 for a, b in zip(old_waveforms, new_waveforms))
+        max_diff = max(
+            float(np.abs(a[64:n - 64] - b[64:n - 64]).max())
+            for a, b in zip(old_waveforms, new_waveforms)
+            for n in [min(len(a), len(b))] if n > 128
+        )
+        print(f"same boundaries     : {same_bounds}")
+        print(f"max interior diff   : {max_diff:.2e}")
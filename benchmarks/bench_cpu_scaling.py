@@ -0,0 +1,71 @@
+import os
+import sys
+import time
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from parallel_asr import ShardedTranscriber
+from bench_audio_slicing import write_synthetic_wav, random_segments
+
+# === Config ===
+# Usage: python benchmarks/bench_cpu_scaling.py [model_name_or_path] [audio.wav]
+MODEL_NAME = sys.argv[1] if len(sys.argv) > 1 else "biodatlab/whisper-th-large-v3"
+WORKER_COUNTS = [1, 2, 4, 8]
+SYNTHETIC_SECONDS = 300
+NUM_SEGMENTS = 60
+BATCH_SIZE = 4
+MAX_NEW_TOKENS = 64
+# ==============
+
+
+def run(audio_file, segments, num_workers):
+    starts = [start for start, _ in segments]
+    ends = [end for _, end in segments]
+    asr = ShardedTranscriber(MODEL_NAME, num_workers, batch_size=BATCH_SIZE, max_new_tokens=MAX_NEW_TOKENS)
+    try:
+        load_start = time.perf_counter()
+        asr.warm_up()
+        load_time = time.perf_counter() - load_start
+
+        start = time.perf_counter()
+        texts = asr(audio_file, starts, ends)
+        elapsed = time.perf_counter() - start
+    finally:
+        asr.close()
+    return texts, load_time, elapsed
+
+
+if __name__ == '__main__':
+    with tempfile.TemporaryDirectory() as tmp:
+        if len(sys.argv) > 2:
+            audio_file = sys.argv[2]
+        else:
+            audio_file = os.path.join(tmp, 'synthetic.wav')
+            write_synthetic_wav(audio_file, SYNTHETIC_SECONDS, 16000, 1)
+
+        import wave
+        with wave.open(audio_file, 'rb') as wav:
+            total_seconds = wav.getnframes() / wav.getframerate()
+        segments = random_segments(total_seconds, NUM_SEGMENTS)
+        audio_seconds = sum(end - start for start, end in segments)
+
+        print(f"Model: {MODEL_NAME}, {os.cpu_count()} cores")
+        print(f"{len(segments)} segments, {audio_seconds:.0f}s of speech\n")
+        print(f"{'workers':>7} | {'threads':>7} | {'load':>7} | {'asr':>8} | {'seg/s':>7} | {'speedup':>7} | {'efficiency':>10}")
+        print("-" * 72)
+
+        baseline = None
+        reference_texts = None
+        for num_workers in WORKER_COUNTS:
+            if num_workers > (os.cpu_count() or 1):
+                print(f"{num_workers:>7} | skipped (more workers than cores)")
+                continue
+            texts, load_time, elapsed = run(audio_file, segments, num_workers)
+            baseline = baseline or elapsed
+            reference_texts = reference_texts or texts
+            threads = max(1, (os.cpu_count() or 1) // num_workers)
+            speedup = baseline / elapsed
+            print(f"{num_workers:>7} | {threads:>7} | {load_time:>6.1f}s | {elapsed:>7.1f}s | "
+                  f"{len(segments) / elapsed:>7.2f} | {speedup:>6.2f}x | {speedup / num_workers:>9.0%}")
+            if texts != reference_texts:
+                print("        ! output differs from the 1-worker run")
@@ -0,0 +1,103 @@
+import os
+import sys
+import time
+import tempfile
+import importlib.util
+import numpy as np
+from docx import Document
+from docx.shared import RGBColor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from docx_writer import write_highlighted_text
+from bench_keyword_matching import synthetic_transcript
+
+# === Config ===
+# Usage: python benchmarks/bench_docx_writer.py
+TRANSCRIPT_CHARS = [20_000, 200_000, 1_000_000]
+HIGHLIGHTS_PER_1K_CHARS = 10
+TURN_CHARS = 300  # Average speaker turn length for the per-turn layout
+COLORS = [(255, 255, 0), (0, 255, 0), (64, 224, 208), (255, 0, 255), (200, 30, 30)]
+# ==============
+
+
+def load_script():
+    path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "2 keyword_highlight.py")
+    spec = importlib.util.spec_from_file_location("keyword_highlight", path)
+    script = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(script)
+    return script
+
+
+def synthetic_runs(num_chars):
+    # Alternating plain and highlighted runs, like SpanStore.segments output
+    rng = np.random.default_rng(2)
+    count = num_chars * HIGHLIGHTS_PER_1K_CHARS // 1000
+    cuts = np.unique(rng.integers(1, num_chars, count * 2))
+    bounds = [0] + cuts.tolist() + [num_chars]
+    return [
+        (start, end, COLORS[rng.integers(len(COLORS))] if k % 2 else None)
+        for k, (start, end) in enumerate(zip(bounds, bounds[1:]))
+    ]
+
+
+def synthetic_turns(num_chars):
+    bounds = list(range(0, num_chars, TURN_CHARS)) + [num_chars]
+    return [(start, end - 1, f"[00:00:{k % 60:02d}] SPEAKER_0{k % 2}: ") for k, (start, end) in enumerate(zip(bounds, bounds[1:]))]
+
+
+# === Previous path: python-docx run per highlight, color lookup per run ===
+def python_docx_path(script, full_text, runs, output_file):
+    document = Document()
+    p = document.add_paragraph()
+    for start, end, color in runs:
+        run = p.add_run(full_text[start:end])
+        if color is not None:
+            font = run.font
+            font.color.rgb = RGBColor(0, 0, 0)
+            font.highlight_color = script.get_closest_wd_color_index(color)
+    document.save(output_file)
+
+
+# === New path: bulk XML runs, color lookup per color ===
+def writer_path(script, full_text, runs, output_file, turns=None):
+    document = Document()
+    highlight_index = {color: script.get_closest_wd_color_index(color) for color in COLORS}
+    write_highlighted_text(document, full_text, runs, highlight_index, turns)
+    document.save(output_file)
+
+
+def visible_runs(docx_file):
+    # (text, highlight) with neighbouring runs of one highlight joined
+    runs = []
+    for paragraph in Document(docx_file).paragraphs:
+        for run in paragraph.runs:
+            if runs and runs[-1][1] == run.font.highlight_color:
+                runs[-1][0] += run.text
+            else:
+                runs.append([run.text, run.font.highlight_color])
+    return runs
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    script = load_script()
+    print(f"{'chars':>10} | {'runs':>7} | {'python-docx':>11} | {'writer':>8} | {'speedup':>7} | {'per-turn':>8}")
+    print("-" * 68)
+    with tempfile.TemporaryDirectory() as tmp:
+        for num_chars in TRANSCRIPT_CHARS:
+            full_text = synthetic_transcript(num_chars)
+            runs = synthetic_runs(len(full_text))
+            old_file, new_file, turns_file = (os.path.join(tmp, name) for name in ("old.docx", "new.docx", "turns.docx"))
+
+            old_time = timed(python_docx_path, script, full_text, runs, old_file)
+            new_time = timed(writer_path, script, full_text, runs, new_file)
+            turns_time = timed(writer_path, script, full_text, runs, turns_file, synthetic_turns(len(full_text)))
+            print(f"{len(full_text):>10,} | {len(runs):>7,} | {old_time:>10.2f}s | {new_time:>7.2f}s | "
+                  f"{old_time / new_time:>6.1f}x | {turns_time:>7.2f}s")
+            if visible_runs(old_file) != visible_runs(new_file):
+                print("           ! document differs from the python-docx version")
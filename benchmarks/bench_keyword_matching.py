@@ -0,0 +1,96 @@
+import os
+import re
+import sys
+import time
+import importlib.util
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from keyword_matcher import KeywordMatcher
+
+# === Config ===
+# Usage: python benchmarks/bench_keyword_matching.py [transcript.csv|txt keywords.csv]
+# Without arguments, synthetic transcripts and keyword sheets are generated in
+# every combination of the sizes below.
+TRANSCRIPT_CHARS = [20_000, 200_000, 1_000_000]
+KEYWORD_ROWS = [50, 500]
+MAX_CONTEXT_WINDOW = 100
+VOCABULARY = [
+    "สวัสดี", "ครับ", "ค่ะ", "สินเชื่อ", "ดอกเบี้ย", "บุคคล", "วงเงิน", "อนุมัติ", "เอกสาร", "เงินเดือน",
+    "ผ่อน", "ต่อเดือน", "บัตร", "ประชาชน", "ธนาคาร", "โปรโมชั่น", "ลูกค้า", "สมัคร", "ยืนยัน", "ตัวตน",
+    "loan", "rate", "OK", "app", "KTB", "Next",
+]
+# ==============
+
+
+def synthetic_transcript(num_chars):
+    rng = np.random.default_rng(0)
+    words = []
+    length = 0
+    while length < num_chars:
+        word = VOCABULARY[rng.integers(len(VOCABULARY))]
+        words.append(word)
+        length += len(word) + 1
+    return " ".join(words)
+
+
+def synthetic_sequences(num_rows):
+    # 1 to 4 keywords per row, like the product keyword sheets
+    rng = np.random.default_rng(1)
+    return [
+        [VOCABULARY[k] for k in rng.choice(len(VOCABULARY), rng.integers(1, 5), replace=False)]
+        for _ in range(num_rows)
+    ]
+
+
+def load_script_inputs(transcript_file, keywords_file):
+    path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "2 keyword_highlight.py")
+    spec = importlib.util.spec_from_file_location("keyword_highlight", path)
+    script = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(script)
+    full_text = script.load_transcript(transcript_file)
+    keyword_groups = script.load_keyword_patterns(keywords_file)
+    return full_text, [keywords for data in keyword_groups.values() for _, keywords, _ in data["patterns"]]
+
+
+# === Previous path: one lazy-gap regex per keyword sequence ===
+def regex_spans(full_text, sequences):
+    spans = []
+    for keywords in sequences:
+        pattern = (r'.{0,%d}?' % MAX_CONTEXT_WINDOW).join(map(re.escape, keywords))
+        pattern = re.compile(pattern, re.IGNORECASE | re.DOTALL)
+        spans.append([(match.start(), match.end()) for match in pattern.finditer(full_text)])
+    return spans
+
+
+# === New path: one Aho–Corasick scan, then the sequence constraints ===
+def matcher_spans(full_text, sequences):
+    return KeywordMatcher(sequences, max_gap=MAX_CONTEXT_WINDOW).find_all(full_text)
+
+
+def run(full_text, sequences):
+    start = time.perf_counter()
+    expected = regex_spans(full_text, sequences)
+    regex_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    spans = matcher_spans(full_text, sequences)
+    matcher_time = time.perf_counter() - start
+
+    num_matches = sum(len(s) for s in expected)
+    print(f"{len(full_text):>10,} | {len(sequences):>5} | {num_matches:>8,} | {regex_time:>8.3f}s | "
+          f"{matcher_time:>8.3f}s | {regex_time / matcher_time:>6.1f}x")
+    if spans != expected:
+        print("           ! spans differ from the regex version")
+
+
+if __name__ == '__main__':
+    print(f"{'chars':>10} | {'rows':>5} | {'matches':>8} | {'regex':>9} | {'matcher':>9} | {'speedup':>7}")
+    print("-" * 66)
+    if len(sys.argv) > 2:
+        run(*load_script_inputs(sys.argv[1], sys.argv[2]))
+    else:
+        for num_chars in TRANSCRIPT_CHARS:
+            full_text = synthetic_transcript(num_chars)
+            for num_rows in KEYWORD_ROWS:
+                run(full_text, synthetic_sequences(num_rows))
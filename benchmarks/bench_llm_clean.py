@@ -0,0 +1,63 @@
+import os
+import sys
+import time
+import tempfile
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from llm_clean import LLMCleaner
+from ollama_stub import OllamaStub
+from bench_keyword_matching import VOCABULARY
+
+# === Config ===
+# Usage: python benchmarks/bench_llm_clean.py
+# Runs against benchmarks/ollama_stub.py on a free local port, so no model
+# or Ollama install is needed; the stub's latency settings stand in for one.
+NUM_SEGMENTS = 200
+REPEATED_SHARE = 0.3  # Backchannels like "ครับ" / "ค่ะ" that recur all through a call
+BAD_ANSWER_RATE = 0.05
+# ==============
+
+
+def synthetic_segments(count):
+    rng = np.random.default_rng(3)
+    segments = []
+    for _ in range(count):
+        if rng.random() < REPEATED_SHARE:
+            segments.append(["ครับ", "ค่ะ", "ใช่ ครับ"][rng.integers(3)])
+        else:
+            segments.append(" ".join(VOCABULARY[k] for k in rng.integers(len(VOCABULARY), size=rng.integers(3, 12))))
+    return segments
+
+
+def run(name, stub, cleaner, segments):
+    requests = stub.requests
+    start = time.perf_counter()
+    cleaned = cleaner.clean(segments)
+    elapsed = time.perf_counter() - start
+    print(f"{name:<28} | {elapsed:>7.2f}s | {stub.requests - requests:>8} | {cleaner.stats['cache_hits']:>6} | "
+          f"{cleaner.stats['fallbacks']:>9}")
+    return cleaned
+
+
+if __name__ == '__main__':
+    segments = synthetic_segments(NUM_SEGMENTS)
+    stub = OllamaStub(port=0, bad_answer_rate=BAD_ANSWER_RATE).start()
+    print(f"{len(segments)} segments, stub at {stub.host}\n")
+    print(f"{'mode':<28} | {'time':>8} | {'requests':>8} | {'cached':>6} | {'fallbacks':>9}")
+    print("-" * 72)
+    try:
+        with tempfile.TemporaryDirectory() as cache_dir:
+            # Notebook behaviour: one request per row, one at a time, no cache
+            serial = run("serial, 1 text/request", stub,
+                         LLMCleaner(host=stub.host, concurrency=1, pack_size=1, cache_dir=None), segments)
+            packed = run("async, packed (cold cache)", stub,
+                         LLMCleaner(host=stub.host, cache_dir=cache_dir), segments)
+            cached = run("async, packed (warm cache)", stub,
+                         LLMCleaner(host=stub.host, cache_dir=cache_dir), segments)
+        if not packed == cached:
+            print("! cached output differs")
+        differing = sum(a != b for a, b in zip(serial, packed))
+        print(f"\n{differing} segments differ between serial and packed (stub answer failures fall back to regex)")
+    finally:
+        stub.stop()
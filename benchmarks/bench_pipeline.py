@@ -0,0 +1,375 @@
+import os
+import sys
+import json
+import time
+import wave
+import platform
+import resource
+import tempfile
+import subprocess
+import statistics
+import importlib.util
+import numpy as np
+import pandas as pd
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+from bench_keyword_matching import VOCABULARY, synthetic_sequences
+
+# === Config ===
+# Usage: python benchmarks/bench_pipeline.py [audio_seconds]
+# End-to-end run of the three entry scripts on synthetic fixtures: a generated
+# two-speaker recording, its reference speaker turns, a keyword sheet and a
+# transcript. ASR uses a tiny randomly initialized Whisper built on the spot,
+# so everything runs offline on CPU; its text is noise, only the timings
+# mean anything. Each script runs in its own process, so import time and
+# peak RSS are its own. Results are appended to HISTORY_FILE, and the exit
+# status is 1 when a metric is worse than the median of the last
+# BASELINE_RUNS comparable runs by more than REGRESSION_THRESHOLD.
+AUDIO_SECONDS = float(sys.argv[1]) if len(sys.argv) > 1 and sys.argv[1] != "--run" else 120.0
+TRANSCRIPT_SEGMENTS = 2000  # Highlighting input, much longer than the tiny model's output
+KEYWORD_ROWS = 200
+SCRIPTS = ["1 transcribe.py", "1 transcribe_without_diarization.py", "2 keyword_highlight.py"]
+HISTORY_FILE = os.path.join(REPO_DIR, "benchmarks", "results", "pipeline_history.json")
+REGRESSION_THRESHOLD = 0.15
+BASELINE_RUNS = 5
+# Lower is better for all of these except segments_per_second
+TRACKED_METRICS = {"wall_seconds": False, "rtf": False, "peak_rss_mb": False, "segments_per_second": True}
+# ==============
+
+
+# === Fixtures ===
+def build_tiny_whisper(path):
+    # A 2-layer, 64-wide Whisper with a byte-level vocabulary, Whisper's
+    # special and timestamp tokens, and random weights (seeded)
+    import torch
+    from transformers import (GenerationConfig, WhisperConfig, WhisperFeatureExtractor,
+                              WhisperForConditionalGeneration, WhisperProcessor, WhisperTokenizer)
+    from transformers.convert_slow_tokenizer import bytes_to_unicode
+
+    os.makedirs(path, exist_ok=True)
+    vocab = {char: i for i, char in enumerate(bytes_to_unicode().values())}
+    specials = ["<|endoftext|>", "<|startoftranscript|>", "<|en|>", "<|th|>", "<|translate|>", "<|transcribe|>",
+                "<|startoflm|>", "<|startofprev|>", "<|nocaptions|>", "<|notimestamps|>"]
+    for token in specials + ["<|%.2f|>" % (i * 0.02) for i in range(1501)]:
+        vocab[token] = len(vocab)
+    with open(os.path.join(path, "vocab.json"), "w") as f:
+        json.dump(vocab, f)
+    with open(os.path.join(path, "merges.txt"), "w") as f:
+        f.write("#version: 0.2\n")
+
+    eos = vocab["<|endoftext|>"]
+    tokenizer = WhisperTokenizer(os.path.join(path, "vocab.json"), os.path.join(path, "merges.txt"),
+                                 unk_token="<|endoftext|>", bos_token="<|endoftext|>", eos_token="<|endoftext|>",
+                                 pad_token="<|endoftext|>")
+    tokenizer.add_special_tokens({"additional_special_tokens": specials[1:]})
+    WhisperProcessor(feature_extractor=WhisperFeatureExtractor(feature_size=80), tokenizer=tokenizer).save_pretrained(path)
+
+    config = WhisperConfig(vocab_size=len(vocab), d_model=64, encoder_layers=2, decoder_layers=2,
+                           encoder_attention_heads=2, decoder_attention_heads=2, encoder_ffn_dim=128,
+                           decoder_ffn_dim=128, num_mel_bins=80, max_source_positions=1500,
+                           max_target_positions=448, pad_token_id=eos, bos_token_id=eos, eos_token_id=eos,
+                           decoder_start_token_id=vocab["<|startoftranscript|>"])
+    torch.manual_seed(0)
+    model = WhisperForConditionalGeneration(config)
+    model.generation_config = GenerationConfig(
+        decoder_start_token_id=vocab["<|startoftranscript|>"], eos_token_id=eos, pad_token_id=eos, bos_token_id=eos,
+        no_timestamps_token_id=vocab["<|notimestamps|>"], is_multilingual=True,
+        lang_to_id={"<|en|>": vocab["<|en|>"], "<|th|>": vocab["<|th|>"]},
+        task_to_id={"translate": vocab["<|translate|>"], "transcribe": vocab["<|transcribe|>"]},
+        max_initial_timestamp_index=50, begin_suppress_tokens=[eos], max_length=448,
+    )
+    model.save_pretrained(path)
+
+
+def synthetic_recording(path, seconds, sample_rate=16000):
+    # Alternating speakers with different pitches, syllable-rate amplitude
+    # modulation and pauses between turns. Returns the reference turns in the
+    # diarization DataFrame format.
+    rng = np.random.default_rng(0)
+    audio = np.zeros(int(seconds * sample_rate), dtype=np.float32)
+    turns = []
+    position = 0.5
+    speaker = 0
+    while position < seconds - 1.0:
+        end = min(position + rng.uniform(1.0, 8.0), seconds)
+        t = np.arange(int((end - position) * sample_rate)) / sample_rate
+        pitch = (120.0, 210.0)[speaker] * (1 + 0.05 * np.sin(2 * np.pi * 0.7 * t))
+        voice = sum(np.sin(2 * np.pi * k * np.cumsum(pitch) / sample_rate) / k for k in range(1, 6))
+        envelope = 0.5 + 0.5 * np.sin(2 * np.pi * rng.uniform(3.0, 5.0) * t)
+        start_sample = int(position * sample_rate)
+        audio[start_sample:start_sample + len(t)] = 0.2 * voice * envelope + 0.01 * rng.standard_normal(len(t))
+        turns.append({'start': position, 'end': end, 'speaker': f"SPEAKER_{speaker:02d}"})
+        position = end + rng.uniform(0.2, 1.5)
+        speaker = 1 - speaker
+    audio += 0.002 * rng.standard_normal(len(audio)).astype(np.float32)
+
+    with wave.open(path, 'wb') as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(sample_rate)
+        f.writeframes((np.clip(audio, -1, 1) * 32767).astype('<i2').tobytes())
+    return pd.DataFrame(turns, columns=['start', 'end', 'speaker'])
+
+
+def synthetic_transcript(path, num_segments):
+    rng = np.random.default_rng(2)
+    rows = []
+    position = 0.0
+    for i in range(num_segments):
+        duration = rng.uniform(1.0, 8.0)
+        words = rng.integers(len(VOCABULARY), size=rng.integers(3, 20))
+        rows.append({'start': round(position, 2), 'end': round(position + duration, 2),
+                     'speaker': f"SPEAKER_{i % 2:02d}", 'text': " ".join(VOCABULARY[k] for k in words)})
+        position += duration + rng.uniform(0.2, 1.5)
+    pd.DataFrame(rows).to_csv(path, index=False, encoding='utf-8')
+
+
+def synthetic_keyword_sheet(path, num_rows):
+    # The layout 2 keyword_highlight.py reads: group in column 1, keywords in
+    # columns 3-10, color in column 12
+    colors = ["#FFFF00", "#00FF00", "#00FFFF", "#FF00FF", "#FF0000"]
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("id,group,note,k1,k2,k3,k4,k5,k6,k7,k8,k9,color\n")
+        for i, keywords in enumerate(synthetic_sequences(num_rows)):
+            cells = (keywords + [""] * 9)[:9]
+            f.write(",".join([str(i), f"group {i % 25}", ""] + cells + [colors[i % len(colors)]]) + "\n")
+
+
+def build_fixtures(fixture_dir):
+    build_tiny_whisper(os.path.join(fixture_dir, "tiny-whisper"))
+    turns = synthetic_recording(os.path.join(fixture_dir, "call.wav"), AUDIO_SECONDS)
+    turns.to_csv(os.path.join(fixture_dir, "turns.csv"), index=False)
+    synthetic_transcript(os.path.join(fixture_dir, "transcript.csv"), TRANSCRIPT_SEGMENTS)
+    synthetic_keyword_sheet(os.path.join(fixture_dir, "keywords.csv"), KEYWORD_ROWS)
+
+
+# === Script Runs (each in its own process) ===
+def load_script(name):
+    spec = importlib.util.spec_from_file_location(os.path.splitext(name)[0].replace(" ", "_"),
+                                                  os.path.join(REPO_DIR, name))
+    script = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(script)
+    return script
+
+
+def timed(stages, name, fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    stages[name] = stages.get(name, 0.0) + time.perf_counter() - start
+    return result
+
+
+def run_transcribe(fixture_dir, stages):
+    from cache_utils import DiskCache, hash_file, make_key
+
+    script = timed(stages, "import", load_script, "1 transcribe.py")
+    script.model_name = os.path.join(fixture_dir, "tiny-whisper")
+    script.asr_backend = "fp32"
+    script.asr_num_workers = 1
+    audio_file = os.path.join(fixture_dir, "call.wav")
+
+    # pyannote can't run offline, so the reference turns stand in for its
+    # output: they are seeded into a fresh cache under the diarization key,
+    # and every segment still goes through ASR
+    cache = DiskCache(os.path.join(fixture_dir, "cache-transcribe"))
+    cache.set(make_key("diarization", hash_file(audio_file), script.diarization_model_name),
+              pd.read_csv(os.path.join(fixture_dir, "turns.csv")))
+
+    start = time.perf_counter()
+    df = script.transcribe_file(audio_file, None, cache)
+    script.save_transcript(df, os.path.join(fixture_dir, "out-transcribe.csv"))
+    script.close_models()
+    stages["pipeline"] = time.perf_counter() - start
+    stages.update(script.timer.totals)
+    # Segments sent to ASR; the transcript drops the ones without speech
+    return script.timer.counters.get("segments", len(df))
+
+
+def run_without_diarization(fixture_dir, stages):
+    from audio_utils import WavReader
+    from segment_utils import sliding_windows
+
+    script = timed(stages, "import", load_script, "1 transcribe_without_diarization.py")
+    script.model_name = os.path.join(fixture_dir, "tiny-whisper")
+    script.asr_backend = "fp32"
+    audio_file = os.path.join(fixture_dir, "call.wav")
+
+    start = time.perf_counter()
+    processor, model = timed(stages, "model loading", script.load_asr_model)
+    transcription = timed(stages, "transcribe", script.transcribe_file, audio_file, processor, model)
+    timed(stages, "save", script.save_transcript, transcription, os.path.join(fixture_dir, "out-transcribe.txt"))
+    stages["pipeline"] = time.perf_counter() - start
+    with WavReader(audio_file) as reader:
+        return len(sliding_windows(reader.num_samples, script.chunk_length_s, script.chunk_stride_s))
+
+
+def run_highlight(fixture_dir, stages):
+    from transcript_utils import Transcript
+
+    script = timed(stages, "import", load_script, "2 keyword_highlight.py")
+    script.KEYWORD_CACHE_DIR = os.path.join(fixture_dir, "cache-keywords")
+
+    start = time.perf_counter()
+    keyword_groups, matcher = timed(stages, "keyword index", script.load_keyword_index,
+                                    os.path.join(fixture_dir, "keywords.csv"))
+    transcript = timed(stages, "load transcript", Transcript.load, os.path.join(fixture_dir, "transcript.csv"))
+    matches = timed(stages, "match", script.find_matches, transcript.full_text, keyword_groups, matcher, transcript)
+    timed(stages, "write docx", script.create_docx_and_highlight, transcript.full_text, keyword_groups,
+          os.path.join(fixture_dir, "out-highlights.docx"), verbose=False, transcript=transcript, matches=matches)
+    stages["pipeline"] = time.perf_counter() - start
+    return len(transcript.texts)
+
+
+RUNNERS = {
+    "1 transcribe.py": run_transcribe,
+    "1 transcribe_without_diarization.py": run_without_diarization,
+    "2 keyword_highlight.py": run_highlight,
+}
+
+
+def peak_rss_mb():
+    # VmHWM is this process's own peak; on Linux ru_maxrss also counts the
+    # forked parent's peak from before exec
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 ** 2 if sys.platform == "darwin" else 1024)
+
+
+def run_script(name, fixture_dir, result_file):
+    start = time.perf_counter()
+    stages = {}
+    try:
+        segments = RUNNERS[name](fixture_dir, stages)
+    except ImportError as e:
+        result = {"skipped": f"{e}"}
+    else:
+        wall = time.perf_counter() - start
+        if name == "2 keyword_highlight.py":
+            audio_seconds = pd.read_csv(os.path.join(fixture_dir, "transcript.csv"))['end'].max()
+        else:
+            audio_seconds = AUDIO_SECONDS
+        # Processing time per second of audio, without imports and model
+        # loading (the scripts time their deferred imports inside the pipeline)
+        processing = stages["pipeline"] - sum(stages.get(stage, 0.0) for stage in
+                                              ("imports", "model loading", "diarization loading"))
+        result = {
+            "wall_seconds": round(wall, 3),
+            "rtf": round(processing / audio_seconds, 5),
+            "peak_rss_mb": round(peak_rss_mb(), 1),
+            "segments": segments,
+            "segments_per_second": round(segments / processing, 2),
+            "stages": {stage: round(seconds, 3) for stage, seconds in stages.items()},
+        }
+    with open(result_file, 'w', encoding='utf-8') as f:
+        json.dump(result, f)
+
+
+# === History and Regressions ===
+def load_history():
+    if not os.path.exists(HISTORY_FILE):
+        return []
+    with open(HISTORY_FILE, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_history(history):
+    os.makedirs(os.path.dirname(HISTORY_FILE), exist_ok=True)
+    with open(HISTORY_FILE + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(history, f, indent=2)
+    os.replace(HISTORY_FILE + '.tmp', HISTORY_FILE)
+
+
+def find_regressions(entry, history):
+    # Runs are only compared with runs on the same fixtures and machine
+    comparable = [h for h in history if h["fixture"] == entry["fixture"] and h["machine"] == entry["machine"]]
+    comparable = comparable[-BASELINE_RUNS:]
+    regressions = []
+    for script, result in entry["results"].items():
+        for metric, higher_is_better in TRACKED_METRICS.items():
+            values = [h["results"][script][metric] for h in comparable if metric in h["results"].get(script, {})]
+            if metric not in result or not values:
+                continue
+            baseline = statistics.median(values)
+            if baseline <= 0:
+                continue
+            change = (result[metric] - baseline) / baseline
+            if (-change if higher_is_better else change) > REGRESSION_THRESHOLD:
+                regressions.append((script, metric, baseline, result[metric], change))
+    return regressions, len(comparable)
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == "--run":
+        run_script(*sys.argv[2:5])
+        sys.exit(0)
+
+    import torch
+
+    entry = {
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": git_commit(),
+        "fixture": {"audio_seconds": AUDIO_SECONDS, "transcript_segments": TRANSCRIPT_SEGMENTS,
+                    "keyword_rows": KEYWORD_ROWS},
+        "machine": {"platform": platform.platform(), "processor": platform.processor(),
+                    "cpu_count": os.cpu_count(), "torch_threads": torch.get_num_threads()},
+        "results": {},
+    }
+
+    with tempfile.TemporaryDirectory() as fixture_dir:
+        print(f"Building fixtures ({AUDIO_SECONDS:.0f}s audio, {TRANSCRIPT_SEGMENTS} transcript segments, "
+              f"{KEYWORD_ROWS} keyword rows)...")
+        build_fixtures(fixture_dir)
+
+        for name in SCRIPTS:
+            result_file = os.path.join(fixture_dir, "result.json")
+            # The fixture directory is the working directory, so relative
+            # output and cache paths in the scripts stay out of the repo
+            process = subprocess.run([sys.executable, os.path.abspath(__file__), "--run", name, fixture_dir,
+                                      result_file], cwd=fixture_dir, capture_output=True, text=True)
+            if process.returncode != 0:
+                print(process.stdout[-2000:] + process.stderr[-4000:])
+                sys.exit(f"{name} failed")
+            with open(result_file, encoding='utf-8') as f:
+                entry["results"][name] = json.load(f)
+
+    print(f"\n{'script':<38} | {'wall (s)':>8} | {'RTF':>8} | {'peak RSS':>9} | {'segments/s':>10}")
+    print("-" * 86)
+    for name, result in entry["results"].items():
+        if "skipped" in result:
+            print(f"{name:<38} | skipped: {result['skipped']}")
+            continue
+        print(f"{name:<38} | {result['wall_seconds']:>8.2f} | {result['rtf']:>8.4f} | "
+              f"{result['peak_rss_mb']:>6.0f} MB | {result['segments_per_second']:>10.1f}")
+        print("    " + ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in result["stages"].items()))
+
+    history = load_history()
+    regressions, compared = find_regressions(entry, history)
+    history.append(entry)
+    save_history(history)
+    print(f"\nHistory: {HISTORY_FILE} ({len(history)} runs)")
+
+    if not compared:
+        print("No comparable earlier runs yet: this run is the baseline")
+    elif regressions:
+        print(f"\n⚠️ Regressions vs the median of the last {compared} comparable runs "
+              f"(threshold {REGRESSION_THRESHOLD:.0%}):")
+        for script, metric, baseline, value, change in regressions:
+            print(f"  {script}: {metric} {baseline:g} -> {value:g} ({change:+.1%})")
+        sys.exit(1)
+    else:
+        print(f"No regressions vs the median of the last {compared} comparable runs")
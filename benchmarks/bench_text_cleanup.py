@@ -0,0 +1,82 @@
+import os
+import re
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from text_utils import TextCleaner
+from bench_keyword_matching import VOCABULARY
+
+# === Config ===
+# Usage: python benchmarks/bench_text_cleanup.py
+# Cleans synthetic raw ASR texts (Thai words separated by spaces, a few
+# hallucination loops and Thai digits) with the old per-segment function,
+# pandas string ops, and TextCleaner's batched pass, then times each
+# optional rule on top.
+SEGMENTS = [1_000, 100_000, 1_000_000]
+REPEATS = 3
+LOOP_FRACTION = 0.02  # Segments ending in a repetition loop
+CONFUSIONS = {"สิน เชื่อ": "สินเชื่อ", "ดอก เบี้ย": "ดอกเบี้ย", "rait": "rate", "เค ที บี": "KTB", "โลน": "loan"}
+# ==============
+
+
+def clean_thai_text_per_segment(text):
+    # The cleaner the scripts used to run once per segment
+    if text == "[Transcription Error]":
+        return text
+    cleaned_text = re.sub(r'(?<=[\u0E00-\u0E7F])\s+(?=[\u0E00-\u0E7F])', '', text)
+    cleaned_text = re.sub(r'\s+', ' ', cleaned_text).strip()
+    return cleaned_text
+
+
+def clean_with_pandas(texts):
+    series = pd.Series(texts, dtype=object)
+    series = series.str.replace(r'(?<=[\u0E00-\u0E7F])\s+(?=[\u0E00-\u0E7F])', '', regex=True)
+    return series.str.replace(r'\s+', ' ', regex=True).str.strip().tolist()
+
+
+def synthetic_texts(count):
+    rng = np.random.default_rng(0)
+    vocabulary = VOCABULARY + list(CONFUSIONS) + ["๒๕", "๑๐,๐๐๐"]
+    lengths = rng.integers(3, 20, count)
+    words = rng.integers(len(vocabulary), size=int(lengths.sum()))
+    bounds = np.concatenate([[0], np.cumsum(lengths)])
+    texts = [" ".join(vocabulary[k] for k in words[bounds[i]:bounds[i + 1]]) for i in range(count)]
+    for i in rng.choice(count, int(count * LOOP_FRACTION), replace=False):
+        texts[i] += " " + "ครับ " * int(rng.integers(5, 30))
+    return texts
+
+
+def best_of(fn):
+    times = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+if __name__ == '__main__':
+    cleaners = {
+        "batched spacing": TextCleaner(),
+        "+ repetitions": TextCleaner(collapse_repetitions=True),
+        "+ thai digits": TextCleaner(collapse_repetitions=True, thai_digits=True),
+        "+ confusions": TextCleaner(collapse_repetitions=True, thai_digits=True, confusions=CONFUSIONS),
+    }
+    print(f"{'segments':>9} | {'method':<18} | {'time':>8} | {'segments/s':>11} | {'speedup':>7}")
+    print("-" * 66)
+    for count in SEGMENTS:
+        texts = synthetic_texts(count)
+        baseline, expected = best_of(lambda: [clean_thai_text_per_segment(text) for text in texts])
+        rows = [("per segment", baseline, expected)]
+        rows.append(("pandas str ops", *best_of(lambda: clean_with_pandas(texts))))
+        for name, cleaner in cleaners.items():
+            rows.append((name, *best_of(lambda: cleaner.clean_many(texts))))
+
+        for name, seconds, result in rows:
+            note = "" if name.startswith("+") or result == expected else "  ! output differs"
+            print(f"{count:>9} | {name:<18} | {seconds:>7.3f}s | {count / seconds:>11,.0f} | "
+                  f"{baseline / seconds:>6.1f}x{note}")
+        print("-" * 66)
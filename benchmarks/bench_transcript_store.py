@@ -0,0 +1,75 @@
+import os
+import sys
+import time
+import tempfile
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from transcript_store import TranscriptStore, write_store
+from transcript_utils import Transcript
+from bench_keyword_matching import VOCABULARY
+
+# === Config ===
+# Usage: python benchmarks/bench_transcript_store.py
+# Writes synthetic transcripts as CSV (the old pandas path) and .vts, then
+# times what the highlighter does with each: load and flatten the text.
+SEGMENTS = [1_000, 100_000, 1_000_000]
+REPEATS = 3
+# ==============
+
+
+def synthetic_segments(count):
+    rng = np.random.default_rng(0)
+    durations = rng.uniform(1.0, 8.0, count)
+    starts = np.cumsum(durations + rng.uniform(0.2, 1.5, count)) - durations
+    lengths = rng.integers(3, 20, count)
+    words = rng.integers(len(VOCABULARY), size=int(lengths.sum()))
+    bounds = np.concatenate([[0], np.cumsum(lengths)])
+    texts = [" ".join(VOCABULARY[k] for k in words[bounds[i]:bounds[i + 1]]) for i in range(count)]
+    return pd.DataFrame({
+        'start': starts.round(2), 'end': (starts + durations).round(2),
+        'speaker': [f"SPEAKER_{i % 2:02d}" for i in range(count)], 'text': texts,
+    })
+
+
+def best_of(fn):
+    times = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def open_store(path):
+    # Header and column views only, plus one segment's text
+    store = TranscriptStore(path)
+    text = store.text(len(store) // 2)
+    store.close()
+    return text
+
+
+if __name__ == '__main__':
+    print(f"{'segments':>9} | {'format':<6} | {'size':>9} | {'write':>8} | {'load + text':>11} | {'open (mmap)':>11}")
+    print("-" * 70)
+    with tempfile.TemporaryDirectory() as tmp:
+        for count in SEGMENTS:
+            df = synthetic_segments(count)
+            csv_file = os.path.join(tmp, f"{count}.csv")
+            vts_file = os.path.join(tmp, f"{count}.vts")
+
+            csv_write, _ = best_of(lambda: df.to_csv(csv_file, index=False, encoding='utf-8'))
+            csv_load, csv_text = best_of(lambda: Transcript.load(csv_file).full_text)
+            vts_write, _ = best_of(lambda: write_store(vts_file, df['start'], df['end'], df['speaker'], df['text']))
+            vts_load, vts_text = best_of(lambda: Transcript.load(vts_file).full_text)
+            vts_open, _ = best_of(lambda: open_store(vts_file))
+            if csv_text != vts_text:
+                print("! flattened texts differ")
+
+            for name, path, write, load, opened in [("csv", csv_file, csv_write, csv_load, None),
+                                                    ("vts", vts_file, vts_write, vts_load, vts_open)]:
+                size = os.path.getsize(path) / 1024 ** 2
+                opened = f"{opened * 1000:>9.2f}ms" if opened is not None else f"{'-':>11}"
+                print(f"{count:>9} | {name:<6} | {size:>6.1f} MB | {write:>7.3f}s | {load:>10.3f}s | {opened}")
+            print(f"{'':>9} | load speedup {csv_load / vts_load:.1f}x")
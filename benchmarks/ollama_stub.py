@@ -0,0 +1,81 @@
+import sys
+import json
+import time
+import random
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# === Config ===
+# Usage: python benchmarks/ollama_stub.py [port]
+# A stand-in for Ollama's /api/chat that answers LLMCleaner prompts by
+# removing the spaces from each text, with a latency shaped like a local
+# model: a fixed cost per request plus a cost per text, and at most
+# PARALLEL requests served at once (like OLLAMA_NUM_PARALLEL).
+PORT = int(sys.argv[1]) if len(sys.argv) > 1 else 11500
+REQUEST_SECONDS = 0.2
+TEXT_SECONDS = 0.02
+PARALLEL = 4
+# ==============
+
+
+class OllamaStub:
+    def __init__(self, port=PORT, request_seconds=REQUEST_SECONDS, text_seconds=TEXT_SECONDS, parallel=PARALLEL,
+                 bad_answer_rate=0.0):
+        self.request_seconds = request_seconds
+        self.text_seconds = text_seconds
+        self.bad_answer_rate = bad_answer_rate
+        self.slots = threading.Semaphore(parallel)
+        self.requests = 0
+        self.random = random.Random(0)
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self.host = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def answer(self, prompt):
+        # The texts are the JSON array on their own line of the prompt
+        texts = next(json.loads(line) for line in prompt.splitlines() if line.startswith("["))
+        with self.slots:
+            time.sleep(self.request_seconds + self.text_seconds * len(texts))
+        if self.random.random() < self.bad_answer_rate:
+            return "Sorry, here is the cleaned text:"
+        return json.dumps({"texts": [text.replace(" ", "") for text in texts]}, ensure_ascii=False)
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                if self.path != "/api/chat":
+                    self.send_error(404)
+                    return
+                request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                stub.requests += 1
+                body = json.dumps({
+                    "model": request["model"],
+                    "created_at": "2025-01-01T00:00:00Z",
+                    "message": {"role": "assistant", "content": stub.answer(request["messages"][-1]["content"])},
+                    "done": True,
+                }).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+if __name__ == '__main__':
+    stub = OllamaStub()
+    print(f"Ollama stub listening on {stub.host}")
+    stub.server.serve_forever()
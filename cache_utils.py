@@ -0,0 +1,91 @@
+import os
+import json
+import pickle
+import hashlib
+
+
+# === Keys ===
+def hash_file(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def make_key(*parts):
+    # Stable key for any JSON-serialisable parts (content hash, model name,
+    # generation parameters, segment boundaries, ...)
+    payload = json.dumps(parts, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+# === On-disk Cache ===
+class DiskCache:
+    # Pickled values stored under their key, with least-recently-used eviction
+    # once the directory grows past max_bytes. Reads refresh a file's mtime,
+    # which is what the eviction order is based on.
+    def __init__(self, cache_dir, max_bytes=2 * 1024 ** 3):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+        self.total_bytes = sum(size for _, _, size in self._entries())
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + '.pkl')
+
+    def _entries(self):
+        for root, _, names in os.walk(self.cache_dir):
+            for name in names:
+                if name.endswith('.pkl'):
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    yield path, stat.st_mtime, stat.st_size
+
+    def get(self, key, default=None):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                value = pickle.load(f)
+        except FileNotFoundError:
+            return default
+        except Exception:
+            # Truncated or unreadable entry: drop it and treat as a miss
+            self._remove(path)
+            return default
+        os.utime(path)
+        return value
+
+    def set(self, key, value):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        if os.path.exists(path):
+            self.total_bytes -= os.path.getsize(path)
+        os.replace(tmp_path, path)
+        self.total_bytes += os.path.getsize(path)
+        if self.total_bytes > self.max_bytes:
+            self.evict()
+
+    def evict(self):
+        # Oldest first, down to 90% of the budget so we don't evict on every set
+        target = self.max_bytes * 0.9
+        entries = sorted(self._entries(), key=lambda entry: entry[1])
+        self.total_bytes = sum(size for _, _, size in entries)
+        for path, _, size in entries:
+            if self.total_bytes <= target:
+                break
+            self._remove(path)
+
+    def _remove(self, path):
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+            self.total_bytes -= size
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,215 @@
+import numpy as np
+from audio_utils import SAMPLE_RATE, WavReader
+from cache_utils import make_key
+
+# === Windowed Diarization ===
+# pyannote holds the whole recording (and its segmentation and embedding
+# outputs) in memory, and a crash near the end loses the whole run. For long
+# recordings the audio is instead diarized in overlapping windows read from
+# disk, so peak memory is bounded by the window length. Each window's raw
+# result (turns with window-local labels + one embedding per local speaker)
+# is checkpointed in the result cache, so a rerun after a crash only
+# diarizes the windows that are missing. Local labels are then mapped to
+# recording-wide speakers by comparing the pipeline's speaker embeddings,
+# and every window keeps the turns in its half of each overlap.
+DEFAULT_MAX_DISTANCE = 0.7  # Cosine distance; pyannote 3.1 clusters at about 0.70
+
+
+def diarization_windows(duration, window_seconds, overlap_seconds):
+    # (start, end) in seconds, consecutive windows overlapping by overlap_seconds
+    if not 0 <= overlap_seconds < window_seconds:
+        raise ValueError("overlap_seconds must be in [0, window_seconds)")
+    windows = []
+    start = 0.0
+    while True:
+        end = min(start + window_seconds, duration)
+        windows.append((start, end))
+        if end >= duration:
+            return windows
+        start += window_seconds - overlap_seconds
+
+
+def usable_embeddings(embeddings):
+    # Rows that are real embeddings. pyannote marks speakers it could not
+    # embed with NaN rows, and pads with all-zero rows when there are more
+    # active speakers than clusters.
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    if not len(embeddings):
+        return np.zeros(0, dtype=bool)
+    return np.isfinite(embeddings).all(axis=1) & (np.abs(embeddings).sum(axis=1) > 0)
+
+
+def split_output(output):
+    # (annotation, embeddings) from a pipeline called with
+    # return_embeddings=True; embeddings[k] belongs to annotation.labels()[k]
+    # (NaN or zero rows for speakers pyannote could not embed)
+    if hasattr(output, "speaker_embeddings"):
+        diarization, embeddings = output.speaker_diarization, output.speaker_embeddings  # pyannote 4
+    else:
+        diarization, embeddings = output
+    count = len(diarization.labels())
+    if embeddings is None or len(embeddings) < count:
+        embeddings = np.full((count, 1), np.nan, dtype=np.float32)
+    return diarization, np.asarray(embeddings, dtype=np.float32)[:count]
+
+
+def speaker_embeddings(diarization, embeddings):
+    # {label: embedding} for the labels that have one
+    labels = diarization.labels()
+    return {label: vector for label, vector, usable in zip(labels, embeddings, usable_embeddings(embeddings)) if usable}
+
+
+def run_pipeline(pipeline, samples):
+    # Diarizes an in-memory mono 16 kHz window, returns (turns, embeddings):
+    # turns as (start, end, local speaker index) relative to the window, and
+    # embeddings[k] for local speaker k
+    import torch
+
+    waveform = torch.from_numpy(samples).unsqueeze(0)
+    diarization, embeddings = split_output(
+        pipeline({"waveform": waveform, "sample_rate": SAMPLE_RATE}, return_embeddings=True)
+    )
+    labels = diarization.labels()
+    index = {label: k for k, label in enumerate(labels)}
+    turns = [(segment.start, segment.end, index[speaker])
+             for segment, _, speaker in diarization.itertracks(yield_label=True)]
+    return turns, embeddings
+
+
+def _normalize(vectors):
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms > 0, norms, 1)
+
+
+def _overlap_seconds(turns_a, turns_b, start, end):
+    # Seconds during [start, end] where a turn of turns_a and one of turns_b overlap
+    total = 0.0
+    for a_start, a_end in turns_a:
+        for b_start, b_end in turns_b:
+            total += max(0.0, min(a_end, b_end, end) - max(a_start, b_start, start))
+    return total
+
+
+class SpeakerReconciler:
+    # Recording-wide speakers, each with the running mean of the embeddings
+    # of the window-local speakers mapped to it. Matching is one-to-one per
+    # window (the pipeline already decided that two local speakers differ),
+    # closest pairs first, up to max_distance. A local speaker without a
+    # usable embedding is matched by how long it overlaps a speaker's turns in
+    # the previous window's overlap region instead.
+    def __init__(self, max_distance=DEFAULT_MAX_DISTANCE):
+        self.max_distance = max_distance
+        self.centroids = []  # Sum of normalized embeddings, None without any
+
+    def assign(self, embeddings, overlap_votes=None):
+        # embeddings: (local speakers, dim); overlap_votes: {(local, global): seconds}.
+        # Returns the global speaker index of every local speaker.
+        count = len(embeddings)
+        mapping = [None] * count
+        taken = set()
+        valid = usable_embeddings(embeddings)
+
+        known = [k for k, centroid in enumerate(self.centroids) if centroid is not None]
+        if known and valid.any():
+            centroids = _normalize(np.stack([self.centroids[k] for k in known]))
+            distances = 1 - _normalize(embeddings[valid]) @ centroids.T
+            local_ids = np.flatnonzero(valid)
+            for flat in np.argsort(distances, axis=None):
+                row, column = divmod(int(flat), len(known))
+                if distances[row, column] > self.max_distance:
+                    break
+                local, speaker = int(local_ids[row]), known[column]
+                if mapping[local] is None and speaker not in taken:
+                    mapping[local] = speaker
+                    taken.add(speaker)
+
+        for (local, speaker), seconds in sorted((overlap_votes or {}).items(), key=lambda item: -item[1]):
+            if mapping[local] is None and not valid[local] and speaker not in taken and seconds > 0:
+                mapping[local] = speaker
+                taken.add(speaker)
+
+        for local in range(count):
+            if mapping[local] is None:
+                mapping[local] = len(self.centroids)
+                self.centroids.append(None)
+            if valid[local]:
+                speaker = mapping[local]
+                vector = _normalize(embeddings[local])
+                self.centroids[speaker] = vector if self.centroids[speaker] is None else self.centroids[speaker] + vector
+        return mapping
+
+
+def diarize_windowed(pipeline, audio_file, window_seconds=600.0, overlap_seconds=30.0, checkpoints=None,
+                     checkpoint_key=(), max_distance=None, timer=None):
+    # Returns ([{'start', 'end', 'speaker'}] like diarize() for the whole
+    # file, {speaker: mean embedding} for the speakers that have one).
+    # checkpoints: a DiskCache for the per-window results (None: no resume);
+    # checkpoint_key: parts identifying the audio and pipeline (content hash,
+    # model name). max_distance defaults to the pipeline's own clustering
+    # threshold.
+    if max_distance is None:
+        max_distance = float(getattr(getattr(pipeline, "clustering", None), "threshold", DEFAULT_MAX_DISTANCE))
+    reconciler = SpeakerReconciler(max_distance)
+
+    with WavReader(audio_file) as reader:
+        windows = diarization_windows(reader.num_samples / reader.sample_rate, window_seconds, overlap_seconds)
+        turns = []
+        previous = []  # Previous window's turns as (start, end, global speaker), unclipped
+        for k, (start, end) in enumerate(windows):
+            key = make_key("diarization-window", *checkpoint_key, round(start, 3), round(end, 3))
+            result = checkpoints.get(key) if checkpoints is not None else None
+            if result is None:
+                print(f"Diarizing window {k + 1}/{len(windows)} ({start:.0f}s - {end:.0f}s)...")
+                samples = reader.read_segment(start, end)
+                local_turns, embeddings = run_pipeline(pipeline, samples)
+                result = {"turns": [(start + s, start + e, local) for s, e, local in local_turns],
+                          "embeddings": embeddings}
+                if checkpoints is not None:
+                    checkpoints.set(key, result)
+            elif timer is not None:
+                timer.count("resumed diarization windows")
+            if timer is not None:
+                timer.count("diarization windows")
+
+            # Overlap with the previous window, for speakers without an embedding
+            votes = {}
+            if k > 0:
+                overlap_start, overlap_end = start, windows[k - 1][1]
+                local_turns = [turn for turn in result["turns"] if turn[0] < overlap_end and turn[1] > overlap_start]
+                previous_turns = [turn for turn in previous if turn[0] < overlap_end and turn[1] > overlap_start]
+                for local in {local for _, _, local in local_turns}:
+                    local_spans = [(s, e) for s, e, label in local_turns if label == local]
+                    for speaker in {speaker for _, _, speaker in previous_turns}:
+                        speaker_spans = [(s, e) for s, e, label in previous_turns if label == speaker]
+                        votes[(local, speaker)] = _overlap_seconds(local_spans, speaker_spans, overlap_start, overlap_end)
+            mapping = reconciler.assign(result["embeddings"], votes)
+            current = [(s, e, mapping[local]) for s, e, local in result["turns"]]
+
+            # Each window keeps [midpoint of the previous overlap, midpoint of the next one)
+            keep_from = (start + windows[k - 1][1]) / 2 if k > 0 else 0.0
+            keep_to = (windows[k + 1][0] + end) / 2 if k + 1 < len(windows) else end
+            for s, e, speaker in sorted(current):
+                s, e = max(s, keep_from), min(e, keep_to)
+                if e <= s:
+                    continue
+                # Rejoin a turn the cut split in two
+                joined = None
+                if k > 0 and s == keep_from:
+                    joined = next((turn for turn in reversed(turns) if turn['end'] == s and turn['speaker'] == speaker),
+                                  None)
+                if joined is not None:
+                    joined['end'] = e
+                else:
+                    turns.append({'start': s, 'end': e, 'speaker': speaker})
+            previous = current
+
+    # Speakers are numbered in order of first appearance, like pyannote's labels
+    order = {}
+    for turn in sorted(turns, key=lambda turn: turn['start']):
+        order.setdefault(turn['speaker'], len(order))
+    for turn in turns:
+        turn['speaker'] = f"SPEAKER_{order[turn['speaker']]:02d}"
+    embeddings = {f"SPEAKER_{k:02d}": reconciler.centroids[speaker] / np.linalg.norm(reconciler.centroids[speaker])
+                  for speaker, k in order.items() if reconciler.centroids[speaker] is not None}
+    return sorted(turns, key=lambda turn: (turn['start'], turn['end'])), embeddings
+
@@ -0,0 +1,102 @@
+import re
+from xml.sax.saxutils import escape
+from docx.oxml import parse_xml, OxmlElement
+from docx.oxml.ns import nsdecls
+
+# Characters XML 1.0 can't hold; python-docx would refuse them too
+_INVALID_XML_CHARS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+_BREAKS = {'\t': '<w:tab/>', '\n': '<w:br/>', '\r': '<w:br/>'}
+
+
+# === Run and Paragraph XML ===
+def _text_xml(text):
+    # <w:t> pieces with tabs and line breaks as elements, like Run.text does
+    parts = []
+    for piece in re.split('([\t\n\r])', _INVALID_XML_CHARS.sub('', text)):
+        if piece in _BREAKS:
+            parts.append(_BREAKS[piece])
+        elif piece:
+            parts.append('<w:t xml:space="preserve">%s</w:t>' % escape(piece))
+    return ''.join(parts)
+
+
+def run_xml(text, highlight=None, bold=False):
+    # highlight is a WD_COLOR_INDEX xml value ("yellow", ...); highlighted
+    # text is forced black, as the python-docx path does
+    properties = ''
+    if bold:
+        properties += '<w:b/>'
+    if highlight is not None:
+        properties += '<w:color w:val="000000"/><w:highlight w:val="%s"/>' % highlight
+    if properties:
+        properties = '<w:rPr>%s</w:rPr>' % properties
+    return '<w:r>%s%s</w:r>' % (properties, _text_xml(text))
+
+
+def paragraph_xml(full_text, runs, prefix=None):
+    # runs: (start, end, highlight) over full_text, in order
+    parts = [run_xml(prefix, bold=True)] if prefix else []
+    parts.extend(run_xml(full_text[start:end], highlight) for start, end, highlight in runs if end > start)
+    return '<w:p>%s</w:p>' % ''.join(parts)
+
+
+def split_runs(runs, paragraphs):
+    # Cuts document-wide runs at paragraph boundaries. paragraphs is a list of
+    # (start, end) ranges in the same text, in order; text between them (the
+    # separators the paragraphs were joined with) is dropped.
+    pieces = [[] for _ in paragraphs]
+    k = 0
+    for start, end, highlight in runs:
+        while k < len(paragraphs) and paragraphs[k][1] <= start:
+            k += 1
+        j = k
+        while j < len(paragraphs) and paragraphs[j][0] < end:
+            piece_start = max(start, paragraphs[j][0])
+            piece_end = min(end, paragraphs[j][1])
+            if piece_end > piece_start:
+                pieces[j].append((piece_start, piece_end, highlight))
+            if paragraphs[j][1] > end:
+                break
+            j += 1
+    return pieces
+
+
+# === Bulk Insert ===
+def append_paragraphs(document, paragraphs_xml):
+    # Parses all paragraphs in one go, instead of building each run through
+    # the python-docx API, and moves them into the body ahead of the section
+    # properties. Runs are moved one by one into a fresh paragraph: lxml slows
+    # down quadratically when a paragraph with thousands of runs is moved
+    # between documents in one piece.
+    container = parse_xml('<w:body %s>%s</w:body>' % (nsdecls('w'), ''.join(paragraphs_xml)))
+    body = document.element.body
+    section = body.sectPr
+    for parsed in container:
+        paragraph = OxmlElement('w:p')
+        if section is not None:
+            section.addprevious(paragraph)
+        else:
+            body.append(paragraph)
+        for run in list(parsed):
+            paragraph.append(run)
+
+
+def write_highlighted_text(document, full_text, runs, highlight_index, paragraphs=None):
+    # runs: (start, end, color) from SpanStore.segments, color None for plain
+    # text. highlight_index maps each color to its WD_COLOR_INDEX, looked up
+    # once per color rather than once per run. paragraphs: optional
+    # (start, end, prefix) per paragraph, e.g. one per speaker turn; without
+    # it the whole text goes into a single paragraph.
+    runs = [
+        (start, end, highlight_index[color].xml_value if color is not None else None)
+        for start, end, color in runs
+    ]
+    if paragraphs is None:
+        append_paragraphs(document, [paragraph_xml(full_text, runs)])
+        return
+
+    pieces = split_runs(runs, [(start, end) for start, end, _ in paragraphs])
+    append_paragraphs(document, [
+        paragraph_xml(full_text, piece, prefix)
+        for (_, _, prefix), piece in zip(paragraphs, pieces)
+    ])
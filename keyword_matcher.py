@@ -0,0 +1,177 @@
+import bisect
+from collections import deque
+import numpy as np
+
+# Part of the cache key of pickled matchers; bump when their attributes change
+MATCHER_VERSION = 2
+
+
+# === Case Folding ===
+def fold_case(text):
+    # Lower-case without moving any offsets: the few characters whose lower
+    # case is longer than one character are left as they are
+    folded = text.lower()
+    if len(folded) == len(text):
+        return folded
+    return ''.join(ch if len(ch.lower()) != 1 else ch.lower() for ch in text)
+
+
+# === Aho–Corasick Automaton ===
+class KeywordAutomaton:
+    # Finds every occurrence of every keyword, overlapping ones included, in a
+    # single pass over the text
+    def __init__(self, keywords):
+        self.keywords = list(keywords)
+        self.lengths = [len(keyword) for keyword in self.keywords]
+        self.goto = [{}]
+        self.fail = [0]
+        self.out = [[]]
+
+        for k, keyword in enumerate(self.keywords):
+            if not keyword:
+                raise ValueError("Keywords must not be empty")
+            node = 0
+            for ch in keyword:
+                child = self.goto[node].get(ch)
+                if child is None:
+                    child = len(self.goto)
+                    self.goto[node][ch] = child
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.out.append([])
+                node = child
+            self.out[node].append(k)
+
+        # Failure links breadth-first, so a node's fallback is always final
+        # before its children need it
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self.goto[node].items():
+                queue.append(child)
+                fallback = self.fail[node]
+                while fallback and ch not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.goto[fallback].get(ch, 0)
+                self.out[child] = self.out[child] + self.out[self.fail[child]]
+
+    def occurrences(self, text):
+        # One sorted list of start offsets per keyword
+        goto, fail, out, lengths = self.goto, self.fail, self.out, self.lengths
+        found = [[] for _ in self.keywords]
+        node = 0
+        for i, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            for k in out[node]:
+                found[k].append(i - lengths[k] + 1)
+        return found
+
+
+# === Keyword Sequences ===
+class KeywordMatcher:
+    # Ordered keyword sequences, each keyword starting at most max_gap
+    # characters after the previous one ends. Gives the same spans as
+    # re.finditer over '.{0,max_gap}?'.join(map(re.escape, keywords)) with
+    # IGNORECASE | DOTALL: leftmost match first, shortest gaps first and no
+    # overlapping matches within a sequence.
+    def __init__(self, sequences, max_gap=100, ignore_case=True):
+        self.max_gap = max_gap
+        self.ignore_case = ignore_case
+
+        # Keywords shared between sequences go into the automaton once
+        keyword_ids = {}
+        self.sequences = []
+        for keywords in sequences:
+            if not keywords:
+                raise ValueError("Keyword sequences must not be empty")
+            self.sequences.append([
+                keyword_ids.setdefault(self._fold(keyword), len(keyword_ids))
+                for keyword in keywords
+            ])
+        self.automaton = KeywordAutomaton(keyword_ids)
+
+        # Longest text any match (or failed attempt) can look at from its start
+        lengths = self.automaton.lengths
+        self.max_match_length = max(
+            (sum(lengths[k] for k in ids) + (len(ids) - 1) * max_gap for ids in self.sequences),
+            default=0
+        )
+
+    def _fold(self, text):
+        return fold_case(text) if self.ignore_case else text
+
+    def find_all(self, text, start=0, resume=None):
+        # One list of (start, end) spans per sequence, in sequence order.
+        # Only text[start:] is scanned; resume optionally gives, per sequence,
+        # the offset its next match may start at (the end of the last match
+        # that's already known), as re.finditer would carry on from there.
+        occurrences = [
+            np.array(starts, dtype=np.int64) + start
+            for starts in self.automaton.occurrences(self._fold(text[start:] if start else text))
+        ]
+        if resume is None:
+            resume = [start] * len(self.sequences)
+        return [self._resolve(ids, occurrences, first) for ids, first in zip(self.sequences, resume)]
+
+    def _resolve(self, ids, occurrences, resume=0):
+        lengths = self.automaton.lengths
+
+        # Backwards over the sequence: for each occurrence of a keyword, the
+        # end of the rest of the sequence when every gap is the shortest one
+        # that still lets the sequence complete, which is what the lazy regex
+        # settles on after backtracking
+        starts = occurrences[ids[-1]]
+        ends = starts + lengths[ids[-1]]
+        for keyword in reversed(ids[:-1]):
+            candidates = occurrences[keyword]
+            cursors = candidates + lengths[keyword]
+            following = np.searchsorted(starts, cursors)
+            complete = following < len(starts)
+            complete[complete] = starts[following[complete]] <= cursors[complete] + self.max_gap
+            starts = candidates[complete]
+            ends = ends[following[complete]]
+
+        # Leftmost first; the next match can only start where this one ended
+        starts = starts.tolist()
+        ends = ends.tolist()
+        spans = []
+        i = bisect.bisect_left(starts, resume)
+        while i < len(starts):
+            spans.append((starts[i], ends[i]))
+            i = bisect.bisect_left(starts, ends[i], i + 1)
+        return spans
+
+
+# === Growing Transcripts ===
+class IncrementalMatcher:
+    # Keeps the spans of a transcript_utils.Transcript up to date while
+    # segments are appended or replaced, rescanning only from the first edit.
+    # A span is final once everything it could look ahead into is unchanged:
+    # it starts at least max_match_length before the edit. Spans after that
+    # cut are dropped and found again from the rescan.
+    def __init__(self, matcher):
+        self.matcher = matcher
+        self.spans = [[] for _ in matcher.sequences]
+
+    def update(self, transcript):
+        # Returns, per sequence, the spans that weren't reported before
+        cut = max(transcript.changed_from - self.matcher.max_match_length, 0)
+
+        resume = []
+        dropped = []
+        for spans in self.spans:
+            keep = bisect.bisect_left(spans, (cut,))
+            dropped.append(set(spans[keep:]))
+            del spans[keep:]
+            resume.append(max(cut, spans[-1][1]) if spans else cut)
+
+        found = self.matcher.find_all(transcript.full_text, cut, resume)
+        transcript.mark_scanned()
+
+        new_spans = []
+        for spans, rescanned, previous in zip(self.spans, found, dropped):
+            spans.extend(rescanned)
+            new_spans.append([span for span in rescanned if span not in previous])
+        return new_spans
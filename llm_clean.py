@@ -0,0 +1,150 @@
+import sys
+import json
+import asyncio
+import hashlib
+from cache_utils import DiskCache, make_key
+from text_utils import TextCleaner
+
+# Part of every cache key: bump it whenever PROMPT_TEMPLATE changes meaning
+PROMPT_VERSION = 1
+PROMPT_TEMPLATE = """\
+คุณคือเครื่องมือช่วยแก้ไขข้อความจากระบบรู้จำเสียงพูดภาษาไทย (ASR)
+ต่อไปนี้คือรายการข้อความ (JSON) ที่อาจมีการเว้นวรรคผิดหรือคำผิด:
+{items}
+กรุณาปรับแต่ละข้อความให้ถูกต้องและอ่านง่ายโดยไม่แปลเป็นภาษาอังกฤษ
+ตอบเป็น JSON ในรูปแบบ {{"texts": [...]}} โดยมีข้อความที่แก้แล้ว {count} รายการ เรียงตามลำดับเดิม"""
+SKIP_TEXTS = ("", "[transcription error]")
+
+
+# === Async Ollama Cleaner ===
+class LLMCleaner:
+    # Deep-cleans transcript texts with an Ollama model. Identical texts are
+    # sent once, previously cleaned texts come from a disk cache keyed by
+    # (model, PROMPT_VERSION, text hash), and the rest go out packed
+    # pack_size per prompt with at most `concurrency` requests in flight. A
+    # pack the model answers badly is retried text by text; a text that still
+    # fails keeps its regex-cleaned form and isn't cached.
+    def __init__(self, model="gemma3:4b", host="http://localhost:11434", concurrency=4, pack_size=8,
+                 pack_max_chars=2000, cache_dir=".cache/llm_clean", timeout=120, fallback=None):
+        self.model = model
+        self.host = host
+        self.concurrency = concurrency
+        self.pack_size = pack_size
+        self.pack_max_chars = pack_max_chars
+        self.cache = DiskCache(cache_dir) if cache_dir else None
+        self.timeout = timeout
+        self.fallback = fallback  # Per-text function; None: batched spacing cleanup (text_utils)
+        self.stats = {"texts": 0, "cache_hits": 0, "requests": 0, "fallbacks": 0}
+
+    def _key(self, text):
+        return make_key("llm-clean", self.model, PROMPT_VERSION, hashlib.sha256(text.encode('utf-8')).hexdigest())
+
+    def clean(self, texts):
+        return asyncio.run(self.clean_async(texts))
+
+    async def clean_async(self, texts):
+        # Returns the cleaned texts in input order
+        from ollama import AsyncClient
+
+        texts = list(texts)
+        self.stats["texts"] += len(texts)
+        if self.fallback is None:
+            basic = TextCleaner().clean_many(texts)
+        else:
+            basic = [self.fallback(text) if isinstance(text, str) else text for text in texts]
+
+        cleaned = {}
+        todo = []
+        for text in dict.fromkeys(basic):
+            if not isinstance(text, str) or text.strip().lower() in SKIP_TEXTS:
+                cleaned[text] = text
+                continue
+            cached = self.cache.get(self._key(text)) if self.cache is not None else None
+            if cached is not None:
+                cleaned[text] = cached
+                self.stats["cache_hits"] += 1
+            else:
+                todo.append(text)
+
+        client = AsyncClient(host=self.host, timeout=self.timeout)
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def run_pack(pack):
+            async with semaphore:
+                results = await self._request(client, pack)
+            if results is None and len(pack) > 1:
+                # The model mangled the packed answer: ask for each text alone
+                singles = await asyncio.gather(*(run_pack([text]) for text in pack))
+                return [single[0] for single in singles]
+            if results is None:
+                self.stats["fallbacks"] += 1
+                return [None]
+            return results
+
+        packs = self._packs(todo)
+        for pack, results in zip(packs, await asyncio.gather(*(run_pack(pack) for pack in packs))):
+            for text, result in zip(pack, results):
+                if result is None:
+                    cleaned[text] = text
+                    continue
+                cleaned[text] = result
+                if self.cache is not None:
+                    self.cache.set(self._key(text), result)
+
+        return [cleaned[text] for text in basic]
+
+    def _packs(self, texts):
+        packs = []
+        for text in texts:
+            if (packs and len(packs[-1]) < self.pack_size
+                    and sum(map(len, packs[-1])) + len(text) <= self.pack_max_chars):
+                packs[-1].append(text)
+            else:
+                packs.append([text])
+        return packs
+
+    async def _request(self, client, pack):
+        # Cleaned texts for one pack, or None if the request or its answer failed
+        prompt = PROMPT_TEMPLATE.format(items=json.dumps(pack, ensure_ascii=False), count=len(pack))
+        self.stats["requests"] += 1
+        try:
+            response = await client.chat(
+                model=self.model,
+                messages=[{"role": "user", "content": prompt}],
+                format="json",
+                options={"temperature": 0},
+            )
+            results = json.loads(response['message']['content'])["texts"]
+        except Exception as e:
+            print(f"[❌ Ollama Error] {len(pack)} text(s) -> {e}")
+            return None
+        if (not isinstance(results, list) or len(results) != len(pack)
+                or not all(isinstance(result, str) and result.strip() for result in results)):
+            return None
+        return [result.strip() for result in results]
+
+
+# === Run: clean an existing transcript CSV ===
+def clean_csv(input_file, output_file, cleaner=None):
+    import time
+    import pandas as pd
+
+    cleaner = cleaner or LLMCleaner()
+    start_time = time.time()
+    df = pd.read_csv(input_file)
+    print(f"🧹 Cleaning {len(df)} segments with Ollama ({cleaner.model})...")
+    df['cleaned_text'] = cleaner.clean(df['text'].fillna("").astype(str).str.strip())
+    df.to_csv(output_file, index=False, encoding='utf-8')
+
+    print(f"\n✅ Cleaned transcript saved to: {output_file}")
+    print(f"{cleaner.stats['texts']} texts, {cleaner.stats['cache_hits']} cached, "
+          f"{cleaner.stats['requests']} requests, {cleaner.stats['fallbacks']} fallbacks "
+          f"in {time.time() - start_time:.2f} seconds")
+
+
+# Usage: python llm_clean.py <transcript.csv> [cleaned_transcript.csv] [model]
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        sys.exit("Usage: python llm_clean.py <transcript.csv> [cleaned_transcript.csv] [model]")
+    clean_csv(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else "cleaned_transcript.csv",
+              LLMCleaner(model=sys.argv[3]) if len(sys.argv) > 3 else None)
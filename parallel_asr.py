@@ -0,0 +1,137 @@
+import os
+import queue
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+
+# Per-process state, filled in by _init_worker
+_worker = {}
+
+
+# === Worker Process ===
+def _init_worker(model_name, backend, num_threads, batch_size, generate_kwargs, ready):
+    import torch
+    torch.set_num_threads(num_threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        pass  # Already set in this process
+
+    from transformers import logging
+    from asr_utils import load_whisper
+    logging.set_verbosity_error()
+
+    # Every worker holds its own private copy of the weights (about 6 GB for
+    # large-v3 in fp32), so memory, not cores, usually bounds num_workers
+    processor, model = load_whisper(model_name, torch.device("cpu"), backend)
+
+    _worker.update(
+        processor=processor,
+        model=model,
+        device=torch.device("cpu"),
+        batch_size=batch_size,
+        generate_kwargs=generate_kwargs,
+    )
+    ready.put(os.getpid())
+
+
+def _transcribe_shard(audio_file, segments):
+    from asr_utils import transcribe_segments
+    from audio_utils import WavReader
+
+    indices = [i for i, _, _ in segments]
+    durations = [end - start for _, start, end in segments]
+    with WavReader(audio_file) as reader:
+        texts = transcribe_segments(
+            _worker["model"], _worker["processor"], durations,
+            lambda k: reader.read_segment(segments[k][1], segments[k][2]),
+            _worker["device"],
+            batch_size=_worker["batch_size"],
+            pipelined=False,  # One process per core already keeps the CPU busy
+            **_worker["generate_kwargs"]
+        )
+    return list(zip(indices, texts))
+
+
+# === Sharding ===
+def shard_segments(durations, num_shards):
+    # Longest-first onto the least loaded shard, so every shard carries about
+    # the same amount of audio. Each shard keeps timeline order internally.
+    shards = [[] for _ in range(num_shards)]
+    loads = [0.0] * num_shards
+    for i in sorted(range(len(durations)), key=lambda i: durations[i], reverse=True):
+        target = loads.index(min(loads))
+        shards[target].append(i)
+        loads[target] += durations[i]
+    return [sorted(shard) for shard in shards if shard]
+
+
+class ShardedTranscriber:
+    # Transcribes diarized segments with num_workers CPU processes, each with
+    # its own model copy and a pinned torch thread count. Call it like the
+    # single-process path: texts come back in the order of starts/ends, with
+    # None for segments that failed.
+    def __init__(self, model_name, num_workers, threads_per_worker=None, batch_size=8, backend="fp32",
+                 postprocess=None, shards_per_worker=2, timer=None, **generate_kwargs):
+        self.num_workers = num_workers
+        self.postprocess = postprocess
+        self.timer = timer
+        self.shards_per_worker = shards_per_worker
+        threads = threads_per_worker or max(1, (os.cpu_count() or 1) // num_workers)
+        # spawn: forking a process that already started torch threads can deadlock
+        context = mp.get_context("spawn")
+        self.ready = context.Queue()  # One message per worker whose model is loaded
+        self.executor = ProcessPoolExecutor(
+            max_workers=num_workers,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(model_name, backend, threads, batch_size, generate_kwargs, self.ready),
+        )
+
+    def __call__(self, audio_file, starts, ends):
+        if self.timer is not None:
+            # Workers keep no timer, so token counts aren't collected here
+            self.timer.count("segments", len(starts))
+            self.timer.count("audio_seconds", sum(end - start for start, end in zip(starts, ends)))
+            with self.timer.stage("sharded asr"):
+                return self._transcribe(audio_file, starts, ends)
+        return self._transcribe(audio_file, starts, ends)
+
+    def _transcribe(self, audio_file, starts, ends):
+        durations = [end - start for start, end in zip(starts, ends)]
+        # A few more shards than workers evens out shards that decode slowly
+        shards = shard_segments(durations, self.num_workers * self.shards_per_worker)
+        futures = [
+            self.executor.submit(_transcribe_shard, audio_file, [(i, starts[i], ends[i]) for i in shard])
+            for shard in shards
+        ]
+
+        texts = [None] * len(durations)
+        for future in futures:
+            for i, text in future.result():
+                if text is not None and self.postprocess is not None:
+                    text = self.postprocess(text)
+                texts[i] = text
+        return texts
+
+    def warm_up(self):
+        # Block until every worker has loaded its model. The pool starts
+        # workers as tasks are submitted, so one task per worker starts them
+        # all; a task's result only says that some worker is up, hence the
+        # ready queue.
+        futures = [self.executor.submit(_noop, None) for _ in range(self.num_workers)]
+        loaded = 0
+        while loaded < self.num_workers:
+            try:
+                self.ready.get(timeout=1.0)
+                loaded += 1
+            except queue.Empty:
+                for future in futures:
+                    if future.done():
+                        future.result()  # Raises if a worker died while loading its model
+
+    def close(self):
+        self.executor.shutdown()
+
+
+def _noop(_):
+    return None
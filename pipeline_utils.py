@@ -0,0 +1,85 @@
+import queue
+import threading
+
+_DONE = object()
+
+
+class _StageError:
+    def __init__(self, name, error):
+        self.name = name
+        self.error = error
+
+
+# === Staged Pipeline ===
+def run_stages(source, stages, queue_size=2, timer=None):
+    # Runs each (name, fn) stage in its own thread, connected by bounded queues,
+    # and yields the last stage's outputs in source order. While one stage works
+    # on item n the previous stage is already preparing item n + 1; the bounded
+    # queues keep a fast producer from running ahead and filling memory.
+    queues = [queue.Queue(maxsize=queue_size) for _ in range(len(stages) + 1)]
+    stop = threading.Event()
+
+    def put(q, item):
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def get(q):
+        while not stop.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        return _DONE
+
+    def feed():
+        try:
+            for item in source:
+                if stop.is_set():
+                    return
+                put(queues[0], item)
+        except Exception as e:
+            put(queues[0], _StageError("source", e))
+        put(queues[0], _DONE)
+
+    def work(index, name, fn):
+        inbox, outbox = queues[index], queues[index + 1]
+        while True:
+            item = get(inbox)
+            if item is _DONE or isinstance(item, _StageError):
+                put(outbox, item)
+                if item is _DONE:
+                    return
+                continue
+            try:
+                if timer is not None:
+                    with timer.stage(name):
+                        result = fn(item)
+                else:
+                    result = fn(item)
+            except Exception as e:
+                result = _StageError(name, e)
+            put(outbox, result)
+
+    threads = [threading.Thread(target=feed, daemon=True)]
+    for index, (name, fn) in enumerate(stages):
+        threads.append(threading.Thread(target=work, args=(index, name, fn), daemon=True))
+    for thread in threads:
+        thread.start()
+
+    try:
+        while True:
+            item = queues[-1].get()
+            if item is _DONE:
+                break
+            if isinstance(item, _StageError):
+                raise RuntimeError(f"Pipeline stage '{item.name}' failed: {item.error}") from item.error
+            yield item
+    finally:
+        # Also reached when the consumer stops early or raises
+        stop.set()
+        for thread in threads:
+            thread.join()
@@ -0,0 +1,157 @@
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager
+
+
+# === Stage Timing ===
+class StageTimer:
+    # Accumulates wall time per named stage, plus named counters (segments,
+    # tokens generated, audio seconds, ...). Stages running in different
+    # threads overlap, so their sum can exceed the total wall time. With
+    # trace=True every stage call is also kept as an event for
+    # write_chrome_trace; without it a stage costs two perf_counter calls and
+    # a dict update.
+    def __init__(self, trace=False):
+        self.start_time = time.perf_counter()
+        self.totals = {}
+        self.calls = {}
+        self.counters = {}
+        self.events = [] if trace else None
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            self.add(name, end - start)
+            if self.events is not None:
+                thread = threading.current_thread()
+                self.events.append((name, start, end, thread.ident, thread.name))
+
+    def add(self, name, seconds):
+        with self.lock:
+            self.totals[name] = self.totals.get(name, 0.0) + seconds
+            self.calls[name] = self.calls.get(name, 0) + 1
+
+    def count(self, name, value=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def elapsed(self):
+        return time.perf_counter() - self.start_time
+
+    def report(self):
+        print("\n=== Stage Timing ===")
+        for name, seconds in self.totals.items():
+            print(f"{name:<24} {seconds:>9.2f}s  ({self.calls[name]} calls)")
+        print("-" * 48)
+        print(f"{'Total wall time':<24} {self.elapsed():>9.2f}s")
+        for name, value in self.counters.items():
+            print(f"{name:<24} {value:>10.6g}")
+
+    # === Exports ===
+    def write_chrome_trace(self, path):
+        # Trace Event Format JSON, for chrome://tracing or ui.perfetto.dev:
+        # one row per thread, one box per stage call
+        pid = os.getpid()
+        events = self.events or []
+        threads = {tid: thread_name for _, _, _, tid, thread_name in events}
+        trace = [{"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": thread_name}}
+                 for tid, thread_name in threads.items()]
+        for name, start, end, tid, _ in events:
+            trace.append({"name": name, "cat": "stage", "ph": "X", "pid": pid, "tid": tid,
+                          "ts": round((start - self.start_time) * 1e6, 1), "dur": round((end - start) * 1e6, 1)})
+        end_ts = round(self.elapsed() * 1e6, 1)
+        for name, value in self.counters.items():
+            trace.append({"name": name, "cat": "counter", "ph": "C", "pid": pid, "ts": end_ts, "args": {name: value}})
+        _write_atomic(path, json.dumps({"traceEvents": trace, "displayTimeUnit": "ms"}))
+
+    def write_prometheus(self, path, prefix="vocalytics"):
+        # Prometheus text exposition format, e.g. for node_exporter's textfile
+        # collector
+        lines = [
+            f"# HELP {prefix}_stage_seconds_total Wall time spent in each stage.",
+            f"# TYPE {prefix}_stage_seconds_total counter",
+        ]
+        lines += [f'{prefix}_stage_seconds_total{{stage="{_label(name)}"}} {seconds:.6f}'
+                  for name, seconds in self.totals.items()]
+        lines += [
+            f"# HELP {prefix}_stage_calls_total Calls of each stage.",
+            f"# TYPE {prefix}_stage_calls_total counter",
+        ]
+        lines += [f'{prefix}_stage_calls_total{{stage="{_label(name)}"}} {calls}' for name, calls in self.calls.items()]
+        for name, value in self.counters.items():
+            metric = f"{prefix}_{_metric_name(name)}_total"
+            lines += [f"# TYPE {metric} counter", f"{metric} {value:g}"]
+        lines += [
+            f"# HELP {prefix}_wall_seconds Wall time of the run so far.",
+            f"# TYPE {prefix}_wall_seconds gauge",
+            f"{prefix}_wall_seconds {self.elapsed():.6f}",
+        ]
+        _write_atomic(path, "\n".join(lines) + "\n")
+
+    def export(self, output_dir):
+        # trace.json (when tracing) and metrics.prom in output_dir
+        os.makedirs(output_dir, exist_ok=True)
+        if self.events is not None:
+            self.write_chrome_trace(os.path.join(output_dir, "trace.json"))
+        self.write_prometheus(os.path.join(output_dir, "metrics.prom"))
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _metric_name(name):
+    return "".join(c if c.isalnum() else "_" for c in name.lower())
+
+
+def _write_atomic(path, text):
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(path + ".tmp", path)
+
+
+# === Profilers ===
+@contextmanager
+def capture_profiles(output_dir, cprofile=False, torch_profile=False):
+    # Optionally runs the block under cProfile (output_dir/cprofile.pstats,
+    # view with `python -m pstats` or snakeviz) and/or torch.profiler
+    # (output_dir/torch_trace.json, a Chrome trace of the torch ops). cProfile
+    # only sees the thread that runs the block, so ASR pipeline stage threads
+    # are not in it; torch.profiler records ops from every thread.
+    if not (cprofile or torch_profile):
+        yield
+        return
+
+    os.makedirs(output_dir, exist_ok=True)
+    torch_profiler = None
+    if torch_profile:
+        import torch
+        from torch.profiler import ProfilerActivity, profile
+
+        activities = [ProfilerActivity.CPU]
+        if torch.cuda.is_available():
+            activities.append(ProfilerActivity.CUDA)
+        torch_profiler = profile(activities=activities)
+        torch_profiler.__enter__()
+    profiler = None
+    if cprofile:
+        import cProfile
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+    try:
+        yield
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(os.path.join(output_dir, "cprofile.pstats"))
+        if torch_profiler is not None:
+            torch_profiler.__exit__(None, None, None)
+            torch_profiler.export_chrome_trace(os.path.join(output_dir, "torch_trace.json"))
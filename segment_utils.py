@@ -0,0 +1,152 @@
+# === Pre-ASR Segment Merging ===
+# Every segment is padded to a full 30 s Whisper window, so a 0.4 s turn costs
+# as much encoder compute as a 30 s one. Merging turns cuts the number of
+# encoder passes without changing who said what.
+def _absorb_micro_turns(turns, min_duration, max_gap, max_duration, drop_isolated):
+    # A micro-turn only joins a neighbour of the same speaker, so no words
+    # change speaker. One next to another speaker's turn stays a segment of
+    # its own (a backchannel like "ครับ"); one with no neighbour at all within
+    # max_gap is usually noise and is dropped with drop_isolated.
+    kept = []
+    dropped = 0
+    for k, turn in enumerate(turns):
+        if turn['end'] - turn['start'] >= min_duration:
+            kept.append(turn)
+            continue
+
+        neighbours = []
+        if kept:
+            neighbours.append((kept[-1], turn['start'] - kept[-1]['end']))
+        if k + 1 < len(turns):
+            neighbours.append((turns[k + 1], turns[k + 1]['start'] - turn['end']))
+        neighbours = [(neighbour, gap) for neighbour, gap in neighbours if gap <= max_gap]
+        same_speaker = [
+            (neighbour, gap) for neighbour, gap in neighbours
+            if neighbour['speaker'] == turn['speaker']
+            and max(neighbour['end'], turn['end']) - min(neighbour['start'], turn['start']) <= max_duration
+        ]
+
+        if same_speaker:
+            neighbour, _ = min(same_speaker, key=lambda item: item[1])
+            neighbour['start'] = min(neighbour['start'], turn['start'])
+            neighbour['end'] = max(neighbour['end'], turn['end'])
+        elif neighbours or not drop_isolated:
+            kept.append(turn)
+        else:
+            dropped += 1
+    return kept, dropped
+
+
+def merge_segments(diarization_df, max_duration=30.0, max_gap=1.0, min_duration=0.5, drop_isolated=True):
+    # Returns (segments_df, dropped): segments_df has start, end and speaker,
+    # each segment covering turns of one speaker only, so the output still
+    # carries accurate speaker boundaries; dropped is the number of isolated
+    # micro-turns left out.
+    import pandas as pd
+
+    turns = [{'start': start, 'end': end, 'speaker': speaker} for start, end, speaker in
+             zip(diarization_df['start'], diarization_df['end'], diarization_df['speaker'])]
+
+    turns, dropped = _absorb_micro_turns(turns, min_duration, max_gap, max_duration, drop_isolated)
+
+    merged = []
+    for turn in turns:
+        previous = merged[-1] if merged else None
+        if (
+            previous is not None
+            and previous['speaker'] == turn['speaker']
+            and turn['start'] - previous['end'] <= max_gap
+            and max(previous['end'], turn['end']) - previous['start'] <= max_duration
+        ):
+            previous['end'] = max(previous['end'], turn['end'])
+        else:
+            merged.append(turn)
+
+    segments_df = pd.DataFrame(merged, columns=['start', 'end', 'speaker'])
+    return segments_df, dropped
+
+
+# === Overlapping Windows (no diarization) ===
+def sliding_windows(num_samples, window_seconds=30.0, stride_seconds=25.0, sample_rate=16000):
+    # (start_sample, end_sample) windows of window_seconds, one every
+    # stride_seconds, so consecutive windows overlap by the difference
+    if not 0 < stride_seconds <= window_seconds:
+        raise ValueError("stride_seconds must be in (0, window_seconds]")
+    window = int(window_seconds * sample_rate)
+    stride = int(stride_seconds * sample_rate)
+    windows = []
+    start = 0
+    while True:
+        end = min(start + window, num_samples)
+        windows.append((start, end))
+        if end >= num_samples:
+            break
+        start += stride
+    return windows
+
+
+def _text_overlap(previous, text, min_chars=4):
+    # Length of the longest suffix of previous that is also a prefix of text
+    for size in range(min(len(previous), len(text)), min_chars - 1, -1):
+        if previous.endswith(text[:size]):
+            return size
+    return 0
+
+
+def stitch_windows(results, windows, sample_rate=16000, postprocess=None, edge_tolerance=0.5):
+    # Joins per-window timestamped results into one transcript, dropping the
+    # text that consecutive windows both transcribed from their overlap:
+    #   - a chunk cut off by the end of its window is skipped when the next
+    #     window starts before it, since that window has the whole chunk;
+    #   - a chunk that ends before the audio already covered is skipped;
+    #   - a chunk that starts inside the previous window has the longest
+    #     repeated text with the transcript so far trimmed off its start, since
+    #     the two windows rarely agree on the exact timestamps.
+    # Windows without timestamps only get the repeated-text trimming.
+    pieces = []
+    covered_until = 0.0
+    for k, (result, (start_sample, end_sample)) in enumerate(zip(results, windows)):
+        if result is None:
+            pieces.append("[Transcription Error]")
+            continue
+
+        window_start = start_sample / sample_rate
+        window_end = end_sample / sample_rate
+        next_start = windows[k + 1][0] / sample_rate if k + 1 < len(windows) else None
+        previous_end = windows[k - 1][1] / sample_rate if k > 0 else 0.0
+
+        offsets = result.get('offsets') or []
+        if not offsets:
+            text = result.get('text', '')
+            if pieces:
+                text = text[_text_overlap(pieces[-1], text):]
+            kept = [text]
+            covered_until = window_end
+        else:
+            kept = []
+            for chunk in offsets:
+                chunk_start, chunk_end = chunk['timestamp']
+                chunk_start = window_start + chunk_start
+                chunk_end = window_end if chunk_end is None else min(window_start + chunk_end, window_end)
+
+                cut_off = chunk_end >= window_end - edge_tolerance
+                if cut_off and next_start is not None and chunk_start >= next_start:
+                    continue
+                if chunk_end <= covered_until + edge_tolerance:
+                    continue
+
+                text = chunk['text']
+                if chunk_start < previous_end:
+                    history = (" ".join(pieces) + "".join(kept)).rstrip()
+                    overlap = _text_overlap(history, text.lstrip())
+                    if overlap:
+                        text = text.lstrip()[overlap:]
+                kept.append(text)
+                covered_until = max(covered_until, chunk_end)
+
+        text = "".join(kept).strip()
+        if postprocess is not None:
+            text = postprocess(text)
+        if text:
+            pieces.append(text)
+    return " ".join(pieces)
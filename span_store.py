@@ -0,0 +1,57 @@
+import heapq
+from array import array
+
+
+# === Highlight Spans ===
+class SpanStore:
+    # Highlight spans kept as parallel arrays: start, end and a color id per
+    # span, with each distinct color stored once. Where spans overlap, the one
+    # added first wins (keyword sheet order), and the text is cut into
+    # sub-runs at every span boundary instead of letting the earliest span
+    # swallow the rest of an overlap.
+    def __init__(self):
+        self.starts = array('q')
+        self.ends = array('q')
+        self.color_ids = array('l')
+        self.colors = []
+        self._color_index = {}
+
+    def __len__(self):
+        return len(self.starts)
+
+    def add(self, start, end, color):
+        if end <= start:
+            return
+        color_id = self._color_index.get(color)
+        if color_id is None:
+            color_id = self._color_index[color] = len(self.colors)
+            self.colors.append(color)
+        self.starts.append(start)
+        self.ends.append(end)
+        self.color_ids.append(color_id)
+
+    def segments(self, length):
+        # (start, end, color) runs covering [0, length), color None where
+        # nothing is highlighted; neighbouring runs of one color are joined
+        starts, ends, color_ids = self.starts, self.ends, self.color_ids
+        order = sorted(range(len(starts)), key=starts.__getitem__)
+        boundaries = sorted(set(starts) | set(ends) | {0, length})
+        boundaries = [b for b in boundaries if 0 <= b <= length]
+
+        runs = []
+        active = []  # (priority, end) heap; spans that ended are dropped lazily
+        k = 0
+        for run_start, run_end in zip(boundaries, boundaries[1:]):
+            while k < len(order) and starts[order[k]] <= run_start:
+                heapq.heappush(active, (order[k], ends[order[k]]))
+                k += 1
+            while active and active[0][1] <= run_start:
+                heapq.heappop(active)
+
+            color_id = color_ids[active[0][0]] if active else -1
+            if runs and runs[-1][2] == color_id:
+                runs[-1][1] = run_end
+            else:
+                runs.append([run_start, run_end, color_id])
+
+        return [(start, end, self.colors[color_id] if color_id >= 0 else None) for start, end, color_id in runs]
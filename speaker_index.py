@@ -0,0 +1,252 @@
+import os
+import sys
+import json
+import numpy as np
+
+# === Speaker Index ===
+# Enrolled speaker embeddings (e.g. one or more per sales agent), for naming
+# the anonymous SPEAKER_xx labels of new recordings. An index is a directory:
+#   index.json      header: version, dim, count, one name and source per row
+#   embeddings.f32  float32[count, dim], rows L2-normalized
+#   index.faiss     optional approximate (HNSW) index, rebuilt when count changes
+# The matrix is memory-mapped, so opening an index is reading a small header
+# and every process shares the same page cache. Queries are batched: all the
+# speakers of one or many recordings are scored with one matrix product.
+INDEX_VERSION = 1
+CHUNK_ROWS = 65536  # Rows scored per matrix product, bounds memory on huge indices
+IDENTIFY_CANDIDATES = 64  # Enrolled rows considered per speaker when assigning names
+
+
+def normalize(vectors):
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms > 0, norms, 1)
+
+
+def save_speaker_embeddings(path, embeddings, names=None):
+    # One recording's speaker embeddings ({label: vector}) as .npz, next to
+    # its transcript; names: the identified name per label, if any
+    labels = list(embeddings)
+    vectors = normalize([embeddings[label] for label in labels]) if labels else np.zeros((0, 0), dtype=np.float32)
+    names = names or {}
+    np.savez(path, labels=np.array(labels, dtype=str), embeddings=vectors,
+             names=np.array([names.get(label) or '' for label in labels], dtype=str))
+
+
+def load_speaker_embeddings(path):
+    with np.load(path) as data:
+        return dict(zip(data['labels'].tolist(), data['embeddings']))
+
+
+class SpeakerIndex:
+    def __init__(self, index_dir, approximate=False):
+        # approximate=True searches with faiss (HNSW, inner product) when it is
+        # installed; brute force is exact and takes milliseconds up to tens of
+        # thousands of rows, so this only pays off beyond that
+        self.index_dir = index_dir
+        self.approximate = approximate
+        self.header_path = os.path.join(index_dir, "index.json")
+        self.matrix_path = os.path.join(index_dir, "embeddings.f32")
+        self.faiss_path = os.path.join(index_dir, "index.faiss")
+        self._faiss_index = None
+        self.reload()
+
+    def reload(self):
+        if os.path.exists(self.header_path):
+            with open(self.header_path, encoding='utf-8') as f:
+                header = json.load(f)
+            if header["version"] > INDEX_VERSION:
+                raise ValueError(f"{self.index_dir} is speaker index version {header['version']}, "
+                                 f"this code reads up to {INDEX_VERSION}")
+        else:
+            header = {"version": INDEX_VERSION, "dim": None, "count": 0, "names": [], "sources": []}
+        self.dim = header["dim"]
+        self.names = header["names"]
+        self.sources = header["sources"]
+        self.matrix = None
+        if header["count"]:
+            self.matrix = np.memmap(self.matrix_path, dtype='<f4', mode='r', shape=(header["count"], self.dim))
+        self._faiss_index = None
+
+    def __len__(self):
+        return len(self.names)
+
+    # === Enrollment ===
+    def add(self, names, vectors, sources=None):
+        # Appends rows; index.json is written last (atomically), so a crash
+        # mid-append leaves the previous index intact
+        vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        if len(names) != len(vectors):
+            raise ValueError("One name per embedding")
+        if not np.isfinite(vectors).all():
+            raise ValueError("Embeddings must not contain NaN")
+        if (np.abs(vectors).sum(axis=1) == 0).any():
+            raise ValueError("Embeddings must not be all zeros (speakers pyannote could not embed)")
+        vectors = normalize(vectors)
+        if self.dim is not None and vectors.shape[1] != self.dim:
+            raise ValueError(f"Embedding size {vectors.shape[1]} doesn't match the index ({self.dim})")
+
+        os.makedirs(self.index_dir, exist_ok=True)
+        count = len(self)
+        self.matrix = None  # Release the map before the file grows
+        with open(self.matrix_path, 'ab') as f:
+            f.truncate(count * vectors.shape[1] * 4)  # Drop rows of an interrupted append
+            f.write(vectors.astype('<f4').tobytes())
+        header = {
+            "version": INDEX_VERSION,
+            "dim": int(vectors.shape[1]),
+            "count": count + len(names),
+            "names": self.names + list(names),
+            "sources": self.sources + list(sources or [''] * len(names)),
+        }
+        with open(self.header_path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(header, f, ensure_ascii=False)
+        os.replace(self.header_path + '.tmp', self.header_path)
+        self.reload()
+
+    # === Search ===
+    def search(self, queries, k=1):
+        # (scores, rows), both (queries, k): cosine similarity of the k best
+        # enrolled rows per query, best first. Rows are -1 past the index size.
+        queries = normalize(queries)
+        k_found = min(k, len(self))
+        scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        rows = np.full((len(queries), k), -1, dtype=np.int64)
+        if not k_found or not len(queries):
+            return scores, rows
+
+        index = self._approximate_index()
+        if index is not None:
+            found_scores, found_rows = index.search(queries, k_found)
+            scores[:, :k_found], rows[:, :k_found] = found_scores, found_rows
+            return scores, rows
+
+        # Exact: one matrix product per chunk of rows, keeping the k best so far
+        best_scores = np.empty((len(queries), 0), dtype=np.float32)
+        best_rows = np.empty((len(queries), 0), dtype=np.int64)
+        for start in range(0, len(self), CHUNK_ROWS):
+            chunk_scores = queries @ np.asarray(self.matrix[start:start + CHUNK_ROWS]).T
+            chunk_rows = np.broadcast_to(np.arange(start, start + chunk_scores.shape[1]), chunk_scores.shape)
+            best_scores = np.concatenate([best_scores, chunk_scores], axis=1)
+            best_rows = np.concatenate([best_rows, chunk_rows], axis=1)
+            if best_scores.shape[1] > k_found:
+                top = np.argpartition(-best_scores, k_found - 1, axis=1)[:, :k_found]
+                best_scores = np.take_along_axis(best_scores, top, axis=1)
+                best_rows = np.take_along_axis(best_rows, top, axis=1)
+        order = np.argsort(-best_scores, axis=1)
+        scores[:, :k_found] = np.take_along_axis(best_scores, order, axis=1)
+        rows[:, :k_found] = np.take_along_axis(best_rows, order, axis=1)
+        return scores, rows
+
+    def identify(self, embeddings, threshold=0.5):
+        # {label: (name or None, score)} for one recording's {label: vector}
+        return self.identify_recordings({None: embeddings}, threshold)[None]
+
+    def identify_recordings(self, recordings, threshold=0.5):
+        # {recording: {label: (name or None, score)}} for {recording: {label:
+        # vector}}; every speaker of every recording is scored in one search.
+        # Within a recording names are assigned one-to-one, best-scoring pairs
+        # first: two of its speakers are never given the same name, while the
+        # same agent is still named in every recording they speak in. A label
+        # left without a name keeps its best score; labels without a usable
+        # embedding get (None, nan).
+        results = {recording: {label: (None, float('nan')) for label in embeddings}
+                   for recording, embeddings in recordings.items()}
+        queries = [(recording, label, vector) for recording, embeddings in recordings.items()
+                   for label, vector in embeddings.items() if np.isfinite(vector).all() and np.abs(vector).sum() > 0]
+        if not queries or not len(self):
+            return results
+        scores, rows = self.search([vector for _, _, vector in queries], k=IDENTIFY_CANDIDATES)
+
+        candidates = {}  # recording -> [(score, label, name)], each label's best row per name
+        for (recording, label, _), label_scores, label_rows in zip(queries, scores.tolist(), rows.tolist()):
+            results[recording][label] = (None, label_scores[0])
+            seen = set()
+            for score, row in zip(label_scores, label_rows):
+                if row < 0 or score < threshold:
+                    break
+                if self.names[row] not in seen:
+                    seen.add(self.names[row])
+                    candidates.setdefault(recording, []).append((score, label, self.names[row]))
+        for recording, pairs in candidates.items():
+            named, taken = set(), set()
+            for score, label, name in sorted(pairs, key=lambda candidate: -candidate[0]):
+                if label not in named and name not in taken:
+                    results[recording][label] = (name, score)
+                    named.add(label)
+                    taken.add(name)
+        return results
+
+    def _approximate_index(self):
+        if not self.approximate:
+            return None
+        if self._faiss_index is None:
+            try:
+                import faiss
+            except ImportError:
+                print("faiss is not installed: searching the speaker index exactly")
+                self.approximate = False
+                return None
+            if os.path.exists(self.faiss_path):
+                index = faiss.read_index(self.faiss_path)
+                if index.ntotal == len(self):
+                    self._faiss_index = index
+                    return index
+            index = faiss.IndexHNSWFlat(self.dim, 32, faiss.METRIC_INNER_PRODUCT)
+            index.add(np.ascontiguousarray(self.matrix))
+            faiss.write_index(index, self.faiss_path)
+            self._faiss_index = index
+        return self._faiss_index
+
+
+# === Enroll and Identify ===
+def enroll(speaker_index, name, path, label):
+    # Adds speaker <label> of a <recording>.speakers.npz under <name>
+    embeddings = load_speaker_embeddings(path)
+    if label not in embeddings:
+        raise ValueError(f"{path} has no speaker {label} (speakers: {', '.join(embeddings)})")
+    speaker_index.add([name], [embeddings[label]], sources=[f"{path}:{label}"])
+    print(f"Enrolled {name} from {path}:{label} ({len(speaker_index)} embeddings in {speaker_index.index_dir})")
+
+
+def identify_files(speaker_index, paths, threshold=0.5):
+    # Every speaker of every file in one batched search, names assigned per file
+    results = speaker_index.identify_recordings({path: load_speaker_embeddings(path) for path in paths}, threshold)
+    for path, matches in results.items():
+        for label, (name, score) in matches.items():
+            print(f"{path} {label}: {name or '-'} ({score:.3f})")
+    return results
+
+
+def print_info(speaker_index):
+    print(f"{speaker_index.index_dir}: {len(speaker_index)} embeddings, {len(set(speaker_index.names))} speakers, "
+          f"dim {speaker_index.dim}")
+    for name in sorted(set(speaker_index.names)):
+        print(f"  {name}: {speaker_index.names.count(name)}")
+
+
+# Usage:
+#   python speaker_index.py enroll <index dir> <name> <recording.speakers.npz> <label>
+#   python speaker_index.py identify <index dir> <recording.speakers.npz>...
+#   python speaker_index.py info <index dir>
+# <recording>.speakers.npz files are written next to the transcripts by
+# 1 transcribe.py; enrolling a known agent's label from a few calls is
+# enough to name them in every later recording.
+if __name__ == '__main__':
+    usage = ("Usage: python speaker_index.py enroll <index dir> <name> <recording.speakers.npz> <label>\n"
+             "       python speaker_index.py identify <index dir> <recording.speakers.npz>...\n"
+             "       python speaker_index.py info <index dir>")
+    if len(sys.argv) < 3 or sys.argv[1] not in ("enroll", "identify", "info"):
+        sys.exit(usage)
+    command, speaker_index = sys.argv[1], SpeakerIndex(sys.argv[2])
+    if command == "enroll":
+        if len(sys.argv) != 6:
+            sys.exit(usage)
+        try:
+            enroll(speaker_index, *sys.argv[3:6])
+        except ValueError as e:
+            sys.exit(str(e))
+    elif command == "identify":
+        identify_files(speaker_index, sys.argv[3:])
+    else:
+        print_info(speaker_index)
@@ -0,0 +1,166 @@
+import os
+import time
+import wave
+import struct
+import threading
+import numpy as np
+from audio_utils import SAMPLE_RATE, StreamResampler, pcm_to_float32, to_mono
+
+WAVE_FORMAT_PCM = 1
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+
+# === Growing WAV File ===
+def _read_wav_header(f):
+    # (channels, sample_rate, sample_width, data offset) of a PCM WAV, or None
+    # while the writer hasn't got as far as the data chunk. The sizes in the
+    # header are ignored: a file that is still being written doesn't have
+    # them yet.
+    f.seek(0)
+    riff = f.read(12)
+    if len(riff) < 12:
+        return None
+    if riff[:4] != b'RIFF' or riff[8:12] != b'WAVE':
+        raise ValueError("Not a WAV file")
+
+    fmt = None
+    while True:
+        chunk = f.read(8)
+        if len(chunk) < 8:
+            return None
+        chunk_id, size = chunk[:4], struct.unpack('<I', chunk[4:])[0]
+        if chunk_id == b'data':
+            if fmt is None:
+                raise ValueError("WAV data chunk before fmt chunk")
+            return fmt + (f.tell(),)
+        body = f.read(size + (size & 1))
+        if len(body) < size:
+            return None
+        if chunk_id == b'fmt ':
+            audio_format, channels, sample_rate = struct.unpack('<HHI', body[:8])
+            bits = struct.unpack('<H', body[14:16])[0]
+            if audio_format == WAVE_FORMAT_EXTENSIBLE and len(body) >= 40:
+                # The real format is the first two bytes of the SubFormat GUID
+                audio_format = struct.unpack('<H', body[24:26])[0]
+            if audio_format != WAVE_FORMAT_PCM:
+                raise ValueError("Streaming needs integer PCM WAV audio")
+            fmt = (channels, sample_rate, bits // 8)
+
+
+class GrowingWavSource:
+    # Yields mono float32 16 kHz blocks from a PCM WAV that another process
+    # (a recorder, or simulate_growing_wav) is still writing. The stream ends
+    # once the file hasn't grown for idle_timeout seconds.
+    def __init__(self, path, poll_seconds=0.2, idle_timeout=5.0, block_seconds=0.5):
+        self.path = path
+        self.poll_seconds = poll_seconds
+        self.idle_timeout = idle_timeout
+        self.block_seconds = block_seconds
+
+    def __iter__(self):
+        last_growth = time.monotonic()
+        while not os.path.exists(self.path):
+            if time.monotonic() - last_growth > self.idle_timeout:
+                return
+            time.sleep(self.poll_seconds)
+
+        with open(self.path, 'rb') as f:
+            header = None
+            while header is None:
+                header = _read_wav_header(f)
+                if header is None:
+                    if time.monotonic() - last_growth > self.idle_timeout:
+                        return
+                    time.sleep(self.poll_seconds)
+            channels, sample_rate, sample_width, offset = header
+            frame_size = channels * sample_width
+            block_bytes = max(int(self.block_seconds * sample_rate), 1) * frame_size
+
+            f.seek(offset)
+            resampler = StreamResampler(sample_rate, SAMPLE_RATE)
+            pending = b''
+            while True:
+                data = f.read(block_bytes)
+                if not data:
+                    if time.monotonic() - last_growth > self.idle_timeout:
+                        tail = resampler(np.zeros(0, dtype=np.float32), final=True)
+                        if len(tail):
+                            yield tail
+                        return
+                    time.sleep(self.poll_seconds)
+                    continue
+                last_growth = time.monotonic()
+                data = pending + data
+                usable = len(data) - len(data) % frame_size
+                pending = data[usable:]
+                if usable:
+                    samples = to_mono(pcm_to_float32(data[:usable], sample_width, channels))
+                    samples = resampler(samples)
+                    if len(samples):
+                        yield samples.astype(np.float32)
+
+
+# === Raw PCM on stdin ===
+class PcmSource:
+    # Yields float32 blocks from raw little-endian PCM, e.g.
+    #   ffmpeg -i <input> -f s16le -ac 1 -ar 16000 - | python "1 transcribe_stream.py"
+    def __init__(self, stream, sample_rate=SAMPLE_RATE, channels=1, sample_width=2, block_seconds=0.5):
+        self.stream = stream
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.sample_width = sample_width
+        self.block_bytes = max(int(block_seconds * sample_rate), 1) * channels * sample_width
+
+    def __iter__(self):
+        frame_size = self.channels * self.sample_width
+        resampler = StreamResampler(self.sample_rate, SAMPLE_RATE)
+        pending = b''
+        while True:
+            # read1 returns what has arrived instead of waiting for a full block
+            read = getattr(self.stream, 'read1', self.stream.read)
+            data = read(self.block_bytes)
+            if not data:
+                tail = resampler(np.zeros(0, dtype=np.float32), final=True)
+                if len(tail):
+                    yield tail
+                return
+            data = pending + data
+            usable = len(data) - len(data) % frame_size
+            pending = data[usable:]
+            if usable:
+                samples = to_mono(pcm_to_float32(data[:usable], self.sample_width, self.channels))
+                samples = resampler(samples)
+                if len(samples):
+                    yield samples.astype(np.float32)
+
+
+# === Simulator ===
+def simulate_growing_wav(source_file, target_file, speed=1.0, block_seconds=0.25):
+    # Copies a recording into target_file block by block at `speed` x real
+    # time, like a call recorder would, from a background thread. Returns the
+    # thread; the header's sizes are only filled in when the copy finishes.
+    def write():
+        with wave.open(source_file, 'rb') as src, open(target_file, 'wb') as f, wave.open(f, 'wb') as dst:
+            dst.setnchannels(src.getnchannels())
+            dst.setsampwidth(src.getsampwidth())
+            dst.setframerate(src.getframerate())
+            frames_per_block = max(int(block_seconds * src.getframerate()), 1)
+            start = time.monotonic()
+            written = 0
+            while True:
+                frames = src.readframes(frames_per_block)
+                if not frames:
+                    break
+                dst.writeframesraw(frames)
+                f.flush()
+                written += len(frames) // (src.getnchannels() * src.getsampwidth())
+                delay = start + written / src.getframerate() / speed - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+
+    os.makedirs(os.path.dirname(target_file) or '.', exist_ok=True)
+    if os.path.exists(target_file):
+        os.remove(target_file)
+    thread = threading.Thread(target=write, daemon=True)
+    thread.start()
+    return thread
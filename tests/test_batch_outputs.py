@@ -0,0 +1,88 @@
+import os
+import sys
+import importlib.util
+import pandas as pd
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+from batch_utils import final_path, partial_path, run_batch
+from transcript_utils import Transcript
+
+
+def load_script(file_name, module_name):
+    spec = importlib.util.spec_from_file_location(module_name, os.path.join(REPO_DIR, file_name))
+    script = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(script)
+    return script
+
+
+def transcript_df():
+    return pd.DataFrame({
+        'start': [0.0, 2.5],
+        'end': [2.5, 4.0],
+        'speaker': ["SPEAKER_00", "SPEAKER_01"],
+        'text': ["สวัสดีครับ", "ค่ะ"],
+    })
+
+
+def test_partial_path_keeps_the_extension():
+    assert partial_path(os.path.join("out", "call1.vts")) == os.path.join("out", "call1.partial.vts")
+    assert final_path(partial_path(os.path.join("out", "call1.vts"))) == os.path.join("out", "call1.vts")
+    assert final_path("call1.vts") == "call1.vts"
+
+
+def test_batch_transcripts_are_written_in_the_output_format(tmp_path):
+    # run_batch hands save_transcript a temporary name; the format must still
+    # be the one of the final extension
+    script = load_script("1 transcribe.py", "transcribe_under_test")
+    input_dir = tmp_path / "recordings"
+    input_dir.mkdir()
+    (input_dir / "call1.wav").write_bytes(b"")
+    output_dir = str(tmp_path / "transcript")
+
+    for extension in (".vts", ".csv"):
+        manifest = run_batch(str(input_dir), output_dir, extension,
+                             lambda audio_file, output_file: script.save_transcript(transcript_df(), output_file))
+        row = manifest.rows[str(input_dir / "call1.wav")]
+        assert row['status'] == 'done', row['error']
+        transcript = Transcript.load(os.path.join(output_dir, "call1" + extension))
+        assert list(transcript.texts) == ["สวัสดีครับ", "ค่ะ"]
+        assert list(transcript.speakers) == ["SPEAKER_00", "SPEAKER_01"]
+        os.remove(os.path.join(output_dir, "manifest.csv"))
+
+
+def test_speaker_embeddings_are_named_after_the_final_output(tmp_path):
+    script = load_script("1 transcribe.py", "transcribe_under_test")
+    input_dir = tmp_path / "recordings"
+    input_dir.mkdir()
+    (input_dir / "call1.wav").write_bytes(b"")
+    output_dir = tmp_path / "transcript"
+
+    def process_file(audio_file, output_file):
+        df = transcript_df()
+        df.attrs['speaker_embeddings'] = {"SPEAKER_00": [1.0, 0.0], "SPEAKER_01": [0.0, 1.0]}
+        df.attrs['speaker_names'] = {}
+        script.save_transcript(df, output_file)
+
+    run_batch(str(input_dir), str(output_dir), ".vts", process_file)
+    assert sorted(os.listdir(output_dir)) == ["call1.speakers.npz", "call1.vts", "manifest.csv"]
+
+
+def test_manifests_are_not_batch_inputs(tmp_path):
+    # Highlighting a directory of transcripts that batch transcription wrote
+    input_dir = tmp_path / "transcript"
+    input_dir.mkdir()
+    (input_dir / "call1.csv").write_text("start,end,speaker,text\n0.0,1.0,SPEAKER_00,ครับ\n", encoding='utf-8')
+    (input_dir / "manifest.csv").write_text("audio_file,output_file,status,elapsed_seconds,error\n"
+                                            "call1.wav,call1.csv,done,1.00,\n", encoding='utf-8')
+
+    processed = []
+
+    def process_file(transcript_file, output_file):
+        processed.append(transcript_file)
+        open(output_file, 'wb').close()
+
+    manifest = run_batch(str(input_dir), str(tmp_path / "highlights"), ".docx", process_file,
+                         extensions=(".csv",), keep_input_extension=True)
+    assert processed == [str(input_dir / "call1.csv")]
+    assert [row['status'] for row in manifest.rows.values()] == ['done']
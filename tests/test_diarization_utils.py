@@ -0,0 +1,82 @@
+import os
+import sys
+import wave
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from diarization_utils import SpeakerReconciler, diarize_windowed, speaker_embeddings, usable_embeddings
+
+# pyannote 3.1 pads the embeddings with all-zero rows when there are more
+# active speakers than clusters; those speakers must be treated like the NaN
+# ones (no embedding), not as a new speaker with a zero vector.
+SPEAKER_A = np.array([1.0, 0.0, 0.0, 0.0], dtype=np.float32)
+SPEAKER_B = np.array([0.0, 1.0, 0.0, 0.0], dtype=np.float32)
+ZERO = np.zeros(4, dtype=np.float32)
+MISSING = np.full(4, np.nan, dtype=np.float32)
+
+
+class Segment:
+    def __init__(self, start, end):
+        self.start, self.end = start, end
+
+
+class Annotation:
+    def __init__(self, tracks):
+        self.tracks = tracks
+
+    def labels(self):
+        return sorted({label for _, _, label in self.tracks})
+
+    def itertracks(self, yield_label=True):
+        for start, end, label in self.tracks:
+            yield Segment(start, end), None, label
+
+
+class WindowPipeline:
+    # Two speakers per window, taking turns on which one speaks first, so each
+    # overlap has the speaker who ended the previous window; B's embedding is
+    # zero-padded in the windows listed in zero_windows
+    def __init__(self, zero_windows):
+        self.zero_windows = zero_windows
+        self.calls = 0
+
+    def __call__(self, file, return_embeddings=False):
+        seconds = file["waveform"].shape[-1] / file["sample_rate"]
+        first, second = ("SPEAKER_01", "SPEAKER_00") if self.calls % 2 else ("SPEAKER_00", "SPEAKER_01")
+        annotation = Annotation([(0.0, seconds / 2, first), (seconds / 2, seconds, second)])
+        b = ZERO if self.calls in self.zero_windows else SPEAKER_B
+        self.calls += 1
+        return annotation, np.stack([SPEAKER_A, b])
+
+
+def test_usable_embeddings_rejects_zero_and_nan_rows():
+    assert usable_embeddings(np.stack([SPEAKER_A, ZERO, MISSING])).tolist() == [True, False, False]
+    annotation = Annotation([(0, 1, "SPEAKER_00"), (1, 2, "SPEAKER_01"), (2, 3, "SPEAKER_02")])
+    embeddings = speaker_embeddings(annotation, np.stack([SPEAKER_A, ZERO, MISSING]))
+    assert list(embeddings) == ["SPEAKER_00"]
+
+
+def test_reconciler_matches_zero_padded_speaker_by_overlap():
+    reconciler = SpeakerReconciler(max_distance=0.5)
+    assert reconciler.assign(np.stack([SPEAKER_A, SPEAKER_B])) == [0, 1]
+    # B has no embedding in the next window but overlaps the previous B
+    assert reconciler.assign(np.stack([SPEAKER_A, ZERO]), {(1, 1): 3.0, (1, 0): 0.5}) == [0, 1]
+    # Without any overlap it becomes a new speaker, still without a centroid
+    assert reconciler.assign(np.stack([ZERO])) == [2]
+    assert reconciler.centroids[2] is None
+    assert all(np.isfinite(centroid).all() for centroid in reconciler.centroids[:2])
+
+
+def test_diarize_windowed_with_zero_padded_rows(tmp_path):
+    audio_file = str(tmp_path / "call.wav")
+    with wave.open(audio_file, 'wb') as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(16000)
+        f.writeframes(np.zeros(16000 * 150, dtype='<i2').tobytes())
+
+    turns, embeddings = diarize_windowed(WindowPipeline(zero_windows={1}), audio_file, window_seconds=60.0,
+                                         overlap_seconds=10.0, max_distance=0.5)
+    assert {turn['speaker'] for turn in turns} == {"SPEAKER_00", "SPEAKER_01"}
+    assert sorted(embeddings) == ["SPEAKER_00", "SPEAKER_01"]
+    assert all(np.isfinite(vector).all() for vector in embeddings.values())
@@ -0,0 +1,46 @@
+import os
+import sys
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from speaker_index import SpeakerIndex, identify_files, save_speaker_embeddings
+
+AGENT = np.array([1.0, 0.0, 0.0, 0.0], dtype=np.float32)
+OTHER_AGENT = np.array([0.0, 1.0, 0.0, 0.0], dtype=np.float32)
+CUSTOMER = np.array([0.0, 0.0, 1.0, 0.0], dtype=np.float32)
+
+
+def enrolled_index(index_dir):
+    speaker_index = SpeakerIndex(str(index_dir))
+    speaker_index.add(["agent", "agent", "other agent"], [AGENT, AGENT + 0.05, OTHER_AGENT])
+    return speaker_index
+
+
+def test_names_are_one_to_one_within_a_recording(tmp_path):
+    speaker_index = enrolled_index(tmp_path / "index")
+    # Both labels clear the threshold against the agent; only the closer one gets the name
+    matches = speaker_index.identify({"SPEAKER_00": AGENT + np.array([0, 0.4, 0.3, 0]), "SPEAKER_01": AGENT + 0.02})
+    assert matches["SPEAKER_01"][0] == "agent"
+    assert matches["SPEAKER_00"][0] is None
+
+
+def test_same_speaker_is_named_in_every_file(tmp_path):
+    speaker_index = enrolled_index(tmp_path / "index")
+    paths = []
+    for k in range(2):
+        path = str(tmp_path / f"call{k}.speakers.npz")
+        save_speaker_embeddings(path, {"SPEAKER_00": CUSTOMER, f"SPEAKER_0{k + 1}": AGENT + 0.01 * k})
+        paths.append(path)
+
+    results = identify_files(speaker_index, paths)
+    assert results[paths[0]]["SPEAKER_01"][0] == "agent"
+    assert results[paths[1]]["SPEAKER_02"][0] == "agent"
+    assert results[paths[0]]["SPEAKER_00"][0] is None
+
+
+def test_add_rejects_all_zero_embeddings(tmp_path):
+    speaker_index = SpeakerIndex(str(tmp_path / "index"))
+    with pytest.raises(ValueError):
+        speaker_index.add(["nobody"], [np.zeros(4)])
+    assert len(speaker_index) == 0
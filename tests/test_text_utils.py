@@ -0,0 +1,40 @@
+import os
+import sys
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from text_utils import TextCleaner, clean_thai_text, clean_transcripts, repetition_pattern
+from transcript_utils import Transcript
+
+
+def test_clean_transcripts_skips_the_manifest_and_reports_bad_files(tmp_path):
+    # A batch transcription directory: transcripts, manifest.csv, and a stray CSV
+    input_dir = tmp_path / "transcript"
+    input_dir.mkdir()
+    (input_dir / "call1.csv").write_text("start,end,speaker,text\n0.0,1.0,SPEAKER_00,สวัสดี   ครับ\n",
+                                         encoding='utf-8')
+    (input_dir / "manifest.csv").write_text("audio_file,output_file,status,elapsed_seconds,error\n"
+                                            "call1.wav,call1.csv,done,1.00,\n", encoding='utf-8')
+    (input_dir / "notes.csv").write_text("a,b\n1,2\n", encoding='utf-8')
+    output_dir = tmp_path / "cleaned"
+
+    failed = clean_transcripts(str(input_dir), str(output_dir), TextCleaner())
+    assert failed == [str(input_dir / "notes.csv")]
+    assert sorted(os.listdir(output_dir)) == ["call1.csv"]
+    assert list(Transcript.load(str(output_dir / "call1.csv")).texts) == ["สวัสดีครับ"]
+
+
+def test_repetition_collapse_matches_the_full_regex():
+    # The prefilter may only skip texts the loop regex leaves alone, whatever
+    # the spacing between repeats ("abab ab ab") or inside the phrase
+    pattern = repetition_pattern()
+    rng = np.random.default_rng(0)
+    units = ["ครับ", "สวัสดี ครับ", "ab", "a b", "ok ", "x", "12", "ค่ะ "]
+    texts = ["abab ab ab", "ครับ ครับครับ  ครับ"]
+    for _ in range(3000):
+        pieces = [(units[k] + " " * int(rng.integers(0, 3))) * int(rng.integers(1, 7))
+                  for k in rng.integers(len(units), size=int(rng.integers(0, 6)))]
+        texts.append("".join(pieces))
+
+    cleaned = TextCleaner(collapse_repetitions=True).clean_many(texts)
+    assert cleaned == [pattern.sub(r'\1', clean_thai_text(text)) for text in texts]
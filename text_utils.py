@@ -0,0 +1,213 @@
+import os
+import re
+import csv
+import sys
+import numpy as np
+
+# === Thai Text Cleanup ===
+# ASR output is cleaned in batches: the texts of a whole transcript are
+# joined with a separator, the joined string is viewed as a numpy array of
+# code points, and spacing cleanup and digit conversion are a few vectorized
+# passes over that array instead of two re.sub calls per segment.
+# Repetition loops are located with vectorized period checks, so the
+# (much slower) loop regex only runs on the few segments that have one.
+# clean_thai_text is the single-text form for the scripts that clean as they
+# go (windows, live chunks).
+TRANSCRIPTION_ERROR = "[Transcription Error]"
+SEPARATOR = '\x00'  # Code point 0: neither whitespace nor Thai
+BATCH_TEXTS = 5_000  # Texts per vectorized pass: small enough for the arrays to stay in cache
+
+# str.isspace (what \s matches) per code point; there are none above U+3000
+SPACE_TABLE = np.array([chr(code).isspace() for code in range(0x3001)])
+THAI_FIRST, THAI_LAST = 0x0E00, 0x0E7F
+THAI_ZERO, THAI_NINE = 0x0E50, 0x0E59
+
+
+def _to_codes(text):
+    return np.frombuffer(text.encode('utf-32-le'), dtype='<u4')
+
+
+def _from_codes(codes):
+    return codes.astype('<u4', copy=False).tobytes().decode('utf-32-le')
+
+
+def _is_thai(codes):
+    return (codes >= THAI_FIRST) & (codes <= THAI_LAST)
+
+
+def clean_spacing(codes, thai_digits=False):
+    # Whitespace runs become one space, then spaces between two Thai
+    # characters and next to a separator or either end are dropped: the same
+    # result as removing whitespace between Thai characters, collapsing the
+    # rest and stripping each text
+    space = np.zeros(len(codes), dtype=bool)
+    low = codes <= 0x3000
+    space[low] = SPACE_TABLE[codes[low]]
+    keep = ~space
+    keep[1:] |= ~space[:-1]  # First character of each whitespace run
+    codes = np.where(space, 32, codes)[keep]
+
+    padded = np.concatenate(([0], codes, [0]))
+    before, after = padded[:-2], padded[2:]
+    drop = (codes == 32) & ((_is_thai(before) & _is_thai(after)) | (before == 0) | (after == 0))
+    codes = codes[~drop]
+    if thai_digits:
+        digits = (codes >= THAI_ZERO) & (codes <= THAI_NINE)
+        codes = np.where(digits, codes - (THAI_ZERO - ord('0')), codes)
+    return codes
+
+
+def repetition_pattern(min_repeats=4, max_unit=30):
+    # A phrase of 2-max_unit characters said min_repeats or more times in a
+    # row (hallucination loops like "ครับครับครับครับ"). Digits never start or
+    # form part of the phrase, so account and phone numbers are left alone.
+    return re.compile(r'([^\x00\s\d][^\x00\d]{1,%d}?)(?: ?\1){%d,}' % (max_unit - 1, min_repeats - 1))
+
+
+def repetition_segments(codes, min_repeats=4, max_unit=30):
+    # (index, offset) of the separator-joined texts that may hold a
+    # repetition_pattern loop, with an offset at or before its first one.
+    # With spaces left out, every loop the pattern matches (however its
+    # repeats are spaced) is one stretch of min_repeats periods of
+    # 1..max_unit characters, so the stretches are found with one shifted
+    # comparison per period plus log2 AND passes for the long runs, and no
+    # loop starts before the first stretch of its text.
+    separators = np.flatnonzero(codes == 0)
+    positions = np.flatnonzero(codes != 32)  # Index in codes of each non-space character
+    # Compared as uint16: code points that wrap around, or a stretch running
+    # through identical short texts, only add candidates the regex then rejects
+    values = codes[positions].astype(np.uint16)
+    found = []
+    for period in range(1, max_unit + 1):
+        need = (min_repeats - 1) * period
+        if len(values) < period + need:
+            break
+        run = values[:-period] == values[period:]
+        width = 1
+        while width * 2 <= need:
+            run = run[:-width] & run[width:]
+            width *= 2
+        if need > width:
+            run = run[:-(need - width)] & run[need - width:]
+        found.append(np.flatnonzero(run))
+    if not found:
+        return []
+    starts_found = positions[np.sort(np.concatenate(found))]
+    indices, first = np.unique(np.searchsorted(separators, starts_found, side='right'), return_index=True)
+    starts = np.concatenate(([0], separators + 1))[indices]
+    return list(zip(indices.tolist(), (starts_found[first] - starts).tolist()))
+
+
+def load_confusions(path):
+    # CSV with wrong,right columns: common ASR misrecognitions and their fix
+    with open(path, newline='', encoding='utf-8') as f:
+        return {row['wrong']: row['right'] for row in csv.DictReader(f) if row.get('wrong')}
+
+
+class TextCleaner:
+    # Thai spacing cleanup (spaces between Thai characters removed, other
+    # whitespace runs collapsed, ends stripped) plus optional rules, applied
+    # in this order: Thai digits to Arabic, repetition collapse, confusion
+    # table. Non-strings (missing values) and "[Transcription Error]" pass
+    # through unchanged.
+    def __init__(self, collapse_repetitions=False, min_repeats=4, thai_digits=False, confusions=None):
+        self.min_repeats = min_repeats
+        self.repetitions = repetition_pattern(min_repeats) if collapse_repetitions else None
+        self.thai_digits = thai_digits
+        if isinstance(confusions, str):
+            confusions = load_confusions(confusions)
+        # Keys are matched in cleaned form, longest first
+        self.confusions = {}
+        for wrong, right in (confusions or {}).items():
+            wrong = _from_codes(clean_spacing(_to_codes(wrong), thai_digits))
+            if wrong:
+                self.confusions[wrong] = right
+        self.confusion_pattern = None
+        if self.confusions:
+            self.confusion_pattern = re.compile(
+                '|'.join(re.escape(wrong) for wrong in sorted(self.confusions, key=len, reverse=True))
+            )
+
+    def clean(self, text):
+        return self.clean_many([text])[0]
+
+    def clean_many(self, texts):
+        # Any iterable of texts (list, pandas Series, ...), returns a list
+        texts = list(texts)
+        indices = [i for i, text in enumerate(texts) if isinstance(text, str) and text != TRANSCRIPTION_ERROR]
+        if not indices:
+            return texts
+        cleaned = list(texts)
+        for first in range(0, len(indices), BATCH_TEXTS):
+            batch = indices[first:first + BATCH_TEXTS]
+            for i, text in zip(batch, self._clean_batch([texts[i] for i in batch])):
+                cleaned[i] = text
+        return cleaned
+
+    def _clean_batch(self, texts):
+        joined = SEPARATOR.join(texts)
+        if joined.count(SEPARATOR) != len(texts) - 1:
+            joined = SEPARATOR.join(text.replace(SEPARATOR, ' ') for text in texts)
+
+        codes = clean_spacing(_to_codes(joined), self.thai_digits)
+        parts = _from_codes(codes).split(SEPARATOR)
+        if self.repetitions is not None:
+            for k, offset in repetition_segments(codes, self.min_repeats):
+                # The loop regex tries every phrase length at every position, so
+                # it starts at the first repeating stretch
+                parts[k] = parts[k][:offset] + self.repetitions.sub(r'\1', parts[k][offset:])
+        if self.confusion_pattern is not None:
+            joined = self.confusion_pattern.sub(lambda match: self.confusions[match.group()], SEPARATOR.join(parts))
+            parts = joined.split(SEPARATOR)
+        return parts
+
+
+_default_cleaner = TextCleaner()
+
+
+def clean_thai_text(text):
+    return _default_cleaner.clean(text)
+
+
+# === Re-clean Transcripts ===
+def clean_transcripts(input_path, output_path, cleaner):
+    # A .vts/.csv/.txt transcript, or a directory of them (e.g. a whole
+    # archive after a rule change), cleaned into output_path. A file that
+    # can't be cleaned is reported and skipped; returns the failed paths.
+    from batch_utils import MANIFEST_FILE, list_files, output_path_for
+    from transcript_utils import Transcript
+
+    if os.path.isdir(input_path):
+        # The batch manifest sits next to the transcripts it lists
+        jobs = [(path, output_path_for(path, output_path, os.path.splitext(path)[1]))
+                for path in list_files(input_path, ('.vts', '.csv', '.txt'))
+                if os.path.basename(path) != MANIFEST_FILE]
+    else:
+        jobs = [(input_path, output_path)]
+    failed = []
+    for input_file, output_file in jobs:
+        try:
+            transcript = Transcript.load(input_file)
+            cleaned = Transcript()
+            for text, start, end, speaker in zip(cleaner.clean_many(transcript.texts), transcript.starts,
+                                                 transcript.ends, transcript.speakers):
+                cleaned.append(text, start, end, speaker)
+            cleaned.save(output_file)
+        except (OSError, ValueError) as e:
+            print(f"Error in {input_file}: {e}")
+            failed.append(input_file)
+            continue
+        print(f"{len(transcript)} segments: {input_file} -> {output_file}")
+    if failed:
+        print(f"{len(failed)} of {len(jobs)} transcripts could not be cleaned")
+    return failed
+
+
+# Usage: python text_utils.py <input file or directory> <output file or directory> [confusions.csv]
+# Spacing cleanup, repetition collapse and the optional confusion table
+if __name__ == '__main__':
+    if len(sys.argv) not in (3, 4):
+        sys.exit("Usage: python text_utils.py <input file or directory> <output file or directory> [confusions.csv]")
+    failed = clean_transcripts(sys.argv[1], sys.argv[2], TextCleaner(collapse_repetitions=True,
+                                                                     confusions=sys.argv[3] if len(sys.argv) == 4 else None))
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,153 @@
+import os
+import sys
+import json
+import mmap
+import numpy as np
+
+# === Columnar Transcript Files (.vts) ===
+# One file per transcript, little-endian, every section 8-byte aligned:
+#   b"VTS1", uint32 header length, JSON header (count, speakers, sizes)
+#   starts        float64[n]   NaN: no time
+#   ends          float64[n]
+#   speaker_ids   int32[n]     index into header["speakers"], -1: none
+#   offsets       int64[n]     character offset of each segment in the text
+#   byte_offsets  int64[n + 1] the same in bytes, plus the end
+#   text          UTF-8        segment texts joined by single spaces
+# The text section is exactly the flattened text the highlighter matches
+# against, so loading is an mmap plus one UTF-8 decode: no CSV parsing and
+# no per-row string building. The numeric columns are views into the map.
+STORE_EXTENSION = '.vts'
+MAGIC = b'VTS1'
+VERSION = 1
+
+
+def _align(size):
+    return (size + 7) & ~7
+
+
+def _speaker_or_none(speaker):
+    # pandas gives NaN for a missing speaker
+    if speaker is None or speaker != speaker or speaker == '':
+        return None
+    return str(speaker)
+
+
+def _time_or_nan(value):
+    return np.nan if value is None else value
+
+
+def write_store(path, starts, ends, speakers, texts):
+    texts = [str(text) for text in texts]
+    encoded = [text.encode('utf-8') for text in texts]
+    count = len(texts)
+
+    speaker_ids = np.empty(count, dtype='<i4')
+    speaker_names = {}
+    for i, speaker in enumerate(speakers):
+        speaker = _speaker_or_none(speaker)
+        speaker_ids[i] = -1 if speaker is None else speaker_names.setdefault(speaker, len(speaker_names))
+
+    # Segment i starts after every earlier text and its joining space
+    offsets = np.zeros(count, dtype='<i8')
+    byte_offsets = np.zeros(count + 1, dtype='<i8')
+    if count:
+        offsets[1:] = np.cumsum([len(text) + 1 for text in texts[:-1]])
+        byte_offsets[1:] = np.cumsum([len(data) + 1 for data in encoded])
+        byte_offsets[-1] -= 1  # No space after the last segment
+    text = b' '.join(encoded)
+
+    header = json.dumps({
+        "version": VERSION,
+        "count": count,
+        "speakers": list(speaker_names),
+        "text_bytes": len(text),
+        "text_chars": int(offsets[-1]) + len(texts[-1]) if count else 0,
+    }, ensure_ascii=False).encode('utf-8')
+    prefix = MAGIC + len(header).to_bytes(4, 'little') + header
+    sections = [
+        np.array([_time_or_nan(value) for value in starts], dtype='<f8'),
+        np.array([_time_or_nan(value) for value in ends], dtype='<f8'),
+        speaker_ids,
+        offsets,
+        byte_offsets,
+    ]
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path + '.tmp', 'wb') as f:
+        f.write(prefix + b'\0' * (_align(len(prefix)) - len(prefix)))
+        for section in sections:
+            data = section.tobytes()
+            f.write(data + b'\0' * (_align(len(data)) - len(data)))
+        f.write(text)
+    os.replace(path + '.tmp', path)
+
+
+class TranscriptStore:
+    # Read-only, memory-mapped view of a .vts file. starts/ends/speaker_ids/
+    # offsets are numpy arrays backed by the map; text(i) decodes a single
+    # segment and full_text the whole transcript (once).
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(f.fileno()).st_size else b''
+        if self._map[:4] != MAGIC:
+            raise ValueError(f"Not a .vts transcript: {path}")
+        header_length = int.from_bytes(self._map[4:8], 'little')
+        header = json.loads(self._map[8:8 + header_length].decode('utf-8'))
+        if header["version"] > VERSION:
+            raise ValueError(f"{path} is .vts version {header['version']}, this code reads up to {VERSION}")
+
+        count = header["count"]
+        self.speaker_names = header["speakers"]
+        position = _align(8 + header_length)
+
+        def section(dtype, length):
+            nonlocal position
+            array = np.frombuffer(self._map, dtype=dtype, count=length, offset=position)
+            position = _align(position + array.nbytes)
+            return array
+
+        self.starts = section('<f8', count)
+        self.ends = section('<f8', count)
+        self.speaker_ids = section('<i4', count)
+        self.offsets = section('<i8', count)
+        self.byte_offsets = section('<i8', count + 1)
+        self._text_start = position
+        self._text_bytes = header["text_bytes"]
+        self._full_text = None
+
+    def __len__(self):
+        return len(self.offsets)
+
+    @property
+    def full_text(self):
+        if self._full_text is None:
+            self._full_text = self._map[self._text_start:self._text_start + self._text_bytes].decode('utf-8')
+        return self._full_text
+
+    def text(self, i):
+        start, end = self.byte_offsets[i], self.byte_offsets[i + 1] - (1 if i + 1 < len(self) else 0)
+        return self._map[self._text_start + start:self._text_start + end].decode('utf-8')
+
+    def speakers(self):
+        # Speaker name (or None) per segment
+        names = self.speaker_names + [None]  # id -1 picks the last entry
+        return [names[i] for i in self.speaker_ids.tolist()]
+
+    def close(self):
+        # The numpy views must be dropped before the map can close
+        self.starts = self.ends = self.speaker_ids = self.offsets = self.byte_offsets = None
+        if isinstance(self._map, mmap.mmap):
+            self._map.close()
+
+
+# === Run: convert between .vts, .csv and .txt ===
+# Usage: python transcript_store.py <input.csv|.txt|.vts> <output.csv|.txt|.vts>
+if __name__ == '__main__':
+    from transcript_utils import Transcript
+
+    if len(sys.argv) != 3:
+        sys.exit("Usage: python transcript_store.py <input.csv|.txt|.vts> <output.csv|.txt|.vts>")
+    transcript = Transcript.load(sys.argv[1])
+    transcript.save(sys.argv[2])
+    print(f"{len(transcript)} segments: {sys.argv[1]} -> {sys.argv[2]}")
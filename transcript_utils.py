@@ -0,0 +1,159 @@
+import os
+import csv
+import math
+import bisect
+from transcript_store import STORE_EXTENSION, TranscriptStore, write_store
+
+
+def format_timestamp(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
+
+
+# === Segment-indexed Transcript ===
+class Transcript:
+    # Transcript segments (start, end, speaker, text) plus the flattened text
+    # keywords are matched against: segment texts joined by single spaces.
+    # offsets[i] is where segment i starts in that text, so any character
+    # offset maps back to its segment, speaker and time with one bisect.
+    # Edits are tracked as the lowest changed offset, so an incremental
+    # matcher only rescans from there.
+    def __init__(self):
+        self.starts = []
+        self.ends = []
+        self.speakers = []
+        self.texts = []
+        self.offsets = []
+        self.length = 0
+        self.changed_from = 0
+        self._full_text = None
+
+    def __len__(self):
+        return len(self.texts)
+
+    @classmethod
+    def load(cls, file_path):
+        # .vts columnar file (what 1 transcribe.py writes, see
+        # transcript_store.py), CSV with start/end/speaker/text columns, or
+        # TXT as a single segment without time or speaker
+        transcript = cls()
+        _, file_extension = os.path.splitext(file_path)
+        if file_extension.lower() == STORE_EXTENSION:
+            return cls.from_store(TranscriptStore(file_path))
+        if file_extension.lower() == '.csv':
+            with open(file_path, newline='', encoding='utf-8') as f:
+                reader = csv.DictReader(f)
+                if reader.fieldnames is not None and 'text' not in reader.fieldnames:
+                    raise ValueError(f"Not a transcript CSV (no text column): {file_path}")
+                for row in reader:
+                    transcript.append(row['text'], _to_float(row.get('start')), _to_float(row.get('end')),
+                                      row.get('speaker') or None)
+        elif file_extension.lower() == '.txt':
+            with open(file_path, 'r', encoding='utf-8') as f:
+                transcript.append(f.read())
+        else:
+            raise ValueError(f"Unsupported file type: {file_extension}. Only {STORE_EXTENSION}, .csv and .txt are supported.")
+        return transcript
+
+    @classmethod
+    def from_store(cls, store):
+        # The store's text is already the flattened text, so segment texts
+        # are slices of it and nothing is joined again
+        transcript = cls()
+        full_text = store.full_text
+        transcript.starts = [None if math.isnan(start) else start for start in store.starts.tolist()]
+        transcript.ends = [None if math.isnan(end) else end for end in store.ends.tolist()]
+        transcript.speakers = store.speakers()
+        transcript.offsets = store.offsets.tolist()
+        ends = transcript.offsets[1:] + [len(full_text) + 1]
+        transcript.texts = [full_text[start:end - 1] for start, end in zip(transcript.offsets, ends)]
+        transcript.length = len(full_text)
+        transcript._full_text = full_text
+        store.close()
+        return transcript
+
+    def save(self, file_path):
+        # By extension: .vts, .csv (start,end,speaker,text) or .txt (the text)
+        _, file_extension = os.path.splitext(file_path)
+        os.makedirs(os.path.dirname(file_path) or '.', exist_ok=True)
+        if file_extension.lower() == STORE_EXTENSION:
+            write_store(file_path, self.starts, self.ends, self.speakers, self.texts)
+        elif file_extension.lower() == '.csv':
+            with open(file_path, 'w', newline='', encoding='utf-8') as f:
+                writer = csv.writer(f)
+                writer.writerow(['start', 'end', 'speaker', 'text'])
+                for row in zip(self.starts, self.ends, self.speakers, self.texts):
+                    writer.writerow(['' if value is None else value for value in row])
+        elif file_extension.lower() == '.txt':
+            with open(file_path, 'w', encoding='utf-8') as f:
+                f.write(self.full_text)
+        else:
+            raise ValueError(f"Unsupported file type: {file_extension}. Only {STORE_EXTENSION}, .csv and .txt are supported.")
+
+    def append(self, text, start=None, end=None, speaker=None):
+        offset = self.length + 1 if self.texts else 0  # After the joining space
+        self.starts.append(start)
+        self.ends.append(end)
+        self.speakers.append(speaker)
+        self.texts.append(text)
+        self.offsets.append(offset)
+        self.length = offset + len(text)
+        self.changed_from = min(self.changed_from, max(offset - 1, 0))
+        self._full_text = None
+
+    def replace(self, index, text):
+        # E.g. a segment re-transcribed with more context; everything after it
+        # shifts, so the matcher rescans from this segment on
+        self.texts[index] = text
+        offset = self.offsets[index]
+        for i in range(index, len(self.texts)):
+            self.offsets[i] = offset
+            offset += len(self.texts[i]) + 1
+        self.length = offset - 1
+        self.changed_from = min(self.changed_from, max(self.offsets[index] - 1, 0))
+        self._full_text = None
+
+    @property
+    def full_text(self):
+        if self._full_text is None:
+            self._full_text = ' '.join(self.texts)
+        return self._full_text
+
+    def mark_scanned(self):
+        self.changed_from = self.length
+
+    def segment_at(self, offset):
+        # Index of the segment containing offset; a joining space belongs to
+        # the segment before it
+        return max(bisect.bisect_right(self.offsets, offset) - 1, 0)
+
+    def locate(self, offset):
+        # (segment index, start time, speaker) for a character offset
+        i = self.segment_at(offset)
+        return i, self.starts[i], self.speakers[i]
+
+    def turns(self):
+        # (start offset, end offset, label) per speaker turn: consecutive
+        # segments of one speaker, labelled with the turn's start time. None
+        # when there is nothing to label (TXT transcripts).
+        if all(speaker is None and start is None for speaker, start in zip(self.speakers, self.starts)):
+            return None
+        turns = []
+        for i, text in enumerate(self.texts):
+            end = self.offsets[i] + len(text)
+            if i > 0 and self.speakers[i] == self.speakers[i - 1]:
+                turns[-1][1] = end
+                continue
+            label = self.speakers[i] or 'Unknown'
+            if self.starts[i] is not None:
+                label = f"[{format_timestamp(self.starts[i])}] {label}"
+            turns.append([self.offsets[i], end, f"{label}: "])
+        return [tuple(turn) for turn in turns]
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,263 @@
+import os
+import sys
+import time
+import argparse
+import importlib.util
+
+START_TIME = time.perf_counter()
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# === Command Line ===
+# One entry point for the pipeline scripts:
+#   python vocalytics.py transcribe <audio file or directory> [--plain] [-o OUTPUT]
+#   python vocalytics.py stream [SOURCE] -k KEYWORDS [--simulate RECORDING]
+#   python vocalytics.py highlight <transcript file or directory> [-k KEYWORDS] [--summary-only]
+#   python vocalytics.py clean <transcript.csv> [-o OUTPUT]
+#   python vocalytics.py convert <input> <output>
+#   python vocalytics.py normalize <transcript file or directory> <output> [--confusions CSV]
+#   python vocalytics.py speakers enroll|identify|info <index dir> ...
+#   python vocalytics.py check <files...> [-k KEYWORDS]
+# The scripts' config values stay the defaults; options given here override
+# them. Every heavy library (torch, transformers, pyannote, pandas,
+# python-docx) is imported by the stage that needs it, so check, convert and
+# summary-only highlighting start in a fraction of a second, and the
+# transcribe timing report lists imports apart from model loading.
+
+
+def load_script(file_name, module_name):
+    spec = importlib.util.spec_from_file_location(module_name, os.path.join(REPO_DIR, file_name))
+    script = importlib.util.module_from_spec(spec)
+    # Batch worker processes look their functions up by module name
+    sys.modules[module_name] = script
+    spec.loader.exec_module(script)
+    return script
+
+
+def override(script, **values):
+    for name, value in values.items():
+        if value is not None:
+            setattr(script, name, value)
+
+
+def report_startup():
+    print(f"[startup {time.perf_counter() - START_TIME:.2f}s]", file=sys.stderr)
+
+
+# === Subcommands ===
+def transcribe(args):
+    if not os.path.exists(args.audio):
+        sys.exit(f"The audio file was not found at: {args.audio}")
+    output_file = output_dir = None
+    if args.output is not None:
+        if os.path.isdir(args.audio):
+            output_dir = args.output
+        else:
+            output_file = args.output
+
+    if args.plain:
+        script = load_script("1 transcribe_without_diarization.py", "transcribe_without_diarization")
+        override(script, asr_batch_size=args.batch_size)
+    else:
+        script = load_script("1 transcribe.py", "transcribe")
+        override(script, asr_batch_size=args.batch_size, asr_num_workers=args.workers, profile_dir=args.profile)
+        if args.no_cache:
+            script.use_cache = False
+        if args.llm_clean:
+            script.llm_clean = True
+        override(script, speaker_index_dir=args.speaker_index)
+        if args.profile is not None:
+            script.timer = script.StageTimer(trace=True)
+    if args.retry_failed:
+        script.batch_retry_failed = True
+    override(script, audio_file=args.audio, output_file=output_file, output_dir=output_dir, model_name=args.model,
+             asr_backend=args.backend)
+    report_startup()
+    script.main()
+
+
+def stream(args):
+    script = load_script("1 transcribe_stream.py", "transcribe_stream")
+    override(script, audio_source=args.source, keywords_file=args.keywords, simulate_from=args.simulate,
+             events_file=args.events, transcript_file=args.output, model_name=args.model, asr_backend=args.backend)
+    report_startup()
+    script.main()
+
+
+def highlight(args):
+    if not os.path.exists(args.transcript):
+        sys.exit(f"The transcript was not found at: {args.transcript}")
+    script = load_script("2 keyword_highlight.py", "keyword_highlight")
+    override(script, TRANSCRIPT_FILE=args.transcript, KEYWORDS_FILE=args.keywords, NUM_WORKERS=args.workers,
+             PROFILE_DIR=args.profile)
+    if args.output is not None:
+        override(script, **{"OUTPUT_DIR" if os.path.isdir(args.transcript) else "OUTPUT_FILE": args.output})
+    if args.summary_only:
+        script.SUMMARY_ONLY = True
+    if args.profile is not None:
+        script.timer = script.StageTimer(trace=True)
+    report_startup()
+    script.main()
+
+
+def clean(args):
+    from llm_clean import LLMCleaner, clean_csv
+
+    report_startup()
+    clean_csv(args.transcript, args.output, LLMCleaner(model=args.model, host=args.host))
+
+
+def convert(args):
+    from transcript_utils import Transcript
+
+    transcript = Transcript.load(args.input)
+    transcript.save(args.output)
+    print(f"{len(transcript)} segments: {args.input} -> {args.output}")
+
+
+def normalize(args):
+    from text_utils import TextCleaner, clean_transcripts
+
+    cleaner = TextCleaner(collapse_repetitions=not args.keep_repetitions, thai_digits=args.thai_digits,
+                          confusions=args.confusions)
+    if clean_transcripts(args.input, args.output, cleaner):
+        sys.exit(1)
+
+
+def speakers(args):
+    from speaker_index import SpeakerIndex, enroll, identify_files, print_info
+
+    speaker_index = SpeakerIndex(args.index)
+    if args.action == "enroll":
+        try:
+            enroll(speaker_index, args.name, args.embeddings, args.label)
+        except ValueError as e:
+            sys.exit(str(e))
+    elif args.action == "identify":
+        identify_files(speaker_index, args.embeddings, args.threshold)
+    else:
+        print_info(speaker_index)
+
+
+def check(args):
+    # Validates inputs without loading any model: WAV headers, transcripts
+    # and the keyword sheet. Exit status 1 if anything is unusable.
+    from audio_utils import SAMPLE_RATE, WavReader
+    from transcript_utils import Transcript
+
+    problems = 0
+    for path in args.files:
+        if not os.path.exists(path):
+            print(f"❌ {path}: not found")
+            problems += 1
+            continue
+        extension = os.path.splitext(path)[1].lower()
+        try:
+            if extension in ('.vts', '.csv', '.txt'):
+                transcript = Transcript.load(path)
+                print(f"✅ {path}: transcript, {len(transcript)} segments, {transcript.length} characters")
+            elif extension == '.wav':
+                with WavReader(path) as reader:
+                    print(f"✅ {path}: audio, {reader.num_samples / SAMPLE_RATE:.1f}s")
+            else:
+                print(f"⚠️ {path}: not checked (only .wav audio and .vts/.csv/.txt transcripts are; "
+                      f"other audio is decoded with ffmpeg at transcription time)")
+        except Exception as e:
+            print(f"❌ {path}: {e}")
+            problems += 1
+
+    if args.keywords is not None:
+        script = load_script("2 keyword_highlight.py", "keyword_highlight")
+        try:
+            keyword_groups = script.load_keyword_patterns(args.keywords)
+            patterns = sum(len(data["patterns"]) for data in keyword_groups.values())
+            print(f"✅ {args.keywords}: {len(keyword_groups)} keyword groups, {patterns} patterns")
+        except Exception as e:
+            print(f"❌ {args.keywords}: {e}")
+            problems += 1
+    report_startup()
+    sys.exit(1 if problems else 0)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="vocalytics.py", description="Thai call transcription and keyword highlighting")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    command = commands.add_parser("transcribe", help="Transcribe a recording or a directory of recordings")
+    command.add_argument("audio")
+    command.add_argument("-o", "--output", help="Transcript file (.vts or .csv), or the output directory in batch mode")
+    command.add_argument("--plain", action="store_true", help="No diarization: overlapping 30 s windows, TXT output")
+    command.add_argument("--model")
+    command.add_argument("--backend", help="fp32, sdpa, bf16, int8, compile or a combination like sdpa+int8")
+    command.add_argument("--batch-size", type=int)
+    command.add_argument("--workers", type=int, help="CPU worker processes for ASR")
+    command.add_argument("--no-cache", action="store_true")
+    command.add_argument("--retry-failed", action="store_true", help="Batch mode: retry recordings that failed before")
+    command.add_argument("--llm-clean", action="store_true", help="Add an Ollama-cleaned text column")
+    command.add_argument("--profile", metavar="DIR", help="Write metrics.prom and trace.json to DIR")
+    command.add_argument("--speaker-index", metavar="DIR", help="Name enrolled speakers (see the speakers command)")
+    command.set_defaults(run=transcribe)
+
+    command = commands.add_parser("stream", help="Transcribe a live recording with keyword alerts")
+    command.add_argument("source", nargs="?", help="Growing WAV file, or - for raw 16 kHz s16le PCM on stdin")
+    command.add_argument("-k", "--keywords")
+    command.add_argument("--simulate", metavar="RECORDING", help="Replay a recording into SOURCE in real time")
+    command.add_argument("--events", help="JSON lines events file (default: stdout)")
+    command.add_argument("-o", "--output", help="Transcript file written when the stream ends")
+    command.add_argument("--model")
+    command.add_argument("--backend")
+    command.set_defaults(run=stream)
+
+    command = commands.add_parser("highlight", help="Highlight keyword sequences in a transcript or a directory")
+    command.add_argument("transcript")
+    command.add_argument("-k", "--keywords")
+    command.add_argument("-o", "--output", help="DOCX file, or the output directory in batch mode")
+    command.add_argument("--summary-only", action="store_true", help="Print the match summary, no DOCX")
+    command.add_argument("--workers", type=int)
+    command.add_argument("--profile", metavar="DIR", help="Write metrics.prom and trace.json to DIR")
+    command.set_defaults(run=highlight)
+
+    command = commands.add_parser("clean", help="Clean a transcript CSV with a local Ollama model")
+    command.add_argument("transcript")
+    command.add_argument("-o", "--output", default="cleaned_transcript.csv")
+    command.add_argument("--model", default="gemma3:4b")
+    command.add_argument("--host", default="http://localhost:11434")
+    command.set_defaults(run=clean)
+
+    command = commands.add_parser("convert", help="Convert a transcript between .vts, .csv and .txt")
+    command.add_argument("input")
+    command.add_argument("output")
+    command.set_defaults(run=convert)
+
+    command = commands.add_parser("normalize", help="Re-clean transcripts (spacing, repetition loops, confusions)")
+    command.add_argument("input", help="Transcript file, or a directory of them")
+    command.add_argument("output", help="Output file, or directory")
+    command.add_argument("--confusions", metavar="CSV", help="wrong,right pairs of common misrecognitions")
+    command.add_argument("--thai-digits", action="store_true", help="Thai digits to 0-9")
+    command.add_argument("--keep-repetitions", action="store_true", help="Don't collapse repetition loops")
+    command.set_defaults(run=normalize)
+
+    command = commands.add_parser("speakers", help="Enroll known speakers and identify them in .speakers.npz files")
+    actions = command.add_subparsers(dest="action", required=True)
+    action = actions.add_parser("enroll", help="Add one speaker of a recording to the index under a name")
+    action.add_argument("index", help="Speaker index directory (created on first enrollment)")
+    action.add_argument("name")
+    action.add_argument("embeddings", help="<recording>.speakers.npz written next to the transcript")
+    action.add_argument("label", help="Speaker label in that recording, e.g. SPEAKER_01")
+    action = actions.add_parser("identify", help="Match the speakers of .speakers.npz files against the index")
+    action.add_argument("index")
+    action.add_argument("embeddings", nargs="+")
+    action.add_argument("--threshold", type=float, default=0.5, help="Min cosine similarity")
+    action = actions.add_parser("info", help="Enrolled speakers and embedding counts")
+    action.add_argument("index")
+    command.set_defaults(run=speakers)
+
+    command = commands.add_parser("check", help="Validate audio, transcript and keyword files without loading models")
+    command.add_argument("files", nargs="*")
+    command.add_argument("-k", "--keywords")
+    command.set_defaults(run=check)
+    return parser
+
+
+if __name__ == '__main__':
+    args = build_parser().parse_args()
+    args.run(args)